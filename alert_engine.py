@@ -0,0 +1,227 @@
+"""
+Motor de alertas en segundo plano
+Reevalúa los símbolos suscritos y detecta cambios de tendencia, alertas y recomendación
+"""
+
+import re
+import threading
+
+from metrics import STAGE_LATENCY
+
+# Timeframes evaluados (los mismos que /analizar)
+ALERT_TIMEFRAMES = ['5m', '15m', '1h', '4h']
+
+# Orden de gravedad de las alertas de analyze_risk_alerts
+ALERT_LEVELS = ['critico', 'alto', 'medio', 'bajo']
+
+# Los números de un mensaje cambian en cada evaluación ("ATR 3.12%"); para
+# decidir si una alerta es nueva se compara el texto sin ellos
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+def _alert_key(level, message):
+    return level, _NUMBER.sub('#', message)
+
+class AlertEngine:
+    """
+    Suscripciones (chat, símbolo) evaluadas en bloque
+    
+    Cada evaluación descarga las velas de todos los símbolos suscritos con
+    una ola de descargas por timeframe (las de 1h/4h salen de la caché
+    hasta que cierra su vela), calcula las tendencias con los paneles
+    vectorizados y pasa cada símbolo por analyze_risk_alerts y
+    generate_trading_recommendation. El coste depende del número de
+    símbolos distintos, no del número de suscripciones.
+    
+    Solo se notifican los cambios respecto a la evaluación anterior; la
+    primera evaluación de un símbolo fija el estado de referencia.
+    """
+    
+    def __init__(self, detector, timeframes=None, limit=200, max_workers=8, open_interest=False):
+        """
+        Args:
+            detector: Instancia de CryptoTrendDetector
+            timeframes: Timeframes a evaluar (default: ALERT_TIMEFRAMES)
+            limit: Velas por símbolo y timeframe
+            max_workers: Descargas simultáneas en cada ola
+            open_interest: Incluir el análisis de Open Interest (una llamada por símbolo y hora nueva)
+        """
+        self.detector = detector
+        self.timeframes = list(timeframes or ALERT_TIMEFRAMES)
+        self.limit = limit
+        self.max_workers = max_workers
+        self.open_interest = open_interest
+        self._subscribers = {}   # símbolo -> set(chat_id)
+        self._watchlists = {}    # chat_id -> set(símbolo)
+        self._states = {}        # símbolo -> estado de la última evaluación
+        self._lock = threading.Lock()
+        self.evaluations = 0
+    
+    def subscribe(self, chat_id, symbol):
+        """
+        Args:
+            chat_id: Chat que recibirá las alertas
+            symbol: Símbolo normalizado
+        
+        Returns:
+            False si ya estaba suscrito
+        """
+        with self._lock:
+            chats = self._subscribers.setdefault(symbol, set())
+            if chat_id in chats:
+                return False
+            chats.add(chat_id)
+            self._watchlists.setdefault(chat_id, set()).add(symbol)
+            return True
+    
+    def unsubscribe(self, chat_id, symbol):
+        """
+        Returns:
+            False si no estaba suscrito
+        """
+        with self._lock:
+            chats = self._subscribers.get(symbol)
+            if not chats or chat_id not in chats:
+                return False
+            chats.discard(chat_id)
+            if not chats:
+                # Sin suscriptores el estado deja de ser válido
+                del self._subscribers[symbol]
+                self._states.pop(symbol, None)
+            self._watchlists[chat_id].discard(symbol)
+            if not self._watchlists[chat_id]:
+                del self._watchlists[chat_id]
+            return True
+    
+    def watchlist(self, chat_id):
+        """Símbolos suscritos por un chat (ordenados)"""
+        with self._lock:
+            return sorted(self._watchlists.get(chat_id, ()))
+    
+    def stats(self):
+        """
+        Returns:
+            Dict con símbolos, chats, suscripciones y evaluaciones realizadas
+        """
+        with self._lock:
+            return {
+                'symbols': len(self._subscribers),
+                'chats': len(self._watchlists),
+                'subscriptions': sum(len(chats) for chats in self._subscribers.values()),
+                'evaluations': self.evaluations
+            }
+    
+    @STAGE_LATENCY.timed(stage='alert_evaluation')
+    def evaluate(self):
+        """
+        Evalúa todos los símbolos suscritos (bloqueante)
+        
+        Returns:
+            Lista de notificaciones {'symbol', 'chat_ids', 'changes', 'state'}
+            solo para los símbolos cuyo estado cambió
+        """
+        with self._lock:
+            symbols = list(self._subscribers)
+        if not symbols:
+            return []
+        
+        # Una ola de descargas y un panel por timeframe para todos los símbolos
+        results = {symbol: {} for symbol in symbols}
+        frames_1h = {}
+        for timeframe in self.timeframes:
+            frames, _ = self.detector.load_ohlcv_many(symbols, timeframe, self.limit, self.max_workers)
+            if timeframe == '1h':
+                frames_1h = frames
+            for symbol, trend_info in self.detector.identify_trends_bulk(frames).items():
+                results[symbol][timeframe] = trend_info
+        
+        notifications = []
+        for symbol in symbols:
+            if not results[symbol]:
+                continue
+            
+            oi_analysis = None
+            if self.open_interest and frames_1h.get(symbol) is not None:
+                oi_analysis = self.detector.analyze_open_interest(symbol, frames_1h[symbol])
+            
+            risk_analysis = self.detector.analyze_risk_alerts(results[symbol], oi_analysis)
+            recommendation = self.detector.generate_trading_recommendation(
+                results[symbol], oi_analysis, risk_analysis
+            )
+            state = self._build_state(results[symbol], risk_analysis, recommendation)
+            
+            with self._lock:
+                chats = self._subscribers.get(symbol)
+                if not chats:
+                    continue
+                previous = self._states.get(symbol)
+                self._states[symbol] = state
+                chat_ids = sorted(chats)
+            
+            if previous is None:
+                continue
+            changes = self._diff(previous, state)
+            if changes:
+                notifications.append({
+                    'symbol': symbol,
+                    'chat_ids': chat_ids,
+                    'changes': changes,
+                    'state': state
+                })
+        
+        self.evaluations += 1
+        return notifications
+    
+    def _build_state(self, results, risk_analysis, recommendation):
+        """Resume una evaluación en lo que se compara entre evaluaciones"""
+        alerts = {}
+        if risk_analysis:
+            for level in ALERT_LEVELS:
+                for message in risk_analysis['alerts'][level]:
+                    alerts[_alert_key(level, message)] = (level, message)
+        
+        price = None
+        for timeframe in self.timeframes:
+            if timeframe in results:
+                price = results[timeframe].price
+                break
+        
+        return {
+            'trends': {tf: info.trend for tf, info in results.items()},
+            'alerts': alerts,
+            'action': recommendation['action'] if recommendation else None,
+            'bias': recommendation['bias'] if recommendation else None,
+            'risk_score': recommendation['risk_score'] if recommendation else None,
+            'price': price
+        }
+    
+    def _diff(self, previous, state):
+        """
+        Cambios entre dos estados
+        
+        Returns:
+            Lista de dicts con 'type' = 'trend', 'action', 'alert_new' o 'alert_cleared'
+        """
+        changes = []
+        
+        for timeframe in self.timeframes:
+            old = previous['trends'].get(timeframe)
+            new = state['trends'].get(timeframe)
+            if old is not None and new is not None and old != new:
+                changes.append({'type': 'trend', 'timeframe': timeframe, 'old': old, 'new': new})
+        
+        if previous['action'] != state['action']:
+            changes.append({
+                'type': 'action',
+                'old': previous['action'],
+                'new': state['action'],
+                'bias': state['bias']
+            })
+        
+        new_alerts = [state['alerts'][key] for key in state['alerts'] if key not in previous['alerts']]
+        cleared = [previous['alerts'][key] for key in previous['alerts'] if key not in state['alerts']]
+        for level, message in sorted(new_alerts, key=lambda alert: ALERT_LEVELS.index(alert[0])):
+            changes.append({'type': 'alert_new', 'level': level, 'message': message})
+        for level, message in sorted(cleared, key=lambda alert: ALERT_LEVELS.index(alert[0])):
+            changes.append({'type': 'alert_cleared', 'level': level, 'message': message})
+        
+        return changes
@@ -0,0 +1,193 @@
+"""
+Tipos de resultado del análisis
+Valores numéricos y enums a lo largo de todo el pipeline; el texto se genera solo al mostrarlos
+"""
+
+from dataclasses import dataclass
+from enum import IntEnum
+
+# Etiquetas de cada código (mismos textos que mostraba identify_trend)
+TREND_LABELS = {
+    2: "🟢 ALCISTA FUERTE",
+    1: "🟢 ALCISTA",
+    0: "🟡 LATERAL/INDEFINIDA",
+    -1: "🔴 BAJISTA",
+    -2: "🔴 BAJISTA FUERTE",
+}
+DIRECTION_LABELS = {1: "ALCISTA", 0: "NEUTRAL", -1: "BAJISTA"}
+ADX_LABELS = {2: "FUERTE", 1: "MODERADA", 0: "DÉBIL"}
+RSI_LABELS = {2: "SOBRECOMPRA", 1: "ALCISTA", -1: "BAJISTA", -2: "SOBREVENTA"}
+OI_TREND_LABELS = {
+    2: "🟢 CRECIENTE FUERTE",
+    1: "🟢 CRECIENTE",
+    0: "🟡 ESTABLE",
+    -1: "🔴 DECRECIENTE",
+    -2: "🔴 DECRECIENTE FUERTE",
+}
+DIVERGENCE_LABELS = {
+    0: "NINGUNA",
+    1: "⚠️ BAJISTA (Precio sube, OI baja - Posible techo)",
+    2: "✅ CONFIRMACIÓN BAJISTA (Precio y OI bajan - Cierres de longs)",
+    3: "⚠️ ALCISTA (Precio baja, OI sube - Posible suelo)",
+    4: "✅ CONFIRMACIÓN ALCISTA (Precio y OI suben - Nuevas posiciones)",
+}
+
+class Trend(IntEnum):
+    """Tendencia principal (positivo = alcista, negativo = bajista)"""
+    STRONG_BEARISH = -2
+    BEARISH = -1
+    SIDEWAYS = 0
+    BULLISH = 1
+    STRONG_BULLISH = 2
+    
+    @property
+    def label(self):
+        return TREND_LABELS[self]
+
+class Direction(IntEnum):
+    """Dirección de MACD y DI"""
+    BEARISH = -1
+    NEUTRAL = 0
+    BULLISH = 1
+    
+    @property
+    def label(self):
+        return DIRECTION_LABELS[self]
+
+class AdxStrength(IntEnum):
+    """Fuerza de la tendencia según el ADX (>25 fuerte, >20 moderada)"""
+    WEAK = 0
+    MODERATE = 1
+    STRONG = 2
+    
+    @property
+    def label(self):
+        return ADX_LABELS[self]
+
+class RsiSignal(IntEnum):
+    """Zona del RSI (>70 sobrecompra, <30 sobreventa, si no por encima/debajo de 50)"""
+    OVERSOLD = -2
+    BEARISH = -1
+    BULLISH = 1
+    OVERBOUGHT = 2
+    
+    @property
+    def label(self):
+        return RSI_LABELS[self]
+
+class OiTrend(IntEnum):
+    """Tendencia del Open Interest"""
+    STRONG_DECREASING = -2
+    DECREASING = -1
+    STABLE = 0
+    INCREASING = 1
+    STRONG_INCREASING = 2
+    
+    @property
+    def label(self):
+        return OI_TREND_LABELS[self]
+
+class Divergence(IntEnum):
+    """Relación entre el cambio de precio y el de Open Interest en 24h"""
+    NONE = 0
+    BEARISH = 1               # Precio sube, OI baja
+    BEARISH_CONFIRMATION = 2  # Precio y OI bajan
+    BULLISH = 3               # Precio baja, OI sube
+    BULLISH_CONFIRMATION = 4  # Precio y OI suben
+    
+    @property
+    def label(self):
+        return DIVERGENCE_LABELS[self]
+
+@dataclass
+class TrendResult:
+    """
+    Resultado de identify_trend para un timeframe
+    
+    Los valores son números y enums; formatted() genera los textos que
+    se muestran en la consola y en Telegram.
+    """
+    
+    __slots__ = (
+        'trend', 'price', 'ema_score', 'macd', 'rsi', 'rsi_signal',
+        'adx', 'adx_strength', 'di_direction', 'atr', 'volume'
+    )
+    
+    trend: Trend
+    price: float
+    ema_score: int
+    macd: Direction
+    rsi: float
+    rsi_signal: RsiSignal
+    adx: float
+    adx_strength: AdxStrength
+    di_direction: Direction
+    atr: float
+    volume: float
+    
+    def formatted(self):
+        """
+        Returns:
+            Dict de textos para mostrar (tendencia, precio_actual, ema_score,
+            macd, rsi, adx, di_direccion, volatilidad_atr, volumen)
+        """
+        return {
+            'tendencia': self.trend.label,
+            'precio_actual': self.price,
+            'ema_score': f"{self.ema_score}/5",
+            'macd': self.macd.label,
+            'rsi': f"{self.rsi:.2f} ({self.rsi_signal.label})",
+            'adx': f"{self.adx:.2f} (Fuerza: {self.adx_strength.label})",
+            'di_direccion': self.di_direction.label,
+            'volatilidad_atr': f"{self.atr:.4f}",
+            'volumen': self.volume
+        }
+
+@dataclass
+class OpenInterestResult:
+    """
+    Resultado del análisis de Open Interest
+    
+    Cambios en porcentaje; slope es la pendiente del OI en las últimas 12 horas.
+    """
+    
+    __slots__ = ('current', 'change_24h', 'slope', 'price_change_24h', 'trend', 'divergence')
+    
+    current: float
+    change_24h: float
+    slope: float
+    price_change_24h: float
+    trend: OiTrend
+    divergence: Divergence
+    
+    @property
+    def interpretation(self):
+        """Lectura de la señal de OI en una frase"""
+        if self.divergence == Divergence.BULLISH_CONFIRMATION:
+            return "🚀 Entrada de capital nuevo - Tendencia alcista saludable"
+        elif self.divergence == Divergence.BEARISH_CONFIRMATION:
+            return "📉 Cierre de posiciones long - Presión vendedora fuerte"
+        elif self.divergence == Divergence.BEARISH:
+            return "⚠️ Alerta: Subida sin respaldo - Posible corrección pronto"
+        elif self.divergence == Divergence.BULLISH:
+            return "💎 Oportunidad: Acumulación en caída - Posible rebote"
+        elif self.trend == OiTrend.STRONG_INCREASING and self.price_change_24h > 0:
+            return "✅ Alto interés del mercado - Momentum positivo"
+        elif self.trend == OiTrend.STRONG_DECREASING:
+            return "⚠️ Pérdida de interés - Volatilidad puede disminuir"
+        else:
+            return "➡️ Sin señales claras de OI"
+    
+    def formatted(self):
+        """
+        Returns:
+            Dict de textos para mostrar (oi_actual, oi_cambio_24h, oi_tendencia,
+            divergencia, interpretacion)
+        """
+        return {
+            'oi_actual': f"{self.current:,.0f}",
+            'oi_cambio_24h': f"{self.change_24h:+.2f}%",
+            'oi_tendencia': self.trend.label,
+            'divergencia': self.divergence.label,
+            'interpretacion': self.interpretation
+        }
@@ -0,0 +1,332 @@
+"""
+Detector de tendencias asíncrono basado en ccxt.async_support
+Lanza en paralelo todas las peticiones de un análisis completo
+"""
+
+import asyncio
+import ccxt.async_support as ccxt_async
+from crypto_trend_detector import CryptoTrendDetector
+from metrics import EXCHANGE_ERRORS, EXCHANGE_LATENCY, OHLCV_REQUESTS, OI_REQUESTS
+from ohlcv_cache import OHLCVCache
+from oi_store import OI_TIMEFRAME
+
+class AsyncCryptoTrendDetector:
+    """
+    Versión asíncrona de CryptoTrendDetector
+    
+    Usa un único cliente ccxt.async_support por instancia, de modo que todas
+    las peticiones comparten la misma sesión HTTP (pool de conexiones
+    keep-alive). Los cálculos de indicadores, tendencias y riesgos los hace
+    un CryptoTrendDetector interno (self.detector) que comparte el cliente
+    pero nunca hace peticiones: solo se exponen sus métodos sin red
+    (CALCULATIONS) y las descargas son siempre las corrutinas de esta clase.
+    
+    Uso:
+        async with AsyncCryptoTrendDetector('bybit') as detector:
+            results = await detector.analyze_multiple_timeframes('BTC/USDT')
+    """
+    
+    # Métodos del detector síncrono que solo calculan (se delegan tal cual)
+    CALCULATIONS = (
+        'calculate_indicators', 'identify_trend', 'identify_trends_bulk', 'analyze_risk_alerts',
+        'calculate_price_levels', 'generate_trading_recommendation', 'generate_consensus',
+    )
+    
+    def __init__(self, exchange_name='bybit', cache_size=512):
+        """
+        Crea el cliente asíncrono (los mercados se cargan con load_markets)
+        
+        Args:
+            exchange_name: Nombre del exchange ('binance', 'bybit', 'okx', etc.)
+            cache_size: Máximo de entradas en la caché OHLCV (0 = sin caché)
+        """
+        self.ohlcv_cache = OHLCVCache(max_entries=cache_size) if cache_size else None
+        
+        try:
+            exchange_class = getattr(ccxt_async, exchange_name)
+            self.exchange_name = exchange_name
+            self.exchange = exchange_class({
+                'enableRateLimit': True,
+                'options': {'defaultType': 'future'}  # Para futuros
+            })
+        except Exception as e:
+            print(f"❌ Error conectando a {exchange_name}: {e}")
+            raise
+        
+        # Cálculos, índice de símbolos y almacén de OI; el throttle de ccxt
+        # asíncrono se conserva (sin planificador de peticiones)
+        self.detector = CryptoTrendDetector(
+            exchange=self.exchange, cache_size=0, lazy_markets=True, rate_limiter=False
+        )
+        self.oi_store = self.detector.oi_store
+    
+    def __getattr__(self, name):
+        if name in type(self).CALCULATIONS:
+            return getattr(self.detector, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+    
+    @classmethod
+    async def create(cls, exchange_name='bybit'):
+        """
+        Crea el detector y carga los mercados
+        
+        Args:
+            exchange_name: Nombre del exchange
+        
+        Returns:
+            Instancia lista para usar
+        """
+        detector = cls(exchange_name)
+        try:
+            await detector.load_markets()
+        except Exception:
+            await detector.close()
+            raise
+        return detector
+    
+    async def load_markets(self, reload=False):
+        """
+        Carga (o recarga) los mercados del exchange
+        
+        Args:
+            reload: Forzar la descarga aunque ya estén cargados
+        """
+        with EXCHANGE_LATENCY.track(EXCHANGE_ERRORS, method='load_markets'):
+            await self.exchange.load_markets(reload)
+        print(f"✅ {len(self.exchange.markets)} mercados cargados")
+    
+    def ensure_markets(self):
+        """Los mercados se cargan con await load_markets() (o create)"""
+        if not self.exchange.markets:
+            raise RuntimeError("Mercados no cargados: usa await detector.load_markets()")
+    
+    def normalize_symbol(self, symbol):
+        """Como CryptoTrendDetector.normalize_symbol (requiere mercados cargados)"""
+        self.ensure_markets()
+        return self.detector.normalize_symbol(symbol)
+    
+    def search_symbol(self, query):
+        """Como CryptoTrendDetector.search_symbol (requiere mercados cargados)"""
+        self.ensure_markets()
+        return self.detector.search_symbol(query)
+    
+    async def close(self):
+        """Cierra la sesión HTTP del cliente"""
+        await self.exchange.close()
+    
+    async def __aenter__(self):
+        if not self.exchange.markets:
+            await self.load_markets()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def get_open_interest(self, symbol):
+        """
+        Obtiene el Open Interest actual del contrato
+        
+        Args:
+            symbol: Par de trading
+        
+        Returns:
+            Dict con información de Open Interest o None
+        """
+        try:
+            if not hasattr(self.exchange, 'fetch_open_interest'):
+                return None
+            
+            with EXCHANGE_LATENCY.track(EXCHANGE_ERRORS, method='fetch_open_interest'):
+                oi_data = await self.exchange.fetch_open_interest(symbol)
+            return self.detector._format_open_interest(oi_data)
+        except Exception as e:
+            return None
+    
+    async def get_open_interest_history(self, symbol, timeframe='1h', limit=100):
+        """
+        Obtiene histórico de Open Interest
+        
+        Args:
+            symbol: Par de trading
+            timeframe: Temporalidad
+            limit: Número de datos
+        
+        Returns:
+            DataFrame con histórico de OI o None
+        """
+        try:
+            if not hasattr(self.exchange, 'fetch_open_interest_history'):
+                return None
+            
+            with EXCHANGE_LATENCY.track(EXCHANGE_ERRORS, method='fetch_open_interest_history'):
+                oi_history = await self.exchange.fetch_open_interest_history(symbol, timeframe, limit=limit)
+            return self.detector._oi_history_to_dataframe(oi_history)
+        except Exception as e:
+            return None
+    
+    async def get_ohlcv_data(self, symbol='BTC/USDT', timeframe='15m', limit=200, use_cache=True):
+        """
+        Obtiene datos OHLCV del exchange
+        
+        Args:
+            symbol: Par de trading (ej: 'BTC/USDT', 'FORM/USDT')
+            timeframe: Temporalidad ('1m', '5m', '15m', '1h', '4h', '1d')
+            limit: Número de velas a obtener
+            use_cache: Reutilizar velas ya descargadas mientras no cierre la vela actual
+        
+        Returns:
+            DataFrame con los datos OHLCV
+        """
+        try:
+            self.ensure_markets()
+            normalized = self.detector._resolve_symbol(symbol)
+            if normalized is None:
+                return None
+            
+            cache = self.ohlcv_cache if use_cache else None
+            if cache is not None:
+                df = cache.get(normalized, timeframe, limit)
+                if df is not None:
+                    OHLCV_REQUESTS.inc(result='hit')
+                    return df
+            OHLCV_REQUESTS.inc(result='miss')
+            
+            print(f"📊 Obteniendo datos de {normalized} ({timeframe})...")
+            with EXCHANGE_LATENCY.track(EXCHANGE_ERRORS, method='fetch_ohlcv'):
+                ohlcv = await self.exchange.fetch_ohlcv(normalized, timeframe, limit=limit)
+            
+            df = self.detector._ohlcv_to_dataframe(ohlcv)
+            
+            if cache is not None:
+                cache.set(normalized, timeframe, limit, df)
+            
+            print(f"✅ {len(df)} velas obtenidas")
+            return df
+        
+        except Exception as e:
+            print(f"❌ Error obteniendo datos: {e}")
+            return None
+    
+    async def get_open_interest_stats(self, symbol):
+        """
+        OI actual, cambio 24h y pendiente 12h desde el almacén de OI
+        (solo se descargan las horas nuevas)
+        
+        Args:
+            symbol: Par de trading
+        
+        Returns:
+            OpenInterestStats o None
+        """
+        if not hasattr(self.exchange, 'fetch_open_interest_history'):
+            return None
+        
+        series = self.oi_store.series(symbol)
+        pending = series.pending()
+        if pending is None:
+            OI_REQUESTS.inc(result='hit')
+            return series.stats
+        OI_REQUESTS.inc(result='miss')
+        
+        try:
+            since, limit = pending
+            with EXCHANGE_LATENCY.track(EXCHANGE_ERRORS, method='fetch_open_interest_history'):
+                oi_history = await self.exchange.fetch_open_interest_history(
+                    symbol, OI_TIMEFRAME, since=since, limit=limit
+                )
+            return series.update(oi_history, replace=since is None)
+        except Exception as e:
+            return None
+    
+    async def analyze_open_interest(self, symbol, df_price):
+        """
+        Analiza el Open Interest en relación con el precio
+        
+        Args:
+            symbol: Par de trading
+            df_price: DataFrame con datos de precio
+        
+        Returns:
+            OpenInterestResult o None
+        """
+        stats = await self.get_open_interest_stats(symbol)
+        if stats is None:
+            return None
+        
+        return self.detector._oi_result(stats, df_price)
+    
+    async def fetch_analysis_data(self, symbol, timeframes=('5m', '15m', '1h', '4h'), limit=200):
+        """
+        Descarga en paralelo todo lo necesario para un análisis completo
+        
+        Las velas de cada timeframe y las horas de OI que falten en el almacén
+        se piden con un único asyncio.gather, así que la latencia total es la
+        de la petición más lenta y no la suma de todas. El precio del análisis
+        de OI son las últimas 100 velas de 1h (se piden aparte solo si 1h no
+        está entre los timeframes).
+        
+        Args:
+            symbol: Par de trading
+            timeframes: Timeframes a descargar
+            limit: Número de velas por timeframe
+        
+        Returns:
+            Tuple (frames, oi_analysis) donde frames es un dict
+            {timeframe: DataFrame o None}
+        """
+        self.ensure_markets()
+        symbol = self.detector._resolve_symbol(symbol)
+        if symbol is None:
+            return {tf: None for tf in timeframes}, None
+        
+        requests = [self.get_open_interest_stats(symbol)]
+        requests += [self.get_ohlcv_data(symbol, tf, limit=limit) for tf in timeframes]
+        if '1h' not in timeframes:
+            requests.append(self.get_ohlcv_data(symbol, '1h', limit=100))
+        
+        responses = await asyncio.gather(*requests, return_exceptions=True)
+        responses = [None if isinstance(r, Exception) else r for r in responses]
+        
+        oi_stats = responses[0]
+        frames = dict(zip(timeframes, responses[1:len(timeframes) + 1]))
+        df_for_oi = frames.get('1h') if '1h' in timeframes else responses[-1]
+        
+        oi_analysis = None
+        if df_for_oi is not None and oi_stats is not None:
+            oi_analysis = self.detector._oi_result(oi_stats, df_for_oi.tail(100))
+        
+        return frames, oi_analysis
+    
+    async def analyze_multiple_timeframes(self, symbol='BTC/USDT'):
+        """
+        Analiza tendencia en múltiples temporalidades (peticiones en paralelo)
+        
+        Args:
+            symbol: Par de trading
+        
+        Returns:
+            Dict con análisis de cada timeframe
+        """
+        detector = self.detector
+        detector._print_header(symbol)
+        
+        frames, oi_analysis = await self.fetch_analysis_data(symbol)
+        
+        results = {}
+        for tf, df in frames.items():
+            if df is None or len(df) == 0:
+                continue
+            try:
+                df = detector.calculate_indicators(df)
+                trend_info = detector.identify_trend(df)
+                if trend_info is not None:
+                    results[tf] = trend_info
+                detector._print_timeframe_result(tf, trend_info)
+            except Exception as e:
+                print(f"⏰ TIMEFRAME: {tf}")
+                print(f"   ⚠️  Error: {e}")
+                print()
+        
+        detector._print_analysis_report(results, oi_analysis)
+        
+        return results
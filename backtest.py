@@ -0,0 +1,709 @@
+"""
+Backtesting vectorizado de las reglas de tendencia y recomendación
+Evalúa identify_trend, analyze_risk_alerts y generate_trading_recommendation en todas las velas del histórico
+"""
+
+import argparse
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ohlcv_cache import timeframe_to_seconds
+from panel_indicators import (
+    CLOSE, HIGH, LOW, OPEN, PANEL_COLUMNS, classify_trend, ema_into, rsi_into, trend_strength_into
+)
+
+# Timeframes de contexto (los mismos que /analizar); se usan los mayores que
+# el timeframe del backtest
+BACKTEST_TIMEFRAMES = ['5m', '15m', '1h', '4h']
+
+# Velas mínimas de un timeframe para que identify_trend dé resultado
+MIN_CANDLES = 50
+
+# Ventanas de calculate_price_levels: soportes/resistencias y último mínimo/máximo
+LEVELS_WINDOW = 50
+SWING_WINDOW = 10
+
+# Acciones de generate_trading_recommendation por nivel de riesgo
+ACTION_LABELS = [
+    "✅ CONDICIONES FAVORABLES",
+    "⚡ OPERAR CON CAUTELA",
+    "⚠️ EXTREMA PRECAUCIÓN",
+    "🛑 NO OPERAR",
+]
+
+# Histórico descargado por load_history
+HISTORY_DIR = os.path.join('data', 'history')
+
+@dataclass(frozen=True)
+class IndicatorParams:
+    """
+    Periodos de los indicadores de las reglas
+    
+    Los valores por defecto son los de calculate_indicators. La EMA 200 y
+    los umbrales de RSI 70/30 y ADX 25 no intervienen en la tendencia ni
+    en el riesgo, así que no son parámetros.
+    """
+    
+    ema_fast: int = 9      # ema_9 del ema_score
+    ema_mid: int = 21      # ema_21 (también la entrada moderada)
+    ema_slow: int = 50     # ema_50 (también la entrada conservadora)
+    rsi_period: int = 14
+    atr_period: int = 14   # ATR y ADX/DI
+
+@dataclass(frozen=True)
+class RiskRules:
+    """
+    Umbrales de analyze_risk_alerts y generate_trading_recommendation
+    
+    Los valores por defecto son los que usa CryptoTrendDetector.
+    """
+    
+    rsi_extreme_high: float = 85     # RSI extremo en un timeframe
+    rsi_extreme_low: float = 15
+    avg_rsi_high: float = 75         # RSI medio de todos los timeframes
+    avg_rsi_low: float = 25
+    atr_elevated: float = 3.0        # ATR en % del precio
+    atr_high: float = 5.0
+    adx_weak: float = 20
+    adx_exhausted: float = 60
+    risk_caution: int = 4            # risk_score a partir del que cambia la acción
+    risk_extreme: int = 7
+    risk_no_trade: int = 10
+
+@dataclass(frozen=True)
+class BacktestConfig:
+    """Cómo se ejecutan las señales"""
+    
+    entry: str = 'agresiva'    # agresiva (cierre de la vela), moderada o conservadora (orden límite)
+    take_profit: str = 'tp2'   # tp1, tp2 o tp3 de calculate_price_levels
+    max_action: int = 1        # Acción máxima que se opera (índice de ACTION_LABELS)
+    entry_timeout: int = 12    # Velas que espera una orden límite antes de cancelarse
+    max_holding: int = 288     # Velas máximas en posición (se cierra al cierre de la última)
+    fee: float = 0.00055       # Comisión por lado (fracción del precio)
+    risk_per_trade: float = 0.01  # Fracción del capital arriesgada por operación (drawdown en %)
+
+def resample_ohlcv(df, timeframe):
+    """
+    Agrega velas a un timeframe mayor (velas alineadas con el epoch, como en los exchanges)
+    
+    Se descarta la primera vela si el histórico empieza a mitad de su periodo.
+    
+    Args:
+        df: DataFrame OHLCV indexado por tiempo
+        timeframe: Timeframe de destino
+    
+    Returns:
+        DataFrame OHLCV del timeframe pedido
+    """
+    resampled = df.resample(f"{timeframe_to_seconds(timeframe)}s", label='left', closed='left', origin='epoch')
+    agg = resampled.agg({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+    agg = agg.dropna(subset=['close'])
+    if len(agg) and agg.index[0] < df.index[0]:
+        agg = agg.iloc[1:]
+    return agg
+
+def _timestamps_ms(index):
+    return index.values.astype('datetime64[ms]').astype(np.int64)
+
+class SeriesIndicators:
+    """
+    Indicadores de una serie calculados una sola vez por periodo
+    
+    Las EMAs, el RSI y ATR/ADX se guardan por periodo, así que los juegos
+    de IndicatorParams que comparten un periodo reutilizan el mismo array.
+    """
+    
+    def __init__(self, df):
+        """
+        Args:
+            df: DataFrame OHLCV indexado por tiempo
+        """
+        values = df[PANEL_COLUMNS].to_numpy(dtype=np.float64)
+        self.high = values[None, :, HIGH]
+        self.low = values[None, :, LOW]
+        self.close = values[None, :, CLOSE]
+        self._cache = {}
+    
+    def __len__(self):
+        return self.close.shape[1]
+    
+    def _cached(self, key, compute):
+        value = self._cache.get(key)
+        if value is None:
+            value = self._cache[key] = compute()
+        return value
+    
+    def ema(self, span):
+        return self._cached(('ema', span), lambda: ema_into(self.close, span, np.empty_like(self.close))[0])
+    
+    def rsi(self, period):
+        return self._cached(('rsi', period), lambda: rsi_into(self.close, period, np.empty_like(self.close))[0])
+    
+    def trend_strength(self, period):
+        """Dict con atr, plus_di, minus_di y adx del periodo"""
+        def compute():
+            out = {name: np.empty_like(self.close) for name in ('atr', 'plus_di', 'minus_di', 'adx')}
+            trend_strength_into(self.high, self.low, self.close, period, out)
+            return {name: values[0] for name, values in out.items()}
+        return self._cached(('trend_strength', period), compute)
+    
+    def macd(self):
+        """Tuple (macd, macd_signal) con los periodos fijos 12/26/9"""
+        def compute():
+            macd = self.ema(12) - ema_into(self.close, 26, np.empty_like(self.close))[0]
+            return macd, ema_into(macd[None], 9, np.empty_like(self.close))[0]
+        return self._cached(('macd',), compute)
+    
+    def trend(self, params):
+        """Código de tendencia de identify_trend en cada vela"""
+        def compute():
+            macd, macd_signal = self.macd()
+            indicators = {
+                'ema_9': self.ema(params.ema_fast),
+                'ema_21': self.ema(params.ema_mid),
+                'ema_50': self.ema(params.ema_slow),
+                'macd': macd,
+                'macd_signal': macd_signal,
+                'rsi': self.rsi(params.rsi_period),
+                **self.trend_strength(params.atr_period),
+            }
+            return classify_trend(self.close[0], indicators)['trend']
+        key = ('trend', params.ema_fast, params.ema_mid, params.ema_slow, params.atr_period)
+        return self._cached(key, compute)
+
+class HistoryIndicators:
+    """
+    Histórico de un símbolo preparado para evaluar muchos juegos de parámetros
+    
+    Los timeframes de contexto se agregan a partir de las velas base una
+    sola vez. En cada vela base se usa la última vela cerrada de cada
+    timeframe mayor (sin mirar al futuro); un timeframe con menos de
+    MIN_CANDLES velas cerradas cuenta como ausente, igual que cuando
+    identify_trend devuelve None.
+    """
+    
+    def __init__(self, df, timeframe, timeframes=None):
+        """
+        Args:
+            df: DataFrame OHLCV indexado por tiempo (formato de get_ohlcv_data)
+            timeframe: Timeframe de las velas de df
+            timeframes: Timeframes de contexto (default: BACKTEST_TIMEFRAMES > timeframe)
+        """
+        base_seconds = timeframe_to_seconds(timeframe)
+        if timeframes is None:
+            timeframes = [tf for tf in BACKTEST_TIMEFRAMES if timeframe_to_seconds(tf) > base_seconds]
+        self.timeframes = [timeframe] + [tf for tf in timeframes if tf != timeframe]
+        self.timestamps = _timestamps_ms(df.index)
+        values = df[PANEL_COLUMNS].to_numpy(dtype=np.float64)
+        self.prices = {name: values[:, column] for name, column in
+                       (('open', OPEN), ('high', HIGH), ('low', LOW), ('close', CLOSE))}
+        
+        # (serie, posición de su última vela cerrada en cada vela base, tiene valor)
+        base_valid = np.zeros(len(df), dtype=bool)
+        base_valid[MIN_CANDLES - 1:] = True
+        self.series = [(SeriesIndicators(df), None, base_valid)]
+        for tf in self.timeframes[1:]:
+            higher = resample_ohlcv(df, tf)
+            if len(higher) < MIN_CANDLES:
+                self.series.append((None, None, np.zeros(len(df), dtype=bool)))
+                continue
+            # Una vela de tf está disponible al cierre de su última vela base
+            available = _timestamps_ms(higher.index) + (timeframe_to_seconds(tf) - base_seconds) * 1000
+            position = np.searchsorted(available, self.timestamps, side='right') - 1
+            self.series.append((SeriesIndicators(higher), np.maximum(position, 0), position >= MIN_CANDLES - 1))
+        self._levels = None
+    
+    def levels(self):
+        """
+        Soportes y resistencias de calculate_price_levels en cada vela (solo dependen del precio)
+        
+        Returns:
+            Dict de arrays: resistance y support (percentiles 90 y 10 de las
+            últimas LEVELS_WINDOW velas), last_low y last_high (SWING_WINDOW velas);
+            nan en las primeras velas
+        """
+        if self._levels is None:
+            high = self.prices['high']
+            low = self.prices['low']
+            levels = {name: np.full(len(high), np.nan) for name in ('resistance', 'support', 'last_low', 'last_high')}
+            if len(high) >= LEVELS_WINDOW:
+                start = LEVELS_WINDOW - 1
+                levels['resistance'][start:] = np.percentile(sliding_window_view(high, LEVELS_WINDOW), 90, axis=1)
+                levels['support'][start:] = np.percentile(sliding_window_view(low, LEVELS_WINDOW), 10, axis=1)
+            if len(high) >= SWING_WINDOW:
+                start = SWING_WINDOW - 1
+                levels['last_low'][start:] = sliding_window_view(low, SWING_WINDOW).min(axis=1)
+                levels['last_high'][start:] = sliding_window_view(high, SWING_WINDOW).max(axis=1)
+            self._levels = levels
+        return self._levels
+    
+    def signals(self, params=None):
+        """
+        Evalúa identify_trend en todas las velas de todos los timeframes
+        
+        Args:
+            params: IndicatorParams (default: los periodos de calculate_indicators)
+        
+        Returns:
+            Dict de arrays alineados con las velas base: trend, rsi y valid
+            con forma (timeframes, velas); open, high, low, close, atr, adx,
+            ema_mid, ema_slow y los niveles de levels() del timeframe base;
+            timestamps en ms y la lista timeframes
+        """
+        params = params or IndicatorParams()
+        n = len(self.timestamps)
+        trend = np.zeros((len(self.series), n), dtype=np.int8)
+        rsi = np.full((len(self.series), n), np.nan)
+        valid = np.zeros((len(self.series), n), dtype=bool)
+        
+        for k, (series, position, has_value) in enumerate(self.series):
+            valid[k] = has_value
+            if series is None:
+                continue
+            series_trend = series.trend(params)
+            series_rsi = series.rsi(params.rsi_period)
+            if position is None:
+                trend[k] = series_trend
+                rsi[k] = series_rsi
+            else:
+                trend[k] = np.where(has_value, series_trend[position], 0)
+                rsi[k] = np.where(has_value, series_rsi[position], np.nan)
+        
+        base = self.series[0][0]
+        strength = base.trend_strength(params.atr_period)
+        return {
+            'timeframes': self.timeframes,
+            'timestamps': self.timestamps,
+            'trend': trend,
+            'rsi': rsi,
+            'valid': valid,
+            **self.prices,
+            'atr': strength['atr'],
+            'adx': strength['adx'],
+            'ema_mid': base.ema(params.ema_mid),
+            'ema_slow': base.ema(params.ema_slow),
+            **self.levels(),
+        }
+
+def compute_signals(df, timeframe, timeframes=None, params=None):
+    """
+    Evalúa identify_trend en todas las velas del timeframe base y de los de contexto
+    
+    Args:
+        df: DataFrame OHLCV indexado por tiempo (formato de get_ohlcv_data)
+        timeframe: Timeframe de las velas de df
+        timeframes: Timeframes de contexto (default: BACKTEST_TIMEFRAMES > timeframe)
+        params: IndicatorParams
+    
+    Returns:
+        Dict de HistoryIndicators.signals
+    """
+    return HistoryIndicators(df, timeframe, timeframes).signals(params)
+
+def risk_scores(signals, rules=None):
+    """
+    Reglas de analyze_risk_alerts y generate_trading_recommendation en todas las velas
+    
+    El timeframe base hace de timeframe actual (ATR y ADX). Sin histórico
+    de Open Interest no hay divergencias, así que esas alertas no suman.
+    
+    Args:
+        signals: Dict de compute_signals
+        rules: RiskRules (default: los umbrales del detector)
+    
+    Returns:
+        Dict de arrays por vela: risk_score, consensus (1 alcista, -1 bajista,
+        0 neutral), action (índice de ACTION_LABELS) y avg_rsi
+    """
+    rules = rules or RiskRules()
+    valid = signals['valid']
+    rsi = signals['rsi']
+    close = signals['close']
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # 1. RSI
+        total = valid.sum(axis=0)
+        avg_rsi = np.where(valid, rsi, 0.0).sum(axis=0) / np.maximum(total, 1)
+        critical = (valid & ((rsi > rules.rsi_extreme_high) | (rsi < rules.rsi_extreme_low))).sum(axis=0)
+        score = np.select(
+            [
+                critical >= 3,
+                critical >= 2,
+                (avg_rsi > rules.avg_rsi_high) | (avg_rsi < rules.avg_rsi_low),
+            ],
+            [4, 3, 2],
+            0
+        )
+        
+        # 3. Volatilidad (ATR en % del precio)
+        atr_percentage = np.where(close > 0, signals['atr'] / close * 100, np.nan)
+        score += np.select([atr_percentage > rules.atr_high, atr_percentage > rules.atr_elevated], [3, 2], 0)
+        
+        # 4. Fuerza de tendencia (ADX)
+        adx = signals['adx']
+        score += np.select([adx < rules.adx_weak, adx > rules.adx_exhausted], [2, 3], 0)
+    
+    # 5. Consenso entre timeframes
+    bullish = (valid & (signals['trend'] > 0)).sum(axis=0)
+    bearish = (valid & (signals['trend'] < 0)).sum(axis=0)
+    unanimous = (bullish == total) | (bearish == total)
+    score += np.where(total >= 3, np.where(unanimous, 1, np.where(np.abs(bullish - bearish) <= 1, 3, 0)), 0)
+    
+    action = np.select(
+        [score >= rules.risk_no_trade, score >= rules.risk_extreme, score >= rules.risk_caution],
+        [3, 2, 1],
+        0
+    )
+    return {
+        'risk_score': score,
+        'consensus': np.sign(bullish - bearish).astype(np.int8),
+        'action': action,
+        'avg_rsi': avg_rsi,
+    }
+
+def price_levels(signals, idx, direction):
+    """
+    calculate_price_levels en las velas idx
+    
+    Args:
+        signals: Dict de compute_signals
+        idx: Índices de las velas (>= LEVELS_WINDOW - 1)
+        direction: 1 (LONG) o -1 (SHORT) para cada vela
+    
+    Returns:
+        Dict de arrays: agresiva, moderada, conservadora, stop_loss, tp1, tp2, tp3
+    """
+    price = signals['close'][idx]
+    atr = signals['atr'][idx]
+    long = direction > 0
+    
+    # Resistencia/soporte 1 (percentiles de las últimas 50 velas) y último mínimo/máximo
+    resistance = signals['resistance'][idx]
+    support = signals['support'][idx]
+    last_low = signals['last_low'][idx]
+    last_high = signals['last_high'][idx]
+    
+    swing = np.where(long, last_low, last_high)
+    fibonacci_50 = price - (price - swing) * 0.5
+    fibonacci_618 = price - (price - swing) * 0.618
+    ema_mid = signals['ema_mid'][idx]
+    ema_slow = signals['ema_slow'][idx]
+    
+    stop_loss = np.where(long, np.maximum(last_low - atr * 0.5, price - atr * 2),
+                         np.minimum(last_high + atr * 0.5, price + atr * 2))
+    risk = price - stop_loss  # Negativo en SHORT: los TPs quedan por debajo
+    return {
+        'agresiva': price,
+        'moderada': np.where(long, np.minimum(ema_mid, fibonacci_50), np.maximum(ema_mid, fibonacci_50)),
+        'conservadora': np.where(long, np.minimum(ema_slow, fibonacci_618), np.maximum(ema_slow, fibonacci_618)),
+        'stop_loss': stop_loss,
+        'tp1': price + risk * 1.5,
+        'tp2': price + risk * 2.5,
+        'tp3': np.where(long, np.minimum(resistance, price + risk * 4), np.maximum(support, price + risk * 4)),
+    }
+
+def simulate_trades(signals, scores, config=None):
+    """
+    Ejecuta las señales de una en una (una sola orden o posición a la vez)
+    
+    Una señal es una vela con consenso alcista o bajista cuya acción no
+    supera config.max_action. La entrada agresiva se ejecuta al cierre de
+    la vela de la señal; las otras son órdenes límite que esperan
+    config.entry_timeout velas. Si una vela toca el stop y el objetivo se
+    asume que el stop llegó antes; en la vela en que se llena una orden
+    límite solo se comprueba el stop.
+    
+    Args:
+        signals: Dict de compute_signals
+        scores: Dict de risk_scores
+        config: BacktestConfig
+    
+    Returns:
+        Tuple (trades, stats): DataFrame con una fila por operación y dict
+        con el número de señales y de setups descartados
+    """
+    config = config or BacktestConfig()
+    n = len(signals['close'])
+    candidate = (
+        signals['valid'][0]
+        & (scores['consensus'] != 0)
+        & (scores['action'] <= config.max_action)
+        & np.isfinite(signals['atr'])
+    )
+    idx = np.flatnonzero(candidate)
+    direction = scores['consensus'][idx].astype(np.int64)
+    levels = price_levels(signals, idx, direction)
+    entry = levels[config.entry]
+    stop = levels['stop_loss']
+    target = levels[config.take_profit]
+    
+    # Setups sin sentido (stop o objetivo al otro lado de la entrada) se descartan
+    usable = ((entry - stop) * direction > 0) & ((target - entry) * direction > 0)
+    discarded = int((~usable).sum())
+    idx, direction, entry, stop, target = idx[usable], direction[usable], entry[usable], stop[usable], target[usable]
+    
+    opens, highs, lows, closes = signals['open'], signals['high'], signals['low'], signals['close']
+    limit_order = config.entry != 'agresiva'
+    rows = []
+    k = 0
+    while k < len(idx):
+        i = idx[k]
+        d = direction[k]
+        
+        if limit_order:
+            window = slice(i + 1, min(i + 1 + config.entry_timeout, n))
+            touched = lows[window] <= entry[k] if d > 0 else highs[window] >= entry[k]
+            if not touched.any():
+                # Orden cancelada: la siguiente señal se busca después de su plazo
+                k = np.searchsorted(idx, window.stop, side='left')
+                continue
+            fill = window.start + int(touched.argmax())
+            price = min(entry[k], opens[fill]) if d > 0 else max(entry[k], opens[fill])
+            start = fill
+        else:
+            fill = i
+            price = entry[k]
+            start = i + 1
+        
+        stop_price, target_price = stop[k], target[k]
+        end = min(start + config.max_holding, n)
+        if d > 0:
+            stop_hit = lows[start:end] <= stop_price
+            target_hit = highs[start:end] >= target_price
+        else:
+            stop_hit = highs[start:end] >= stop_price
+            target_hit = lows[start:end] <= target_price
+        if limit_order and len(target_hit):
+            target_hit[0] = False
+        
+        hit = stop_hit | target_hit
+        if hit.any():
+            exit_index = start + int(hit.argmax())
+            if stop_hit[exit_index - start]:
+                reason = 'stop'
+                # Si la vela abre más allá del stop, se sale a la apertura
+                exit_price = stop_price
+                if exit_index != fill:
+                    exit_price = min(stop_price, opens[exit_index]) if d > 0 else max(stop_price, opens[exit_index])
+            else:
+                reason = 'target'
+                exit_price = target_price
+        elif end > start:
+            exit_index = end - 1
+            exit_price = closes[exit_index]
+            reason = 'timeout' if end - start == config.max_holding else 'end'
+        else:
+            break
+        
+        risk = abs(price - stop_price)
+        r_multiple = d * (exit_price - price) / risk - config.fee * (price + exit_price) / risk
+        rows.append((
+            signals['timestamps'][i], signals['timestamps'][exit_index], 'LONG' if d > 0 else 'SHORT',
+            price, stop_price, target_price, exit_price, reason, r_multiple, exit_index - fill,
+            int(scores['risk_score'][i]), int(scores['action'][i])
+        ))
+        k = np.searchsorted(idx, exit_index + 1, side='left')
+    
+    trades = pd.DataFrame(rows, columns=[
+        'entry_time', 'exit_time', 'side', 'entry', 'stop_loss', 'target', 'exit',
+        'reason', 'r', 'bars', 'risk_score', 'action'
+    ])
+    for column in ('entry_time', 'exit_time'):
+        trades[column] = pd.to_datetime(trades[column], unit='ms')
+    return trades, {'signals': int(candidate.sum()), 'discarded': discarded}
+
+def summarize_trades(trades, risk_per_trade=0.01):
+    """
+    Estadísticas de un backtest
+    
+    Args:
+        trades: DataFrame de simulate_trades
+        risk_per_trade: Fracción del capital arriesgada por operación
+    
+    Returns:
+        Dict con operaciones, win rate, R medio y total, profit factor,
+        drawdown máximo (en R y en % con interés compuesto) y salidas por motivo
+    """
+    r = trades['r'].to_numpy(dtype=float)
+    if len(r) == 0:
+        return {'trades': 0}
+    
+    cumulative = np.cumsum(r)
+    drawdown_r = np.max(np.maximum.accumulate(np.r_[0.0, cumulative])[1:] - cumulative)
+    equity = np.cumprod(1 + risk_per_trade * r)
+    drawdown_pct = np.max(1 - equity / np.maximum.accumulate(np.r_[1.0, equity])[1:]) * 100
+    gains = r[r > 0].sum()
+    losses = -r[r < 0].sum()
+    
+    stats = {
+        'trades': int(len(r)),
+        'win_rate': float((r > 0).mean()),
+        'avg_r': float(r.mean()),
+        'total_r': float(cumulative[-1]),
+        'profit_factor': float(gains / losses) if losses > 0 else None,
+        'max_drawdown_r': float(drawdown_r),
+        'max_drawdown_pct': float(drawdown_pct),
+        'return_pct': float((equity[-1] - 1) * 100),
+        'avg_bars': float(trades['bars'].mean()),
+        'exits': trades['reason'].value_counts().to_dict(),
+    }
+    for side in ('LONG', 'SHORT'):
+        side_r = r[(trades['side'] == side).to_numpy()]
+        stats[side.lower()] = {
+            'trades': int(len(side_r)),
+            'win_rate': float((side_r > 0).mean()) if len(side_r) else None,
+            'avg_r': float(side_r.mean()) if len(side_r) else None,
+        }
+    return stats
+
+def run_backtest(df, timeframe, config=None, rules=None, timeframes=None, params=None):
+    """
+    Backtest completo de un símbolo
+    
+    Args:
+        df: DataFrame OHLCV indexado por tiempo
+        timeframe: Timeframe de las velas de df
+        config: BacktestConfig
+        rules: RiskRules
+        timeframes: Timeframes de contexto (default: BACKTEST_TIMEFRAMES > timeframe)
+        params: IndicatorParams
+    
+    Returns:
+        Dict con timeframe, timeframes, candles, start, end, signals,
+        discarded, trades (DataFrame), stats y elapsed (segundos)
+    """
+    config = config or BacktestConfig()
+    started = time.time()
+    signals = compute_signals(df, timeframe, timeframes, params)
+    scores = risk_scores(signals, rules)
+    trades, counts = simulate_trades(signals, scores, config)
+    return {
+        'timeframe': timeframe,
+        'timeframes': signals['timeframes'],
+        'candles': len(df),
+        'start': df.index[0] if len(df) else None,
+        'end': df.index[-1] if len(df) else None,
+        **counts,
+        'trades': trades,
+        'stats': summarize_trades(trades, config.risk_per_trade),
+        'elapsed': time.time() - started
+    }
+
+def load_history(detector, symbol, timeframe, days, data_dir=HISTORY_DIR):
+    """
+    Velas cerradas de los últimos `days` días, guardadas en disco entre ejecuciones
+    
+    Solo se descargan (paginando) las velas posteriores a las guardadas;
+    si el fichero no llega tan atrás se descarga todo de nuevo.
+    
+    Args:
+        detector: Instancia de CryptoTrendDetector
+        symbol: Símbolo normalizado
+        timeframe: Timeframe de las velas
+        days: Días de histórico
+        data_dir: Directorio de los ficheros .npy (None = sin guardar)
+    
+    Returns:
+        DataFrame OHLCV indexado por tiempo
+    """
+    period_ms = timeframe_to_seconds(timeframe) * 1000
+    now_ms = int(time.time() * 1000)
+    since = (now_ms - int(days * 86400 * 1000)) // period_ms * period_ms
+    
+    path = None
+    stored = np.empty((0, 6))
+    if data_dir:
+        name = f"{detector.exchange.id}_{symbol.replace('/', '').replace(':', '_')}_{timeframe}.npy"
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            stored = np.load(path)
+    if len(stored) == 0 or stored[0, 0] > since:
+        stored = np.empty((0, 6))
+    
+    start = int(stored[-1, 0]) + period_ms if len(stored) else since
+    missing = (now_ms - start) // period_ms + 1
+    if missing > 0:
+        print(f"📥 Descargando {missing} velas de {symbol} ({timeframe})...")
+        fetched = np.array(detector._fetch_ohlcv_since(symbol, timeframe, start, missing), dtype=float).reshape(-1, 6)
+        # La vela en formación no se guarda
+        fetched = fetched[fetched[:, 0] + period_ms <= now_ms]
+        stored = np.concatenate([stored, fetched[fetched[:, 0] >= start]])
+        if path:
+            os.makedirs(data_dir, exist_ok=True)
+            np.save(path, stored)
+    
+    stored = stored[stored[:, 0] >= since]
+    return detector._ohlcv_to_dataframe(stored.tolist())
+
+def print_report(symbol, result):
+    stats = result['stats']
+    print(f"\n📊 BACKTEST {symbol} ({result['timeframe']}, contexto {', '.join(result['timeframes'][1:]) or '-'})")
+    print(f"   {result['candles']:,} velas: {result['start']} → {result['end']}")
+    print(f"   {result['signals']:,} velas con señal, {result['discarded']:,} setups descartados")
+    print(f"   ⏱️  {result['elapsed']:.2f}s")
+    if not stats['trades']:
+        print("\n⚠️  Ninguna operación")
+        return
+    
+    profit_factor = f"{stats['profit_factor']:.2f}" if stats['profit_factor'] is not None else "-"
+    print(f"\n   Operaciones:     {stats['trades']} ({stats['long']['trades']} LONG, {stats['short']['trades']} SHORT)")
+    print(f"   Win rate:        {stats['win_rate']:.1%}")
+    print(f"   R medio:         {stats['avg_r']:+.3f}R (total {stats['total_r']:+.1f}R)")
+    print(f"   Profit factor:   {profit_factor}")
+    print(f"   Drawdown máx.:   {stats['max_drawdown_r']:.1f}R / {stats['max_drawdown_pct']:.1f}%")
+    print(f"   Rentabilidad:    {stats['return_pct']:+.1f}%")
+    print(f"   Velas por op.:   {stats['avg_bars']:.1f}")
+    print(f"   Salidas:         {', '.join(f'{reason} {count}' for reason, count in stats['exits'].items())}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backtest de las reglas de tendencia y recomendación")
+    parser.add_argument('symbol', help="Símbolo (BTC/USDT, BTCUSDT...)")
+    parser.add_argument('--exchange', default='bybit', help="Exchange de ccxt (default: bybit)")
+    parser.add_argument('--timeframe', default='5m', help="Timeframe de ejecución (default: %(default)s)")
+    parser.add_argument('--days', type=float, default=365, help="Días de histórico (default: %(default)s)")
+    parser.add_argument('--context', help="Timeframes de contexto separados por comas "
+                                          "(default: los de /analizar mayores que --timeframe)")
+    parser.add_argument('--entry', default='agresiva', choices=['agresiva', 'moderada', 'conservadora'])
+    parser.add_argument('--tp', default='tp2', choices=['tp1', 'tp2', 'tp3'], help="Objetivo de salida")
+    parser.add_argument('--max-action', type=int, default=1, choices=range(len(ACTION_LABELS)),
+                        help="Acción máxima operada: 0 favorables, 1 cautela, 2 extrema precaución, 3 todas")
+    parser.add_argument('--max-holding', type=int, default=288, help="Velas máximas en posición")
+    parser.add_argument('--fee', type=float, default=0.00055, help="Comisión por lado (default: %(default)s)")
+    parser.add_argument('--data-dir', default=HISTORY_DIR, help="Directorio del histórico descargado")
+    parser.add_argument('--trades', help="Guardar las operaciones en este CSV")
+    return parser.parse_args()
+
+def main():
+    # El detector solo hace falta para descargar
+    from crypto_trend_detector import CryptoTrendDetector
+    
+    args = parse_args()
+    detector = CryptoTrendDetector(exchange_name=args.exchange, cache_size=0)
+    symbol = detector.normalize_symbol(args.symbol)
+    if symbol is None:
+        print(f"❌ No se encontró el símbolo '{args.symbol}'")
+        return 1
+    
+    df = load_history(detector, symbol, args.timeframe, args.days, args.data_dir)
+    if len(df) < LEVELS_WINDOW:
+        print(f"❌ Solo {len(df)} velas de {symbol}: no hay histórico suficiente")
+        return 1
+    
+    config = BacktestConfig(entry=args.entry, take_profit=args.tp, max_action=args.max_action,
+                            max_holding=args.max_holding, fee=args.fee)
+    context = [tf.strip() for tf in args.context.split(',') if tf.strip()] if args.context else None
+    result = run_backtest(df, args.timeframe, config, timeframes=context)
+    print_report(symbol, result)
+    
+    if args.trades:
+        result['trades'].to_csv(args.trades, index=False)
+        print(f"\n💾 Operaciones guardadas en {args.trades}")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,124 @@
+"""
+Análisis multi-timeframe de muchos símbolos
+Descargas en un pool de threads compartido y cálculo en un pool de procesos
+"""
+
+import contextlib
+import functools
+import io
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from compact_candles import as_dataframe
+from crypto_trend_detector import CryptoTrendDetector
+
+# Timeframes analizados (los mismos que analyze_multiple_timeframes)
+BATCH_TIMEFRAMES = ['5m', '15m', '1h', '4h']
+
+# Detector de cada proceso del pool: solo se usa para calcular, nunca descarga
+_worker_detector = None
+
+def _init_worker(exchange_name):
+    global _worker_detector
+    # Sin el mensaje de conexión de cada proceso
+    with contextlib.redirect_stdout(io.StringIO()):
+        _worker_detector = CryptoTrendDetector(exchange_name, cache_size=0, lazy_markets=True)
+
+def _fetch_symbol(detector, symbol, timeframes, limit, open_interest):
+    """
+    Descarga las velas de todos los timeframes de un símbolo (pool de threads)
+    
+    Returns:
+        Tuple (frames, df_oi): dict {timeframe: DataFrame} y el histórico de OI o None
+    """
+    frames = {tf: detector.load_ohlcv_with_retry(symbol, tf, limit) for tf in timeframes}
+    df_oi = None
+    if open_interest and '1h' in frames:
+        df_oi = detector.get_open_interest_history(symbol, '1h', limit=100)
+    return frames, df_oi
+
+def _analyze_symbol(symbol, frames, df_oi):
+    """
+    Indicadores, tendencias, riesgos y recomendación de un símbolo (pool de procesos)
+    
+    Returns:
+        Dict con symbol, results, oi_analysis, risk_analysis y recommendation
+    """
+    detector = _worker_detector
+    results = {}
+    for tf, df in frames.items():
+        if df is None or len(df) < 50:
+            continue
+        trend_info = detector.identify_trend(detector.calculate_indicators(as_dataframe(df)))
+        if trend_info is not None:
+            results[tf] = trend_info
+    
+    oi_analysis = None
+    if df_oi is not None and frames.get('1h') is not None:
+        oi_analysis = detector.analyze_open_interest_history(df_oi, frames['1h'])
+    
+    risk_analysis = detector.analyze_risk_alerts(results, oi_analysis)
+    recommendation = detector.generate_trading_recommendation(results, oi_analysis, risk_analysis)
+    return {
+        'symbol': symbol,
+        'results': results,
+        'oi_analysis': oi_analysis,
+        'risk_analysis': risk_analysis,
+        'recommendation': recommendation
+    }
+
+def analyze_symbols(detector, symbols, timeframes=None, limit=200, workers=None,
+                    fetch_workers=8, open_interest=True):
+    """
+    Analiza muchos símbolos en todos los timeframes y devuelve cada uno al terminar
+    
+    Las descargas de todos los símbolos comparten un pool de threads
+    (respetando el rate limit del detector); en cuanto un símbolo tiene
+    todas sus velas, el cálculo de indicadores pasa a un pool de procesos,
+    así que la descarga de unos símbolos se solapa con el cálculo de otros.
+    Los procesos se crean con 'spawn' para no heredar los locks de los
+    threads de descarga.
+    
+    Args:
+        detector: CryptoTrendDetector usado para las descargas
+        symbols: Lista de símbolos normalizados
+        timeframes: Timeframes a analizar (default: BATCH_TIMEFRAMES)
+        limit: Velas por símbolo y timeframe
+        workers: Procesos de cálculo (default: número de CPUs)
+        fetch_workers: Descargas simultáneas
+        open_interest: Incluir el análisis de Open Interest (con velas de 1h)
+    
+    Yields:
+        Dict de cada símbolo en orden de finalización (con 'error' si falló)
+    """
+    timeframes = list(timeframes or BATCH_TIMEFRAMES)
+    finished = queue.Queue()
+    
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                initializer=_init_worker, initargs=(detector.exchange.id,)) as process_pool:
+        
+        def on_fetched(future, symbol):
+            try:
+                frames, df_oi = future.result()
+                analysis = process_pool.submit(_analyze_symbol, symbol, frames, df_oi)
+            except Exception as e:
+                finished.put((symbol, None, e))
+                return
+            analysis.add_done_callback(lambda done: finished.put((symbol, done, None)))
+        
+        for symbol in symbols:
+            future = fetch_pool.submit(_fetch_symbol, detector, symbol, timeframes, limit, open_interest)
+            future.add_done_callback(functools.partial(on_fetched, symbol=symbol))
+        
+        for _ in range(len(symbols)):
+            symbol, future, error = finished.get()
+            if future is not None:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'symbol': symbol, 'error': str(e)}
+            else:
+                result = {'symbol': symbol, 'error': str(error)}
+            yield result
@@ -0,0 +1,563 @@
+"""
+Benchmark del pipeline de análisis
+Reproduce velas y Open Interest grabados con un exchange simulado (sin red)
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from crypto_trend_detector import CryptoTrendDetector
+from ohlcv_cache import timeframe_to_seconds
+
+DEFAULT_CANDLES = [200, 1000, 10000, 100000]
+DEFAULT_SYMBOLS = [1, 10, 100, 1000]
+
+# Los escenarios con más velas x símbolos se omiten (100k velas x 1000 símbolos
+# no cabe en memoria); se puede subir con --max-rows
+MAX_ROWS = 10_000_000
+
+# Etapas medidas para cada símbolo, en orden de ejecución
+STAGES = [
+    'fetch',
+    'calculate_indicators',
+    'identify_trend',
+    'analyze_open_interest',
+    'analyze_risk_alerts',
+    'calculate_price_levels',
+    'full_analysis',
+]
+
+BENCHMARK_DIR = 'benchmarks'
+FIXTURE_DIR = os.path.join(BENCHMARK_DIR, 'fixtures')
+
+# Fixture por defecto (velas de 5m y OI de BTCUSDT del stream de Bybit,
+# convertido con --from-stream); 'synthetic' usa el paseo aleatorio
+DEFAULT_FIXTURE = os.path.join(FIXTURE_DIR, 'bybit_btcusdt_5m.npz')
+STREAM_FIXTURE = os.path.join('tests', 'fixtures', 'bybit_kline_5m_btcusdt.jsonl')
+
+# Variantes de cada serie (desfases dentro del fixture) repartidas entre los símbolos
+SERIES_VARIANTS = 4
+
+class Fixture:
+    """
+    Velas y Open Interest grabados, guardados como movimientos relativos
+    
+    Cada vela se guarda dividida por el cierre anterior (open, high, low,
+    close) junto con su volumen, y cada valor de OI dividido por el
+    anterior. Así la serie se puede reproducir con cualquier longitud
+    (repitiéndola) y con un precio inicial distinto para cada símbolo.
+    """
+    
+    def __init__(self, name, candles, oi):
+        """
+        Args:
+            name: Nombre del fixture (se guarda en los resultados)
+            candles: Array (velas, 5) con open/high/low/close relativos y volumen
+            oi: Array con los cambios relativos del Open Interest
+        """
+        self.name = name
+        self.candles = candles
+        self.oi = oi
+    
+    @classmethod
+    def synthetic(cls, n=5000, seed=42):
+        """Paseo aleatorio reproducible (para medir sin haber grabado nada)"""
+        rng = np.random.default_rng(seed)
+        close = np.exp(rng.normal(0, 0.004, n))
+        open_ = np.exp(rng.normal(0, 0.001, n))
+        wick = np.abs(rng.normal(0, 0.002, (n, 2)))
+        high = np.maximum(open_, close) * (1 + wick[:, 0])
+        low = np.minimum(open_, close) * (1 - wick[:, 1])
+        volume = rng.lognormal(10, 0.5, n)
+        oi = np.exp(rng.normal(0, 0.01, n))
+        return cls('synthetic', np.column_stack([open_, high, low, close, volume]), oi)
+    
+    @classmethod
+    def from_ohlcv(cls, name, ohlcv, oi_values):
+        """
+        Args:
+            name: Nombre del fixture
+            ohlcv: Lista de velas [timestamp, open, high, low, close, volume]
+            oi_values: Valores de Open Interest en orden cronológico
+        """
+        data = np.asarray(ohlcv, dtype=np.float64)
+        prev_close = data[:-1, 4]
+        candles = np.column_stack([data[1:, 1:5] / prev_close[:, None], data[1:, 5]])
+        oi_values = np.asarray(oi_values, dtype=np.float64)
+        return cls(name, candles, oi_values[1:] / oi_values[:-1])
+    
+    @classmethod
+    def from_stream(cls, name, messages):
+        """
+        Fixture a partir de mensajes grabados del stream público de Bybit
+        
+        Las velas son la última versión de cada vela del primer topic kline
+        y el OI es el campo openInterest de los mensajes tickers.
+        
+        Args:
+            name: Nombre del fixture
+            messages: Lista de mensajes (ws_replay.load_messages)
+        
+        Raises:
+            ValueError: Si hay menos de dos velas
+        """
+        topics = [m['topic'] for m in messages if m.get('topic', '').startswith('kline.')]
+        klines = {}
+        oi_values = []
+        for message in messages:
+            topic = message.get('topic')
+            if topics and topic == topics[0]:
+                for kline in message['data']:
+                    start = int(kline['start'])
+                    klines[start] = [start] + [float(kline[k]) for k in ('open', 'high', 'low', 'close', 'volume')]
+            elif topic and topic.startswith('tickers.') and message['data'].get('openInterest'):
+                oi_values.append(float(message['data']['openInterest']))
+        if len(klines) < 2:
+            raise ValueError("La grabación necesita al menos dos velas")
+        if len(oi_values) < 2:
+            oi_values = np.ones(2)
+        return cls.from_ohlcv(name, [klines[ts] for ts in sorted(klines)], oi_values)
+    
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(os.path.splitext(os.path.basename(path))[0], data['candles'], data['oi'])
+    
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez_compressed(path, candles=self.candles, oi=self.oi)
+    
+    def ohlcv(self, n, offset, end_ts, period_ms, start_price=100.0):
+        """
+        Reconstruye n velas a partir del fixture
+        
+        Returns:
+            Array (n, 6) con timestamp, open, high, low, close y volume;
+            la última vela empieza en end_ts
+        """
+        rel = self.candles[(offset + np.arange(n)) % len(self.candles)]
+        close = start_price * np.cumprod(rel[:, 3])
+        prev_close = np.concatenate(([start_price], close[:-1]))
+        timestamps = end_ts - period_ms * np.arange(n - 1, -1, -1)
+        return np.column_stack([
+            timestamps, prev_close * rel[:, 0], prev_close * rel[:, 1], prev_close * rel[:, 2], close, rel[:, 4]
+        ])
+    
+    def open_interest(self, n, offset, start=1_000_000.0):
+        """Reconstruye n valores de Open Interest"""
+        return start * np.cumprod(self.oi[(offset + np.arange(n)) % len(self.oi)])
+
+class ReplayExchange:
+    """
+    Exchange simulado con la parte de la interfaz de ccxt que usa el detector
+    
+    Cada (timeframe, variante) se reconstruye una vez; los símbolos comparten
+    las variantes con un factor de precio distinto, así que la memoria del
+    exchange no crece con el número de símbolos.
+    """
+    
+    id = 'replay'
+    
+    def __init__(self, fixture, n_symbols, max_candles, oi_history=200):
+        """
+        Args:
+            fixture: Fixture a reproducir
+            n_symbols: Número de símbolos simulados
+            max_candles: Máximo de velas que se pedirán por serie
+            oi_history: Valores de histórico de OI disponibles
+        """
+        self.fixture = fixture
+        self.max_candles = max_candles
+        self.oi_history = oi_history
+        self.symbols = [f"SIM{i:04d}/USDT:USDT" for i in range(n_symbols)]
+        self._positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.has = {'fetchOHLCV': True, 'fetchOpenInterest': True, 'fetchOpenInterestHistory': True}
+        self.markets = {}
+        self.currencies = {}
+        self._series = {}
+        self._oi = {}
+        self.calls = 0
+    
+    def load_markets(self, reload=False):
+        self.markets = {
+            symbol: {
+                'id': symbol.split(':')[0].replace('/', ''), 'symbol': symbol,
+                'base': symbol.split('/')[0], 'quote': 'USDT', 'settle': 'USDT',
+                'type': 'swap', 'swap': True, 'linear': True, 'active': True
+            }
+            for symbol in self.symbols
+        }
+        return self.markets
+    
+    def set_markets(self, markets, currencies=None):
+        self.markets = {market['symbol']: market for market in markets}
+        self.currencies = currencies or {}
+    
+    def market(self, symbol):
+        return self.markets[symbol]
+    
+    def _variant(self, symbol):
+        """Tuple (variante, factor de precio) de un símbolo"""
+        i = self._positions[symbol]
+        return i % SERIES_VARIANTS, 1.0 + i / len(self.symbols)
+    
+    def _series_for(self, timeframe, variant):
+        key = (timeframe, variant)
+        series = self._series.get(key)
+        if series is None:
+            period_ms = timeframe_to_seconds(timeframe) * 1000
+            end_ts = int(time.time() * 1000) // period_ms * period_ms
+            offset = variant * len(self.fixture.candles) // SERIES_VARIANTS
+            series = self._series[key] = self.fixture.ohlcv(self.max_candles, offset, end_ts, period_ms)
+        return series
+    
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        self.calls += 1
+        variant, scale = self._variant(symbol)
+        series = self._series_for(timeframe, variant)
+        if since is not None:
+            start = int(np.searchsorted(series[:, 0], since))
+            rows = series[start:start + (limit or len(series))].copy()
+        else:
+            rows = series[-(limit or len(series)):].copy()
+        rows[:, 1:5] *= scale
+        return rows.tolist()
+    
+    def _oi_series(self, symbol):
+        variant, scale = self._variant(symbol)
+        values = self._oi.get(variant)
+        if values is None:
+            values = self._oi[variant] = self.fixture.open_interest(self.oi_history, variant * 17)
+        return values * scale
+    
+    def fetch_open_interest(self, symbol, params={}):
+        self.calls += 1
+        value = float(self._oi_series(symbol)[-1])
+        return {
+            'symbol': symbol, 'openInterestAmount': value, 'openInterestValue': value,
+            'timestamp': int(time.time() * 1000)
+        }
+    
+    def fetch_open_interest_history(self, symbol, timeframe='1h', since=None, limit=None, params={}):
+        self.calls += 1
+        values = self._oi_series(symbol)[-(limit or self.oi_history):]
+        period_ms = timeframe_to_seconds(timeframe) * 1000
+        end_ts = int(time.time() * 1000) // period_ms * period_ms
+        return [
+            {'symbol': symbol, 'timestamp': end_ts - period_ms * (len(values) - 1 - i),
+             'openInterestAmount': float(value), 'openInterestValue': float(value)}
+            for i, value in enumerate(values)
+        ]
+
+def summarize(samples):
+    """
+    Args:
+        samples: Duraciones en segundos
+    
+    Returns:
+        Dict con count, mean, p50, p90, p99 y max en milisegundos
+    """
+    if not samples:
+        return {'count': 0}
+    ms = np.asarray(samples) * 1000
+    return {
+        'count': len(ms),
+        'mean_ms': round(float(ms.mean()), 4),
+        'p50_ms': round(float(np.percentile(ms, 50)), 4),
+        'p90_ms': round(float(np.percentile(ms, 90)), 4),
+        'p99_ms': round(float(np.percentile(ms, 99)), 4),
+        'max_ms': round(float(ms.max()), 4),
+    }
+
+def _new_detector(exchange):
+    # Sin caché de velas: cada etapa 'fetch' mide la conversión completa
+    with contextlib.redirect_stdout(io.StringIO()):
+        return CryptoTrendDetector(exchange=exchange, cache_size=0)
+
+def _run_symbol(detector, symbol, candles, timeframe, timings, build_full_analysis):
+    """Pasa un símbolo por todas las etapas y acumula sus duraciones en timings"""
+    clock = time.perf_counter
+    
+    t = clock()
+    df = detector.get_ohlcv_data(symbol, timeframe, candles, use_cache=False)
+    timings['fetch'].append(clock() - t)
+    
+    t = clock()
+    df = detector.calculate_indicators(df)
+    timings['calculate_indicators'].append(clock() - t)
+    
+    t = clock()
+    trend_info = detector.identify_trend(df)
+    timings['identify_trend'].append(clock() - t)
+    
+    t = clock()
+    oi_analysis = detector.analyze_open_interest(symbol, df)
+    timings['analyze_open_interest'].append(clock() - t)
+    
+    t = clock()
+    risk_analysis = detector.analyze_risk_alerts({timeframe: trend_info}, oi_analysis)
+    timings['analyze_risk_alerts'].append(clock() - t)
+    
+    t = clock()
+    detector.calculate_price_levels(df, trend_info.price, risk_analysis['consensus'], trend_info.atr)
+    timings['calculate_price_levels'].append(clock() - t)
+    
+    t = clock()
+    build_full_analysis(symbol, detector)
+    timings['full_analysis'].append(clock() - t)
+
+def run_scenario(fixture, candles, n_symbols, timeframe='15m', memory=True):
+    """
+    Ejecuta todas las etapas para n_symbols símbolos con `candles` velas cada uno
+    
+    Args:
+        fixture: Fixture a reproducir
+        candles: Velas por símbolo
+        n_symbols: Número de símbolos
+        timeframe: Timeframe de las velas de las etapas individuales
+        memory: Medir el pico de memoria (en una segunda pasada con tracemalloc)
+    
+    Returns:
+        Dict con las estadísticas de cada etapa, throughput y pico de memoria
+    """
+    # El análisis completo es el mismo que hace el bot de Telegram
+    from telegram_bot import build_full_analysis
+    
+    timings = {stage: [] for stage in STAGES}
+    exchange = ReplayExchange(fixture, n_symbols, max(candles, 200))
+    detector = _new_detector(exchange)
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Calentamiento: reconstruir las series del exchange y cargar módulos
+        _run_symbol(detector, exchange.symbols[0], candles, timeframe, {s: [] for s in STAGES}, build_full_analysis)
+        
+        started = time.perf_counter()
+        for symbol in exchange.symbols:
+            _run_symbol(detector, symbol, candles, timeframe, timings, build_full_analysis)
+        elapsed = time.perf_counter() - started
+    
+    peak_memory = None
+    if memory:
+        detector = _new_detector(exchange)
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for symbol in exchange.symbols:
+                    _run_symbol(detector, symbol, candles, timeframe, {s: [] for s in STAGES}, build_full_analysis)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    
+    return {
+        'candles': candles,
+        'symbols': n_symbols,
+        'timeframe': timeframe,
+        'elapsed_s': round(elapsed, 4),
+        'symbols_per_s': round(n_symbols / elapsed, 3) if elapsed else None,
+        'peak_memory_mb': round(peak_memory / 2**20, 3) if peak_memory is not None else None,
+        'stages': {stage: summarize(samples) for stage, samples in timings.items()}
+    }
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(fixture, candle_counts, symbol_counts, timeframe='15m', memory=True, max_rows=MAX_ROWS):
+    """
+    Ejecuta todos los escenarios (velas x símbolos) y muestra cada uno al terminar
+    
+    Returns:
+        Dict con metadatos y la lista de escenarios (formato del JSON guardado)
+    """
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'fixture': fixture.name,
+        'scenarios': [],
+        'skipped': []
+    }
+    
+    for n_symbols in symbol_counts:
+        for candles in candle_counts:
+            if candles * n_symbols > max_rows:
+                report['skipped'].append({'candles': candles, 'symbols': n_symbols})
+                print(f"⏭️  {candles} velas x {n_symbols} símbolos: omitido (más de {max_rows:,} filas)")
+                continue
+            
+            scenario = run_scenario(fixture, candles, n_symbols, timeframe, memory)
+            report['scenarios'].append(scenario)
+            print_scenario(scenario)
+    
+    return report
+
+def print_scenario(scenario):
+    memory = f", pico {scenario['peak_memory_mb']:.1f} MB" if scenario['peak_memory_mb'] is not None else ""
+    print(f"\n📊 {scenario['candles']} velas x {scenario['symbols']} símbolos: "
+          f"{scenario['symbols_per_s']:.2f} símbolos/s{memory}")
+    print(f"   {'etapa':<24}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, stats in scenario['stages'].items():
+        print(f"   {stage:<24}{stats['p50_ms']:>10.3f}{stats['p90_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['max_ms']:>10.3f}")
+
+def compare_reports(current, baseline, threshold=0.20):
+    """
+    Compara la p50 de cada etapa con la de un benchmark anterior
+    
+    Args:
+        current: Informe actual (run_benchmark)
+        baseline: Informe de referencia (JSON cargado)
+        threshold: Empeoramiento relativo a partir del cual se considera regresión
+    
+    Returns:
+        Lista de regresiones (dicts con candles, symbols, stage, baseline_ms, current_ms, ratio)
+    """
+    previous = {(s['candles'], s['symbols']): s for s in baseline['scenarios']}
+    regressions = []
+    
+    print(f"\n🔍 Comparación con {baseline.get('revision') or 'referencia'} ({baseline.get('created')})")
+    for scenario in current['scenarios']:
+        old = previous.get((scenario['candles'], scenario['symbols']))
+        if old is None:
+            continue
+        print(f"   {scenario['candles']} velas x {scenario['symbols']} símbolos:")
+        for stage, stats in scenario['stages'].items():
+            old_stats = old['stages'].get(stage)
+            if not old_stats or not old_stats.get('p50_ms'):
+                continue
+            ratio = stats['p50_ms'] / old_stats['p50_ms']
+            marker = "🔴" if ratio > 1 + threshold else "🟢" if ratio < 1 - threshold else "⚪"
+            print(f"      {marker} {stage:<24}{old_stats['p50_ms']:>10.3f} → {stats['p50_ms']:>10.3f} ms  (x{ratio:.2f})")
+            if ratio > 1 + threshold:
+                regressions.append({
+                    'candles': scenario['candles'],
+                    'symbols': scenario['symbols'],
+                    'stage': stage,
+                    'baseline_ms': old_stats['p50_ms'],
+                    'current_ms': stats['p50_ms'],
+                    'ratio': round(ratio, 3)
+                })
+    return regressions
+
+def record_fixture(exchange_name, symbol, timeframe, candles, path):
+    """
+    Graba velas e histórico de OI reales de un símbolo como fixture
+    
+    Args:
+        exchange_name: Exchange de ccxt
+        symbol: Símbolo a grabar
+        timeframe: Timeframe de las velas
+        candles: Número de velas
+        path: Fichero .npz de salida
+    """
+    detector = CryptoTrendDetector(exchange_name=exchange_name)
+    normalized = detector.normalize_symbol(symbol)
+    if normalized is None:
+        raise ValueError(f"Símbolo no encontrado: {symbol}")
+    
+    period_ms = timeframe_to_seconds(timeframe) * 1000
+    since = int(time.time() * 1000) - candles * period_ms
+    ohlcv = detector._fetch_ohlcv_since(normalized, timeframe, since, candles)
+    
+    df_oi = detector.get_open_interest_history(normalized, '1h', limit=200)
+    if df_oi is not None:
+        column = 'openInterestAmount' if 'openInterestAmount' in df_oi.columns else 'openInterest'
+        oi_values = df_oi[column].astype(float).values
+    else:
+        oi_values = np.ones(2)
+    
+    fixture = Fixture.from_ohlcv(os.path.splitext(os.path.basename(path))[0], ohlcv, oi_values)
+    fixture.save(path)
+    print(f"💾 {len(fixture.candles)} velas y {len(fixture.oi)} valores de OI de {normalized} en {path}")
+
+def _int_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de análisis (sin red)")
+    parser.add_argument('--fixture', default=DEFAULT_FIXTURE,
+                        help="Fixture .npz grabado con --record o 'synthetic' (default: %(default)s)")
+    parser.add_argument('--candles', type=_int_list, default=DEFAULT_CANDLES,
+                        help="Velas por símbolo, separadas por comas (default: 200,1000,10000,100000)")
+    parser.add_argument('--symbols', type=_int_list, default=DEFAULT_SYMBOLS,
+                        help="Número de símbolos, separados por comas (default: 1,10,100,1000)")
+    parser.add_argument('--timeframe', default='15m', help="Timeframe de las etapas individuales")
+    parser.add_argument('--max-rows', type=int, default=MAX_ROWS,
+                        help="Omitir escenarios con más velas x símbolos (default: %(default)s)")
+    parser.add_argument('--no-memory', action='store_true', help="No medir el pico de memoria")
+    parser.add_argument('--output', help="Fichero JSON de resultados (default: benchmarks/results-FECHA.json)")
+    parser.add_argument('--compare', help="JSON de un benchmark anterior para detectar regresiones")
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help="Empeoramiento de la p50 considerado regresión (default: 0.20)")
+    parser.add_argument('--record', metavar='SYMBOL', help="Grabar un fixture del exchange real y salir")
+    parser.add_argument('--exchange', default='bybit', help="Exchange para --record")
+    parser.add_argument('--record-candles', type=int, default=20000, help="Velas a grabar con --record")
+    parser.add_argument('--from-stream', metavar='JSONL', nargs='?', const=STREAM_FIXTURE,
+                        help="Convertir una grabación del stream de Bybit en fixture (en --fixture) y salir "
+                             "(default: %(const)s)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    
+    if args.record:
+        path = args.fixture if args.fixture != DEFAULT_FIXTURE else os.path.join(
+            FIXTURE_DIR, f"{args.record.replace('/', '').replace(':', '_')}_{args.timeframe}.npz"
+        )
+        record_fixture(args.exchange, args.record, args.timeframe, args.record_candles, path)
+        return 0
+    
+    if args.from_stream:
+        from ws_replay import load_messages
+        fixture = Fixture.from_stream(os.path.splitext(os.path.basename(args.fixture))[0],
+                                      load_messages(args.from_stream))
+        fixture.save(args.fixture)
+        print(f"💾 {len(fixture.candles)} velas y {len(fixture.oi)} valores de OI de {args.from_stream} en {args.fixture}")
+        return 0
+    
+    fixture = Fixture.synthetic() if args.fixture == 'synthetic' else Fixture.load(args.fixture)
+    print(f"🚀 Benchmark con el fixture '{fixture.name}' ({len(fixture.candles)} velas)")
+    
+    report = run_benchmark(
+        fixture, args.candles, args.symbols, args.timeframe, not args.no_memory, args.max_rows
+    )
+    
+    output = args.output or os.path.join(
+        BENCHMARK_DIR, f"results-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Resultados guardados en {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regresiones por encima del {args.threshold:.0%}")
+            return 1
+        print("\n✅ Sin regresiones")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
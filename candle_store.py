@@ -0,0 +1,239 @@
+"""
+Almacén local de velas OHLCV
+Un fichero binario por columna (append-only), leído con np.memmap sin copias
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo bloqueo entre threads
+    fcntl = None
+
+# Columnas guardadas y su tipo; timestamp se escribe el último
+STORE_COLUMNS = [
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+    ('timestamp', np.int64),
+]
+
+class CandleStore:
+    """
+    Velas cerradas persistidas en disco por exchange/símbolo/timeframe
+    
+    Cada serie es un directorio con un fichero por columna
+    (root/bybit/BTC-USDT_USDT/15m/close.f8...). Las velas solo se añaden
+    al final y nunca se reescriben, así que solo se guardan velas ya
+    cerradas y con timestamps consecutivos. La columna timestamp se escribe
+    la última: si un proceso muere a mitad de escritura, las filas
+    incompletas se ignoran al leer y se recortan en la siguiente escritura.
+    """
+    
+    def __init__(self, root):
+        """
+        Args:
+            root: Directorio raíz del almacén (se crea si no existe)
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+    
+    @staticmethod
+    def _safe_name(symbol):
+        """'BTC/USDT:USDT' -> 'BTC-USDT_USDT'"""
+        return symbol.replace('/', '-').replace(':', '_')
+    
+    def series_path(self, exchange, symbol, timeframe):
+        """
+        Returns:
+            Directorio de la serie (exchange, símbolo, timeframe)
+        """
+        return os.path.join(self.root, exchange, self._safe_name(symbol), timeframe)
+    
+    def _column_path(self, path, column, dtype):
+        return os.path.join(path, f"{column}.{np.dtype(dtype).str[1:]}")
+    
+    def _lock(self, path):
+        with self._locks_lock:
+            lock = self._locks.get(path)
+            if lock is None:
+                lock = self._locks[path] = threading.Lock()
+            return lock
+    
+    def _length(self, path):
+        """Filas completas de la serie (las que tienen todas las columnas)"""
+        rows = None
+        for column, dtype in STORE_COLUMNS:
+            try:
+                size = os.path.getsize(self._column_path(path, column, dtype))
+            except FileNotFoundError:
+                return 0
+            count = size // np.dtype(dtype).itemsize
+            rows = count if rows is None else min(rows, count)
+        return rows or 0
+    
+    def length(self, exchange, symbol, timeframe):
+        """
+        Returns:
+            Número de velas guardadas de la serie
+        """
+        return self._length(self.series_path(exchange, symbol, timeframe))
+    
+    def columns(self, exchange, symbol, timeframe, limit=None):
+        """
+        Columnas de la serie como vistas de solo lectura sobre los ficheros
+        
+        Args:
+            exchange: Id del exchange
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            limit: Últimas N velas (None = todas)
+        
+        Returns:
+            Dict {columna: np.memmap} o None si la serie está vacía
+        """
+        path = self.series_path(exchange, symbol, timeframe)
+        rows = self._length(path)
+        if rows == 0:
+            return None
+        
+        start = rows - min(limit, rows) if limit else 0
+        views = {}
+        for column, dtype in STORE_COLUMNS:
+            mapped = np.memmap(self._column_path(path, column, dtype), dtype=dtype, mode='r', shape=(rows,))
+            views[column] = mapped[start:]
+        return views
+    
+    def last_timestamp(self, exchange, symbol, timeframe):
+        """
+        Returns:
+            Timestamp en ms de la última vela guardada o None
+        """
+        views = self.columns(exchange, symbol, timeframe, limit=1)
+        return int(views['timestamp'][-1]) if views is not None else None
+    
+    def read(self, exchange, symbol, timeframe, limit=None):
+        """
+        Velas guardadas como DataFrame OHLCV indexado por tiempo
+        
+        Args:
+            exchange: Id del exchange
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            limit: Últimas N velas (None = todas)
+        
+        Returns:
+            DataFrame con el formato de get_ohlcv_data (vacío si no hay datos)
+        """
+        views = self.columns(exchange, symbol, timeframe, limit)
+        if views is None:
+            return pd.DataFrame(
+                columns=['open', 'high', 'low', 'close', 'volume'],
+                index=pd.DatetimeIndex([], name='timestamp'),
+                dtype=float
+            )
+        
+        index = pd.DatetimeIndex(pd.to_datetime(np.asarray(views['timestamp']), unit='ms'), name='timestamp')
+        return pd.DataFrame(
+            {column: np.asarray(views[column]) for column, _ in STORE_COLUMNS[:-1]},
+            index=index
+        )
+    
+    def append(self, exchange, symbol, timeframe, ohlcv):
+        """
+        Añade velas cerradas al final de la serie
+        
+        Se ignoran las velas que no son posteriores a la última guardada.
+        
+        Args:
+            exchange: Id del exchange
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            ohlcv: Lista de velas [timestamp, open, high, low, close, volume]
+                   en orden cronológico
+        
+        Returns:
+            Número de velas añadidas
+        """
+        if not ohlcv:
+            return 0
+        
+        path = self.series_path(exchange, symbol, timeframe)
+        os.makedirs(path, exist_ok=True)
+        
+        with self._lock(path), _FileLock(os.path.join(path, '.lock')):
+            rows = self._length(path)
+            self._truncate(path, rows)
+            
+            data = np.asarray(ohlcv, dtype=np.float64)
+            timestamps = data[:, 0].astype(np.int64)
+            if rows:
+                last = np.fromfile(
+                    self._column_path(path, 'timestamp', np.int64), dtype=np.int64, count=1,
+                    offset=(rows - 1) * 8
+                )[0]
+                keep = timestamps > last
+                data = data[keep]
+                timestamps = timestamps[keep]
+            if len(data) == 0:
+                return 0
+            
+            for position, (column, dtype) in enumerate(STORE_COLUMNS[:-1], start=1):
+                with open(self._column_path(path, column, dtype), 'ab') as f:
+                    f.write(np.ascontiguousarray(data[:, position], dtype=dtype).tobytes())
+            with open(self._column_path(path, 'timestamp', np.int64), 'ab') as f:
+                f.write(timestamps.tobytes())
+            return len(data)
+    
+    def _truncate(self, path, rows):
+        """Recorta todas las columnas a `rows` filas (restos de escrituras interrumpidas)"""
+        for column, dtype in STORE_COLUMNS:
+            file_path = self._column_path(path, column, dtype)
+            size = rows * np.dtype(dtype).itemsize
+            if os.path.exists(file_path):
+                if os.path.getsize(file_path) != size:
+                    os.truncate(file_path, size)
+            else:
+                open(file_path, 'wb').close()
+    
+    def reset(self, exchange, symbol, timeframe):
+        """
+        Vacía una serie (p. ej. si tiene un hueco que no se puede rellenar)
+        
+        Args:
+            exchange: Id del exchange
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+        """
+        path = self.series_path(exchange, symbol, timeframe)
+        if not os.path.isdir(path):
+            return
+        with self._lock(path), _FileLock(os.path.join(path, '.lock')):
+            self._truncate(path, 0)
+
+class _FileLock:
+    """Bloqueo exclusivo entre procesos sobre un fichero (no-op sin fcntl)"""
+    
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+    
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+    
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
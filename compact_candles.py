@@ -0,0 +1,394 @@
+"""
+Representación compacta de velas e indicadores
+Velas en arrays contiguos (timestamps int64 y precios/volúmenes como enteros int32
+en la unidad de su último decimal) y paneles de indicadores float32 en buffers
+preasignados reutilizables
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from panel_indicators import PANEL_COLUMNS, allocate_outputs, compute_panel_indicators, identify_trend_panel
+
+# Tipo de los precios y volúmenes: enteros en la unidad de su último decimal
+# (67123.45 -> 6712345 con escala 100). Solo se usa si al dividir por la escala
+# se recupera el float64 original bit a bit, así que identify_trend y los
+# niveles de precio dan lo mismo que con DataFrames
+CANDLE_DTYPE = np.int32
+
+# Escalas (10**decimales) que se prueban para cada columna, de menor a mayor
+CANDLE_SCALES = 10.0 ** np.arange(13)
+
+# Tipo de las series con alguna columna que no cabe en CANDLE_DTYPE
+# (volúmenes enormes, más de 12 decimales): se guardan sin convertir
+FALLBACK_DTYPE = np.float64
+
+# Tipo de los paneles de scan/alertas (solo clasifican tendencias)
+PANEL_DTYPE = np.float32
+
+# Formas de panel distintas que conserva cada IndicatorWorkspace
+WORKSPACE_SHAPES = 2
+
+class RollingArray:
+    """
+    Últimas `capacity` filas de una serie en un array preasignado
+    
+    Reserva SLACK filas de más: las filas nuevas se escriben al final y
+    solo cuando se llena la holgura se desplazan las últimas al principio,
+    así que añadir cuesta O(1) amortizado y no se reserva memoria nueva.
+    """
+    
+    SLACK = 64
+    
+    def __init__(self, capacity, width=None, dtype=np.float64):
+        """
+        Args:
+            capacity: Filas que se conservan
+            width: Columnas de cada fila (None = array de una dimensión)
+            dtype: Tipo de los valores
+        """
+        self.capacity = capacity
+        shape = (capacity + self.SLACK,) if width is None else (capacity + self.SLACK, width)
+        self._data = np.empty(shape, dtype=dtype)
+        self._start = 0
+        self._stop = 0
+    
+    def __len__(self):
+        return self._stop - self._start
+    
+    def view(self):
+        """Filas guardadas (vista: cambia con la siguiente escritura)"""
+        return self._data[self._start:self._stop]
+    
+    def extend(self, rows):
+        """
+        Añade filas al final descartando las más antiguas
+        
+        Args:
+            rows: Array con una fila por elemento
+        """
+        count = len(rows)
+        if count == 0:
+            return
+        if count >= self.capacity:
+            self._data[:self.capacity] = rows[-self.capacity:]
+            self._start, self._stop = 0, self.capacity
+            return
+        
+        if self._stop + count > len(self._data):
+            # Sin holgura: mover al principio las filas que se conservan
+            keep = min(len(self), self.capacity - count)
+            self._data[:keep] = self._data[self._stop - keep:self._stop]
+            self._start, self._stop = 0, keep
+        
+        self._data[self._stop:self._stop + count] = rows
+        self._stop += count
+        self._start = max(self._start, self._stop - self.capacity)
+    
+    @property
+    def dtype(self):
+        return self._data.dtype
+    
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+    
+    def truncate(self, length):
+        """Conserva solo las primeras `length` filas"""
+        self._stop = self._start + max(0, min(length, len(self)))
+    
+    def clear(self):
+        self._start = self._stop = 0
+
+def candle_scales(values):
+    """
+    Busca para cada columna la menor escala que la convierte en enteros sin pérdida
+    
+    Args:
+        values: Array float64 (velas, OHLCV)
+    
+    Returns:
+        Array float64 con una escala por columna, o None si alguna columna no
+        cabe en CANDLE_DTYPE
+    """
+    limit = np.iinfo(CANDLE_DTYPE).max
+    scales = np.empty(values.shape[1])
+    for column in range(values.shape[1]):
+        col = values[:, column]
+        for scale in CANDLE_SCALES:
+            scaled = np.rint(col * scale)
+            # NaN o infinitos no pasan ninguna de las dos comprobaciones
+            if not np.all(np.abs(scaled) <= limit):
+                return None
+            if np.array_equal(scaled / scale, col):
+                scales[column] = scale
+                break
+        else:
+            return None
+    return scales
+
+def encode_values(values, scales):
+    """
+    Convierte precios y volúmenes a enteros con escalas ya elegidas
+    
+    Args:
+        values: Array float64 (velas, OHLCV)
+        scales: Escala de cada columna (ver candle_scales)
+    
+    Returns:
+        Array CANDLE_DTYPE, o None si con esas escalas se perderían decimales
+    """
+    scaled = np.rint(values * scales)
+    if not np.all(np.abs(scaled) <= np.iinfo(CANDLE_DTYPE).max) or not np.array_equal(scaled / scales, values):
+        return None
+    return scaled.astype(CANDLE_DTYPE)
+
+def decode_values(data, scales, out=None):
+    """
+    Recupera los precios y volúmenes de encode_values
+    
+    La división IEEE redondea al float64 más cercano, igual que al leer el
+    precio decimal del exchange, así que el resultado es el valor original.
+    
+    Args:
+        data: Array CANDLE_DTYPE (o FALLBACK_DTYPE si scales es None)
+        scales: Escala de cada columna o None
+        out: Array donde escribir el resultado (p. ej. una fila de un panel)
+    
+    Returns:
+        Array float64 (o `out`)
+    """
+    if scales is None:
+        if out is None:
+            return data.astype(np.float64)
+        out[...] = data
+        return out
+    if out is None:
+        return data / scales
+    return np.divide(data, scales, out=out, casting='same_kind')
+
+class CompactCandles:
+    """
+    Velas OHLCV en dos arrays contiguos
+    
+    timestamps: int64 (ms desde epoch); data: CANDLE_DTYPE con forma
+    (velas, OHLCV) en el orden de PANEL_COLUMNS y `scales` con la escala de
+    cada columna (None si la serie no cabe en enteros y data es
+    FALLBACK_DTYPE). Sin DatetimeIndex ni bloques de DataFrame por serie:
+    28 bytes por vela frente a los 48 de un DataFrame float64.
+    """
+    
+    __slots__ = ('timestamps', 'data', 'scales')
+    
+    def __init__(self, timestamps, data, scales=None):
+        self.timestamps = timestamps
+        self.data = data
+        self.scales = scales
+    
+    @classmethod
+    def from_values(cls, timestamps, values):
+        """
+        Args:
+            timestamps: Array int64 en ms
+            values: Array float64 (velas, OHLCV)
+        """
+        scales = candle_scales(values) if len(values) else np.ones(len(PANEL_COLUMNS))
+        if scales is None:
+            return cls(timestamps, np.ascontiguousarray(values, dtype=FALLBACK_DTYPE))
+        return cls(timestamps, encode_values(values, scales), scales)
+    
+    @classmethod
+    def from_ohlcv(cls, ohlcv):
+        """
+        Args:
+            ohlcv: Lista de velas de ccxt [timestamp, open, high, low, close, volume]
+        """
+        if not ohlcv:
+            return cls.from_values(np.empty(0, dtype=np.int64), np.empty((0, len(PANEL_COLUMNS))))
+        array = np.asarray(ohlcv, dtype=np.float64)
+        return cls.from_values(array[:, 0].astype(np.int64), array[:, 1:6])
+    
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Args:
+            df: DataFrame OHLCV indexado por tiempo (formato de get_ohlcv_data)
+        """
+        timestamps = df.index.values.astype('datetime64[ms]').astype(np.int64)
+        return cls.from_values(timestamps, df[PANEL_COLUMNS].to_numpy(dtype=np.float64))
+    
+    def __len__(self):
+        return len(self.timestamps)
+    
+    @property
+    def empty(self):
+        return len(self.timestamps) == 0
+    
+    @property
+    def nbytes(self):
+        return self.timestamps.nbytes + self.data.nbytes
+    
+    @property
+    def values(self):
+        """Precios y volúmenes originales en float64 (velas, OHLCV)"""
+        return decode_values(self.data, self.scales)
+    
+    def values_into(self, out):
+        """Escribe los precios y volúmenes en `out` (p. ej. una fila de un panel float32)"""
+        return decode_values(self.data, self.scales, out)
+    
+    def tail(self, limit):
+        """Últimas `limit` velas (vistas sobre los mismos arrays)"""
+        return CompactCandles(self.timestamps[-limit:], self.data[-limit:], self.scales)
+    
+    def copy(self):
+        return CompactCandles(self.timestamps.copy(), self.data.copy(), self.scales)
+    
+    def to_dataframe(self):
+        """
+        Returns:
+            DataFrame float64 con el formato de get_ohlcv_data
+        """
+        index = pd.DatetimeIndex(pd.to_datetime(self.timestamps, unit='ms'), name='timestamp')
+        return pd.DataFrame(self.values, index=index, columns=PANEL_COLUMNS)
+
+def as_dataframe(candles):
+    """Devuelve un DataFrame OHLCV tanto si recibe un DataFrame como CompactCandles"""
+    if isinstance(candles, CompactCandles):
+        return candles.to_dataframe()
+    return candles
+
+class CandleBuffer:
+    """
+    Últimas velas de una serie (símbolo, timeframe) en arrays preasignados
+    
+    update() fusiona las velas descargadas en su sitio: la vela en
+    formación se reemplaza y las nuevas se añaden al final, sin crear
+    DataFrames ni concatenar. Los valores se guardan codificados como en
+    CompactCandles; si una vela nueva trae más decimales que las escalas
+    del buffer, se recodifica el buffer entero.
+    """
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._timestamps = RollingArray(capacity, dtype=np.int64)
+        self._values = RollingArray(capacity, len(PANEL_COLUMNS), dtype=CANDLE_DTYPE)
+        self._scales = None
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._timestamps)
+    
+    @property
+    def nbytes(self):
+        """Bytes reservados por los arrays del buffer (holgura incluida)"""
+        return self._timestamps.nbytes + self._values.nbytes
+    
+    @property
+    def last_timestamp(self):
+        """Timestamp en ms de la última vela (None si está vacío)"""
+        with self._lock:
+            timestamps = self._timestamps.view()
+            return int(timestamps[-1]) if len(timestamps) else None
+    
+    def update(self, ohlcv, replace=False):
+        """
+        Fusiona velas de ccxt en el buffer
+        
+        Args:
+            ohlcv: Lista de velas [timestamp, open, high, low, close, volume]
+            replace: Descartar antes las velas guardadas
+        """
+        new = CompactCandles.from_ohlcv(ohlcv)
+        with self._lock:
+            if replace:
+                self._timestamps.clear()
+                self._values.clear()
+            if new.empty:
+                return
+            # Las velas guardadas desde la primera nueva se sustituyen
+            keep = int(np.searchsorted(self._timestamps.view(), new.timestamps[0]))
+            self._timestamps.truncate(keep)
+            self._values.truncate(keep)
+            self._timestamps.extend(new.timestamps)
+            
+            if not len(self._values):
+                self._store(new)
+                return
+            if self._scales is None:
+                data = new.values
+            else:
+                data = encode_values(new.values, self._scales)
+            if data is None:
+                # Más decimales (o valores más grandes) que las escalas actuales
+                stored = decode_values(self._values.view(), self._scales)
+                values = np.concatenate([stored, new.values])
+                self._store(CompactCandles.from_values(self._timestamps.view(), values))
+            else:
+                self._values.extend(data)
+    
+    def _store(self, candles):
+        """Sustituye los valores guardados por los de `candles` (con su codificación)"""
+        if candles.data.dtype != self._values.dtype:
+            self._values = RollingArray(self.capacity, len(PANEL_COLUMNS), dtype=candles.data.dtype)
+        self._values.clear()
+        self._values.extend(candles.data)
+        self._scales = candles.scales
+    
+    def tail(self, limit):
+        """
+        Returns:
+            Copia de las últimas `limit` velas como CompactCandles
+        """
+        with self._lock:
+            return CompactCandles(
+                self._timestamps.view()[-limit:].copy(),
+                self._values.view()[-limit:].copy(),
+                self._scales
+            )
+
+class IndicatorWorkspace:
+    """
+    Panel y salidas de compute_panel_indicators reservados una vez y reutilizados
+    
+    Cada thread debe usar su propio workspace. Se conservan los buffers de
+    las WORKSPACE_SHAPES últimas formas de panel (símbolos, velas).
+    """
+    
+    def __init__(self, dtype=PANEL_DTYPE):
+        self.dtype = dtype
+        self._buffers = {}
+    
+    def _get(self, n_symbols, n_candles):
+        key = (n_symbols, n_candles)
+        buffers = self._buffers.pop(key, None)
+        if buffers is None:
+            if len(self._buffers) >= WORKSPACE_SHAPES:
+                del self._buffers[next(iter(self._buffers))]
+            panel = np.empty((n_symbols, n_candles, len(PANEL_COLUMNS)), dtype=self.dtype)
+            buffers = (panel, allocate_outputs(n_symbols, n_candles, self.dtype))
+        # Reinsertar al final: las más usadas recientemente se conservan
+        self._buffers[key] = buffers
+        return buffers
+    
+    def trends(self, group):
+        """
+        Evalúa las reglas de identify_trend para velas de la misma longitud
+        
+        Args:
+            group: Dict {símbolo: CompactCandles} con el mismo número de velas
+        
+        Returns:
+            Tuple (symbols, trends) como identify_trend_panel; los arrays son
+            copias, no vistas sobre los buffers reutilizados
+        """
+        symbols = list(group)
+        n_candles = len(group[symbols[0]])
+        panel, outputs = self._get(len(symbols), n_candles)
+        for i, symbol in enumerate(symbols):
+            group[symbol].values_into(panel[i])
+        indicators = compute_panel_indicators(panel, out=outputs)
+        trends = identify_trend_panel(panel, indicators)
+        return symbols, {name: np.array(values) for name, values in trends.items()}
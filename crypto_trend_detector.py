@@ -1,7 +1,27 @@
 import ccxt
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from ohlcv_cache import OHLCVCache, timeframe_to_seconds, next_candle_close
+from candle_store import CandleStore
+from compact_candles import CandleBuffer, CompactCandles, IndicatorWorkspace, as_dataframe
+from indicator_engine import IndicatorEngine
+from oi_store import OI_TIMEFRAME, OpenInterestStore, classify_divergence, oi_statistics
+from singleflight import SingleFlight
+from symbol_index import SymbolIndexCache
+from rate_limiter import RateLimiter, is_rate_limit_error
+from metrics import (
+    EXCHANGE_ERRORS, EXCHANGE_LATENCY, OHLCV_REQUESTS, OI_REQUESTS, RATE_LIMIT_WAIT_SECONDS, RATE_LIMIT_WAITS,
+    STAGE_LATENCY, instrument_throttle
+)
+from analysis_types import AdxStrength, Direction, Divergence, OiTrend, OpenInterestResult, RsiSignal, Trend, TrendResult
+from panel_indicators import build_ohlcv_panel, compute_panel_indicators, identify_trend_panel, trend_info_at
 
 class CryptoTrendDetector:
     """
@@ -9,28 +29,227 @@ class CryptoTrendDetector:
     Identifica tendencias alcistas, bajistas o laterales
     """
     
-    def __init__(self, exchange_name='bybit'):
+    # Máximo de velas por petición a fetch_ohlcv
+    OHLCV_PAGE_LIMIT = 1000
+    
+    # Velas que se recuperan paginando antes de reiniciar una serie del almacén
+    STORE_MAX_CATCHUP = 5000
+    
+    def __init__(self, exchange_name='bybit', cache_size=512, incremental=False, ohlcv_window=1000,
+                 store_dir=None, lazy_markets=False, markets_cache_path=None, exchange=None,
+                 rate_limiter=None, compact=False):
         """
         Inicializa el detector con el exchange deseado
         
         Args:
             exchange_name: Nombre del exchange ('binance', 'bybit', 'okx', etc.)
+            cache_size: Máximo de entradas en la caché OHLCV (0 = sin caché)
+            incremental: Descargar solo las velas nuevas desde la última petición
+            ohlcv_window: Velas que se conservan por (símbolo, timeframe) en modo incremental
+            store_dir: Directorio del almacén de velas en disco (None = sin almacén)
+            lazy_markets: No cargar los mercados hasta que se necesiten
+            markets_cache_path: Fichero JSON con una copia de los mercados para
+                                arrancar sin esperar al exchange (None = sin copia)
+            exchange: Instancia ya creada con la interfaz de ccxt (p. ej. un exchange
+                      simulado); si se pasa, exchange_name se ignora
+            rate_limiter: RateLimiter compartido (p. ej. entre detectores con la misma
+                          API key); None = uno propio con el rateLimit del exchange;
+                          False = ninguno (se mantiene el throttle de ccxt)
+            compact: Guardar las velas en arrays contiguos con precios y volúmenes
+                     como enteros int32 sin pérdida (caché y buffers incrementales,
+                     28 bytes por vela en lugar de 48) y evaluar los paneles de
+                     scan/alertas en float32 sobre buffers reutilizados;
+                     get_ohlcv_data sigue devolviendo DataFrames con los precios originales
         """
+        # Caché de velas compartida por todas las llamadas a get_ohlcv_data
+        self.ohlcv_cache = OHLCVCache(max_entries=cache_size) if cache_size else None
+        
+        # Modo compacto: CompactCandles en lugar de DataFrames dentro del detector
+        self.compact = compact
+        self._workspaces = []
+        self._workspaces_lock = threading.Lock()
+        
+        # Modo incremental: últimas velas conocidas por (símbolo, timeframe)
+        # (DataFrame o CandleBuffer en modo compacto)
+        self.incremental = incremental
+        self.ohlcv_window = ohlcv_window
+        self._ohlcv_buffers = {}
+        self._buffers_lock = threading.Lock()
+        
+        # Feed WebSocket opcional (LiveCandleFeed); si tiene las velas no se usa REST
+        self.live_feed = None
+        
+        # Velas cerradas persistidas en disco (sobreviven a reinicios)
+        self.candle_store = CandleStore(store_dir) if store_dir else None
+        
+        # Estado incremental de indicadores por (símbolo, timeframe)
+        self.indicator_engine = IndicatorEngine(history_size=ohlcv_window)
+        
+        # Descargas idénticas simultáneas comparten una sola petición
+        self._ohlcv_flights = SingleFlight()
+        
+        # Histórico horario de OI por símbolo (solo se piden las horas nuevas)
+        self.oi_store = OpenInterestStore()
+        self._oi_flights = SingleFlight()
+        
+        # Se llama tras cada petición con (método, segundos, excepción o None);
+        # DetectorPool lo usa para seguir la salud de cada exchange
+        self.request_listener = None
+        
+        # Origen de los mercados cargados: None, 'snapshot' o 'exchange'
+        self.markets_cache_path = markets_cache_path
+        self.markets_source = None
+        self._markets_lock = threading.Lock()
+        
         try:
-            exchange_class = getattr(ccxt, exchange_name)
-            self.exchange = exchange_class({
-                'enableRateLimit': True,
-                'options': {'defaultType': 'future'}  # Para futuros
-            })
-            print(f"✅ Conectado a {exchange_name.upper()}")
-            
-            # Cargar mercados
-            self.exchange.load_markets()
-            print(f"✅ {len(self.exchange.markets)} mercados cargados")
+            if exchange is not None:
+                self.exchange = exchange
+            else:
+                exchange_class = getattr(ccxt, exchange_name)
+                self.exchange = exchange_class({
+                    'enableRateLimit': True,
+                    'options': {'defaultType': 'future'}  # Para futuros
+                })
+            print(f"✅ Conectado a {self.exchange.id.upper()}")
+            
+            # Todas las peticiones pasan por el planificador, que sustituye al
+            # throttle en serie de ccxt (sin pesos ni prioridades)
+            if rate_limiter is False:
+                self.rate_limiter = None
+            else:
+                self.rate_limiter = rate_limiter or RateLimiter.for_exchange(self.exchange)
+            if self.rate_limiter is not None:
+                self.exchange.enableRateLimit = False
+            
+            # Sin planificador, esperas del throttle de ccxt (solo con las métricas
+            # activas); con él, las cuenta el propio RateLimiter
+            if self.rate_limiter is None:
+                instrument_throttle(self.exchange)
+            
+            # Índice de símbolos (se reconstruye solo al recargar mercados)
+            self._symbols = SymbolIndexCache(self.exchange)
+            
+            # Cargar mercados (en modo lazy se cargan en el primer uso)
+            if not lazy_markets:
+                self.load_markets()
         except Exception as e:
             print(f"❌ Error conectando a {exchange_name}: {e}")
             raise
     
+    def _request(self, method, *args, **kwargs):
+        """
+        Llama a un método del exchange pasando por el planificador de peticiones
+        
+        Args:
+            method: Nombre del método de ccxt ('fetch_ohlcv', 'fetch_open_interest'...)
+            *args, **kwargs: Argumentos del método
+        
+        Returns:
+            Respuesta del exchange
+        """
+        func = getattr(self.exchange, method)
+        limiter = self.rate_limiter
+        if limiter is not None:
+            limiter.acquire(method)
+        listener = self.request_listener
+        start = time.perf_counter()
+        try:
+            with EXCHANGE_LATENCY.track(EXCHANGE_ERRORS, method=method):
+                result = func(*args, **kwargs)
+        except Exception as e:
+            if limiter is not None and is_rate_limit_error(e):
+                limiter.on_rate_limited()
+            if listener is not None:
+                listener(method, time.perf_counter() - start, e)
+            raise
+        if limiter is not None:
+            limiter.on_success()
+        if listener is not None:
+            listener(method, time.perf_counter() - start, None)
+        return result
+    
+    def load_markets(self, reload=False):
+        """
+        Descarga los mercados del exchange y guarda una copia en disco
+        
+        Args:
+            reload: Volver a descargarlos aunque ya estén cargados
+        
+        Returns:
+            Dict de mercados
+        """
+        with self._markets_lock:
+            # Los mercados de la copia en disco pueden estar desactualizados
+            reload = reload or self.markets_source == 'snapshot'
+            self._request('load_markets', reload)
+            self.markets_source = 'exchange'
+            print(f"✅ {len(self.exchange.markets)} mercados cargados")
+            self._save_markets_snapshot()
+        return self.exchange.markets
+    
+    def ensure_markets(self):
+        """
+        Garantiza que hay mercados cargados (copia en disco o exchange)
+        
+        La copia en disco se carga en milisegundos; el exchange solo se
+        consulta si no existe.
+        """
+        if self.exchange.markets:
+            return
+        with self._markets_lock:
+            if self.exchange.markets or self._load_markets_snapshot():
+                return
+        self.load_markets()
+    
+    def _load_markets_snapshot(self):
+        """
+        Carga los mercados desde markets_cache_path
+        
+        Returns:
+            True si se cargaron
+        """
+        path = self.markets_cache_path
+        if not path or not os.path.exists(path):
+            return False
+        
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('exchange') != self.exchange.id or not snapshot.get('markets'):
+                return False
+            self.exchange.set_markets(snapshot['markets'], snapshot.get('currencies') or None)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️  Copia de mercados no válida ({path}): {e}")
+            return False
+        
+        self.markets_source = 'snapshot'
+        age = (time.time() - snapshot.get('saved_at', 0)) / 3600
+        print(f"✅ {len(self.exchange.markets)} mercados cargados desde {path} (hace {age:.1f}h)")
+        return True
+    
+    def _save_markets_snapshot(self):
+        """Guarda los mercados actuales en markets_cache_path (escritura atómica)"""
+        path = self.markets_cache_path
+        if not path:
+            return
+        
+        snapshot = {
+            'exchange': self.exchange.id,
+            'saved_at': time.time(),
+            'markets': list(self.exchange.markets.values()),
+            'currencies': self.exchange.currencies
+        }
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, default=str)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️  No se pudo guardar la copia de mercados: {e}")
+    
     def normalize_symbol(self, symbol):
         """
         Normaliza el símbolo al formato correcto del exchange
@@ -41,6 +260,8 @@ class CryptoTrendDetector:
         Returns:
             Símbolo normalizado o None si no existe
         """
+        self.ensure_markets()
+        
         # Convertir a mayúsculas
         symbol = symbol.upper().strip()
         
@@ -71,14 +292,8 @@ class CryptoTrendDetector:
             if formatted_perp in self.exchange.markets:
                 return formatted_perp
         
-        # Buscar coincidencias parciales
-        symbol_clean = symbol.replace('/', '').replace(':', '')
-        for market in self.exchange.markets:
-            market_clean = market.replace('/', '').replace(':', '')
-            if market_clean == symbol_clean:
-                return market
-        
-        return None
+        # Buscar coincidencias sin separadores (índice O(1))
+        return self._symbol_index().resolve_clean(symbol)
     
     def search_symbol(self, query):
         """
@@ -91,16 +306,26 @@ class CryptoTrendDetector:
             Lista de símbolos encontrados
         """
         query = query.upper().strip()
-        matches = []
         
-        for symbol in self.exchange.markets:
-            if query in symbol:
-                market = self.exchange.markets[symbol]
-                # Filtrar solo contratos perpetuos o spot con USDT
-                if market.get('active', True) and ('USDT' in symbol or 'USD' in symbol):
-                    matches.append(symbol)
+        # Solo contratos perpetuos o spot con USDT/USD activos, máximo 10 resultados
+        return self._symbol_index().search(query, limit=10)
+    
+    def get_markets_for_base(self, base):
+        """
+        Lista los mercados de un activo base
+        
+        Args:
+            base: Activo base ('BTC', 'ETH'...)
         
-        return sorted(matches)[:10]  # Máximo 10 resultados
+        Returns:
+            Lista ordenada de símbolos
+        """
+        return self._symbol_index().markets_for_base(base)
+    
+    def _symbol_index(self):
+        """Índice de símbolos de los mercados actuales (los carga si hace falta)"""
+        self.ensure_markets()
+        return self._symbols.get()
     
     def get_open_interest(self, symbol):
         """
@@ -117,16 +342,28 @@ class CryptoTrendDetector:
             if not hasattr(self.exchange, 'fetch_open_interest'):
                 return None
             
-            oi_data = self.exchange.fetch_open_interest(symbol)
-            return {
-                'open_interest': oi_data.get('openInterestAmount', 0),
-                'open_interest_value': oi_data.get('openInterestValue', 0),
-                'timestamp': oi_data.get('timestamp', None)
-            }
+            oi_data = self._request('fetch_open_interest', symbol)
+            return self._format_open_interest(oi_data)
         except Exception as e:
             # Algunos exchanges no tienen OI o el símbolo no lo soporta
             return None
     
+    def _format_open_interest(self, oi_data):
+        """
+        Convierte la respuesta de fetch_open_interest a un dict simple
+        
+        Args:
+            oi_data: Estructura de Open Interest devuelta por ccxt
+        
+        Returns:
+            Dict con información de Open Interest
+        """
+        return {
+            'open_interest': oi_data.get('openInterestAmount', 0),
+            'open_interest_value': oi_data.get('openInterestValue', 0),
+            'timestamp': oi_data.get('timestamp', None)
+        }
+    
     def get_open_interest_history(self, symbol, timeframe='1h', limit=100):
         """
         Obtiene histórico de Open Interest
@@ -143,18 +380,29 @@ class CryptoTrendDetector:
             if not hasattr(self.exchange, 'fetch_open_interest_history'):
                 return None
             
-            oi_history = self.exchange.fetch_open_interest_history(symbol, timeframe, limit=limit)
-            
-            df_oi = pd.DataFrame(oi_history)
-            if not df_oi.empty and 'timestamp' in df_oi.columns:
-                df_oi['timestamp'] = pd.to_datetime(df_oi['timestamp'], unit='ms')
-                df_oi.set_index('timestamp', inplace=True)
-                return df_oi
-            return None
+            oi_history = self._request('fetch_open_interest_history', symbol, timeframe, limit=limit)
+            return self._oi_history_to_dataframe(oi_history)
         except Exception as e:
             return None
     
-    def get_ohlcv_data(self, symbol='BTC/USDT', timeframe='15m', limit=200):
+    def _oi_history_to_dataframe(self, oi_history):
+        """
+        Convierte el histórico de OI de ccxt a DataFrame indexado por tiempo
+        
+        Args:
+            oi_history: Lista de estructuras de Open Interest
+        
+        Returns:
+            DataFrame con histórico de OI o None
+        """
+        df_oi = pd.DataFrame(oi_history)
+        if not df_oi.empty and 'timestamp' in df_oi.columns:
+            df_oi['timestamp'] = pd.to_datetime(df_oi['timestamp'], unit='ms')
+            df_oi.set_index('timestamp', inplace=True)
+            return df_oi
+        return None
+    
+    def get_ohlcv_data(self, symbol='BTC/USDT', timeframe='15m', limit=200, use_cache=True):
         """
         Obtiene datos OHLCV del exchange
         
@@ -162,36 +410,331 @@ class CryptoTrendDetector:
             symbol: Par de trading (ej: 'BTC/USDT', 'FORM/USDT')
             timeframe: Temporalidad ('1m', '5m', '15m', '1h', '4h', '1d')
             limit: Número de velas a obtener
+            use_cache: Reutilizar velas ya descargadas mientras no cierre la vela actual
         
         Returns:
             DataFrame con los datos OHLCV
         """
         try:
             # Normalizar símbolo
-            normalized = self.normalize_symbol(symbol)
+            normalized = self._resolve_symbol(symbol)
             if normalized is None:
-                print(f"❌ Símbolo '{symbol}' no encontrado")
-                print(f"💡 Buscando símbolos similares...")
-                matches = self.search_symbol(symbol.split('/')[0] if '/' in symbol else symbol)
-                if matches:
-                    print(f"   Encontrados: {', '.join(matches[:5])}")
-                    print(f"   Usa uno de estos símbolos exactos")
                 return None
             
-            print(f"📊 Obteniendo datos de {normalized} ({timeframe})...")
-            ohlcv = self.exchange.fetch_ohlcv(normalized, timeframe, limit=limit)
+            return as_dataframe(self._load_ohlcv(normalized, timeframe, limit, use_cache, verbose=True))
+        
+        except Exception as e:
+            print(f"❌ Error obteniendo datos: {e}")
+            return None
+    
+    def _load_ohlcv(self, symbol, timeframe, limit, use_cache=True, verbose=False):
+        """
+        Obtiene velas de un símbolo ya normalizado (feed, caché, almacén, modo incremental o descarga)
+        
+        Args:
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            limit: Número de velas
+            use_cache: Consultar la caché OHLCV
+            verbose: Mostrar el progreso por consola
+        
+        Returns:
+            DataFrame con los datos OHLCV (CompactCandles en modo compacto)
+        
+        Raises:
+            Las excepciones de ccxt si falla la descarga
+        """
+        # Los buffers del feed están al día: sirven incluso sin caché
+        feed = self.live_feed
+        if feed is not None:
+            ohlcv = feed.get_candles(symbol, timeframe, limit)
+            if ohlcv is not None:
+                OHLCV_REQUESTS.inc(result='live')
+                return self._ohlcv_to_candles(ohlcv)
+        
+        cache = self.ohlcv_cache if use_cache else None
+        if cache is not None:
+            df = cache.get(symbol, timeframe, limit)
+            if df is not None:
+                OHLCV_REQUESTS.inc(result='hit')
+                return df
+        OHLCV_REQUESTS.inc(result='miss')
+        
+        def fetch():
+            if verbose:
+                print(f"📊 Obteniendo datos de {symbol} ({timeframe})...")
+            if self.candle_store is not None:
+                df = self._fetch_ohlcv_stored(symbol, timeframe, limit)
+            elif self.incremental:
+                df = self._fetch_ohlcv_incremental(symbol, timeframe, limit)
+            else:
+                df = self._ohlcv_to_candles(self._fetch_ohlcv(symbol, timeframe, limit))
             
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
+            if cache is not None:
+                cache.set(symbol, timeframe, limit, df)
             
-            print(f"✅ {len(df)} velas obtenidas")
+            if verbose:
+                print(f"✅ {len(df)} velas obtenidas")
             return df
         
+        # Si otro thread ya está descargando lo mismo, esperar su resultado
+        df = self._ohlcv_flights.do((symbol, timeframe, limit), fetch)
+        return df.copy()
+    
+    def _fetch_ohlcv(self, symbol, timeframe, limit, since=None):
+        """
+        Descarga velas del exchange (único punto de llamada a fetch_ohlcv)
+        
+        Args:
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            limit: Número máximo de velas
+            since: Timestamp en ms de la primera vela (None = las más recientes)
+        
+        Returns:
+            Lista de velas [timestamp, open, high, low, close, volume]
+        """
+        if since is None:
+            return self._request('fetch_ohlcv', symbol, timeframe, limit=limit)
+        return self._request('fetch_ohlcv', symbol, timeframe, since=since, limit=limit)
+    
+    def _fetch_ohlcv_incremental(self, symbol, timeframe, limit):
+        """
+        Actualiza el buffer de velas pidiendo solo las posteriores a la última guardada
+        
+        La última vela guardada puede estar aún formándose, así que se vuelve
+        a pedir desde su timestamp: la nueva versión reemplaza a la anterior
+        y las velas siguientes se añaden al final. El buffer se recorta a
+        ohlcv_window velas.
+        
+        Args:
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            limit: Número de velas a devolver
+        
+        Returns:
+            DataFrame con las últimas `limit` velas
+        """
+        if self.compact:
+            return self._fetch_ohlcv_buffered(symbol, timeframe, limit)
+        
+        key = (symbol, timeframe)
+        with self._buffers_lock:
+            buffered = self._ohlcv_buffers.get(key)
+        
+        df = None
+        if buffered is not None and len(buffered) >= limit:
+            period_ms = timeframe_to_seconds(timeframe) * 1000
+            last_ts = int(buffered.index[-1].value // 10**6)
+            missing = (int(time.time() * 1000) - last_ts) // period_ms + 1
+            
+            # Si faltan más velas de las pedidas sale más barato descargar todo
+            if missing < limit:
+                ohlcv = self._fetch_ohlcv(symbol, timeframe, missing + 1, since=last_ts)
+                new = self._ohlcv_to_dataframe(ohlcv)
+                if new.empty:
+                    df = buffered
+                else:
+                    df = pd.concat([buffered[buffered.index < new.index[0]], new])
+                    df = df[~df.index.duplicated(keep='last')]
+        
+        if df is None:
+            df = self._ohlcv_to_dataframe(self._fetch_ohlcv(symbol, timeframe, limit))
+        
+        df = df.tail(max(self.ohlcv_window, limit))
+        with self._buffers_lock:
+            self._ohlcv_buffers[key] = df
+        
+        return df.tail(limit).copy()
+    
+    def _fetch_ohlcv_buffered(self, symbol, timeframe, limit):
+        """
+        Modo incremental con velas compactas: fusiona las descargas en un CandleBuffer
+        
+        Mismo criterio que _fetch_ohlcv_incremental, pero las velas nuevas se
+        escriben en arrays preasignados en lugar de concatenar DataFrames.
+        
+        Args:
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            limit: Número de velas a devolver
+        
+        Returns:
+            CompactCandles con las últimas `limit` velas
+        """
+        key = (symbol, timeframe)
+        with self._buffers_lock:
+            buffer = self._ohlcv_buffers.get(key)
+            if buffer is None or buffer.capacity < limit:
+                buffer = CandleBuffer(max(self.ohlcv_window, limit))
+                self._ohlcv_buffers[key] = buffer
+        
+        last_ts = buffer.last_timestamp
+        if last_ts is not None and len(buffer) >= limit:
+            period_ms = timeframe_to_seconds(timeframe) * 1000
+            missing = (int(time.time() * 1000) - last_ts) // period_ms + 1
+            
+            # Si faltan más velas de las pedidas sale más barato descargar todo
+            if missing < limit:
+                buffer.update(self._fetch_ohlcv(symbol, timeframe, missing + 1, since=last_ts))
+                return buffer.tail(limit)
+        
+        buffer.update(self._fetch_ohlcv(symbol, timeframe, limit), replace=True)
+        return buffer.tail(limit)
+    
+    def _fetch_ohlcv_stored(self, symbol, timeframe, limit):
+        """
+        Lee las velas del almacén en disco y descarga solo las que faltan
+        
+        Las velas cerradas descargadas se añaden al almacén; la vela en
+        formación se pide siempre al exchange y no se guarda. Si el almacén
+        tiene menos velas de las pedidas o le faltan más de
+        STORE_MAX_CATCHUP velas, se descargan las últimas `limit` y la serie
+        se reinicia con ellas para no dejar huecos.
+        
+        Args:
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            limit: Número de velas a devolver
+        
+        Returns:
+            DataFrame con las últimas `limit` velas
+        """
+        store = self.candle_store
+        exchange_id = self.exchange.id
+        now_ms = int(time.time() * 1000)
+        period_ms = timeframe_to_seconds(timeframe) * 1000
+        
+        stored = store.length(exchange_id, symbol, timeframe)
+        last_ts = store.last_timestamp(exchange_id, symbol, timeframe)
+        
+        ohlcv = None
+        if last_ts is not None and stored >= limit - 1:
+            missing = (now_ms - last_ts) // period_ms
+            if missing <= self.STORE_MAX_CATCHUP:
+                ohlcv = self._fetch_ohlcv_since(symbol, timeframe, last_ts + 1, missing + 1)
+        
+        if ohlcv is None:
+            ohlcv = self._fetch_ohlcv(symbol, timeframe, limit)
+            if ohlcv and last_ts is not None:
+                store.reset(exchange_id, symbol, timeframe)
+        
+        # Solo las velas cuyo periodo ya terminó son definitivas
+        closed = len(ohlcv)
+        while closed and next_candle_close(timeframe, ohlcv[closed - 1][0] / 1000) * 1000 > now_ms:
+            closed -= 1
+        store.append(exchange_id, symbol, timeframe, ohlcv[:closed])
+        
+        df = store.read(exchange_id, symbol, timeframe, limit=limit)
+        if closed < len(ohlcv):
+            df = pd.concat([df, self._ohlcv_to_dataframe(ohlcv[closed:])])
+        df = df.tail(limit)
+        return CompactCandles.from_dataframe(df) if self.compact else df
+    
+    def _fetch_ohlcv_since(self, symbol, timeframe, since, count):
+        """
+        Descarga hasta `count` velas desde `since`, paginando si hace falta
+        
+        Args:
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            since: Timestamp en ms de la primera vela
+            count: Número máximo de velas
+        
+        Returns:
+            Lista de velas [timestamp, open, high, low, close, volume]
+        """
+        ohlcv = []
+        while len(ohlcv) < count:
+            page_size = min(count - len(ohlcv), self.OHLCV_PAGE_LIMIT)
+            page = self._fetch_ohlcv(symbol, timeframe, page_size, since=since)
+            if not page:
+                break
+            ohlcv.extend(page)
+            if len(page) < page_size:
+                break
+            since = page[-1][0] + 1
+        return ohlcv
+    
+    def _resolve_symbol(self, symbol):
+        """
+        Normaliza el símbolo e informa de alternativas si no existe
+        
+        Args:
+            symbol: Símbolo ingresado por el usuario
+        
+        Returns:
+            Símbolo normalizado o None si no existe
+        """
+        normalized = self.normalize_symbol(symbol)
+        if normalized is None:
+            print(f"❌ Símbolo '{symbol}' no encontrado")
+            print(f"💡 Buscando símbolos similares...")
+            matches = self.search_symbol(symbol.split('/')[0] if '/' in symbol else symbol)
+            if matches:
+                print(f"   Encontrados: {', '.join(matches[:5])}")
+                print(f"   Usa uno de estos símbolos exactos")
+        return normalized
+    
+    def _ohlcv_to_dataframe(self, ohlcv):
+        """
+        Convierte la lista OHLCV de ccxt a DataFrame indexado por tiempo
+        
+        Args:
+            ohlcv: Lista de velas [timestamp, open, high, low, close, volume]
+        
+        Returns:
+            DataFrame con los datos OHLCV
+        """
+        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        df.set_index('timestamp', inplace=True)
+        return df
+    
+    def _ohlcv_to_candles(self, ohlcv):
+        """Convierte velas de ccxt al formato interno (CompactCandles en modo compacto)"""
+        if self.compact:
+            return CompactCandles.from_ohlcv(ohlcv)
+        return self._ohlcv_to_dataframe(ohlcv)
+    
+    def get_open_interest_stats(self, symbol):
+        """
+        OI actual, cambio 24h y pendiente 12h desde el almacén de OI
+        
+        Si la serie del símbolo está al día no se llama al exchange; si ha
+        llegado una hora nueva solo se descargan las horas que faltan.
+        
+        Args:
+            symbol: Par de trading
+        
+        Returns:
+            OpenInterestStats o None
+        """
+        if not hasattr(self.exchange, 'fetch_open_interest_history'):
+            return None
+        
+        series = self.oi_store.series(symbol)
+        if series.pending() is None:
+            OI_REQUESTS.inc(result='hit')
+            return series.stats
+        OI_REQUESTS.inc(result='miss')
+        
+        def fetch():
+            # Otra petición puede haber actualizado la serie mientras tanto
+            pending = series.pending()
+            if pending is None:
+                return series.stats
+            since, limit = pending
+            oi_history = self._request('fetch_open_interest_history', symbol, OI_TIMEFRAME, since=since, limit=limit)
+            return series.update(oi_history, replace=since is None)
+        
+        try:
+            return self._oi_flights.do(symbol, fetch)
         except Exception as e:
-            print(f"❌ Error obteniendo datos: {e}")
+            # Algunos exchanges no tienen OI o el símbolo no lo soporta
             return None
     
+    @STAGE_LATENCY.timed(stage='analyze_open_interest')
     def analyze_open_interest(self, symbol, df_price):
         """
         Analiza el Open Interest en relación con el precio
@@ -201,95 +744,82 @@ class CryptoTrendDetector:
             df_price: DataFrame con datos de precio
         
         Returns:
-            Dict con análisis de OI o None
+            OpenInterestResult o None
         """
         try:
-            # Obtener OI actual
-            oi_current = self.get_open_interest(symbol)
-            
-            # Obtener histórico de OI
-            df_oi = self.get_open_interest_history(symbol, '1h', limit=100)
-            
-            if df_oi is None or oi_current is None:
+            stats = self.get_open_interest_stats(symbol)
+            if stats is None:
                 return None
             
-            if len(df_oi) < 20:
-                return None
+            return self._oi_result(stats, df_price)
             
-            # Calcular cambio en OI
+        except Exception as e:
+            return None
+    
+    def analyze_open_interest_history(self, df_oi, df_price):
+        """
+        Tendencia de OI y divergencias precio-OI de un histórico ya descargado (sin llamadas al exchange)
+        
+        Args:
+            df_oi: DataFrame con histórico de OI (1h)
+            df_price: DataFrame (o CompactCandles) con datos de precio
+        
+        Returns:
+            OpenInterestResult o None
+        """
+        try:
             oi_values = df_oi['openInterestAmount'].values if 'openInterestAmount' in df_oi.columns else df_oi['openInterest'].values
+            stats = oi_statistics(oi_values.astype(np.float64))
+            if stats is None:
+                return None
             
-            oi_current_val = oi_values[-1]
-            oi_prev_24h = oi_values[-24] if len(oi_values) >= 24 else oi_values[0]
-            oi_change_24h = ((oi_current_val - oi_prev_24h) / oi_prev_24h * 100) if oi_prev_24h > 0 else 0
-            
-            # Tendencia de OI (últimas 12 horas)
-            recent_oi = oi_values[-12:]
-            oi_slope = np.polyfit(range(len(recent_oi)), recent_oi, 1)[0]
-            
-            # Determinar tendencia de OI
-            if oi_slope > 0 and oi_change_24h > 5:
-                oi_trend = "🟢 CRECIENTE FUERTE"
-            elif oi_slope > 0 and oi_change_24h > 0:
-                oi_trend = "🟢 CRECIENTE"
-            elif oi_slope < 0 and oi_change_24h < -5:
-                oi_trend = "🔴 DECRECIENTE FUERTE"
-            elif oi_slope < 0 and oi_change_24h < 0:
-                oi_trend = "🔴 DECRECIENTE"
-            else:
-                oi_trend = "🟡 ESTABLE"
-            
-            # Análisis de divergencias precio vs OI
-            price_change_24h = ((df_price['close'].iloc[-1] - df_price['close'].iloc[-24]) / df_price['close'].iloc[-24] * 100) if len(df_price) >= 24 else 0
-            
-            divergence = "NINGUNA"
-            if price_change_24h > 2 and oi_change_24h < -2:
-                divergence = "⚠️ BAJISTA (Precio sube, OI baja - Posible techo)"
-            elif price_change_24h < -2 and oi_change_24h < -2:
-                divergence = "✅ CONFIRMACIÓN BAJISTA (Precio y OI bajan - Cierres de longs)"
-            elif price_change_24h < -2 and oi_change_24h > 2:
-                divergence = "⚠️ ALCISTA (Precio baja, OI sube - Posible suelo)"
-            elif price_change_24h > 2 and oi_change_24h > 2:
-                divergence = "✅ CONFIRMACIÓN ALCISTA (Precio y OI suben - Nuevas posiciones)"
-            
-            return {
-                'oi_actual': f"{oi_current_val:,.0f}",
-                'oi_cambio_24h': f"{oi_change_24h:+.2f}%",
-                'oi_tendencia': oi_trend,
-                'divergencia': divergence,
-                'interpretacion': self._interpret_oi_signal(oi_trend, divergence, price_change_24h)
-            }
+            return self._oi_result(stats, df_price)
             
         except Exception as e:
             return None
     
-    def _interpret_oi_signal(self, oi_trend, divergence, price_change):
+    def _oi_result(self, stats, df_price):
         """
-        Interpreta la señal del Open Interest
+        Tendencia de OI y divergencia precio-OI
         
         Args:
-            oi_trend: Tendencia del OI
-            divergence: Divergencia precio-OI
-            price_change: Cambio de precio 24h
+            stats: OpenInterestStats (OI actual, cambio 24h y pendiente 12h)
+            df_price: DataFrame (o CompactCandles) con datos de precio
         
         Returns:
-            String con interpretación
+            OpenInterestResult
         """
-        if "CONFIRMACIÓN ALCISTA" in divergence:
-            return "🚀 Entrada de capital nuevo - Tendencia alcista saludable"
-        elif "CONFIRMACIÓN BAJISTA" in divergence:
-            return "📉 Cierre de posiciones long - Presión vendedora fuerte"
-        elif "Precio sube, OI baja" in divergence:
-            return "⚠️ Alerta: Subida sin respaldo - Posible corrección pronto"
-        elif "Precio baja, OI sube" in divergence:
-            return "💎 Oportunidad: Acumulación en caída - Posible rebote"
-        elif "CRECIENTE FUERTE" in oi_trend and price_change > 0:
-            return "✅ Alto interés del mercado - Momentum positivo"
-        elif "DECRECIENTE FUERTE" in oi_trend:
-            return "⚠️ Pérdida de interés - Volatilidad puede disminuir"
+        df_price = as_dataframe(df_price)
+        oi_change_24h = stats.change_24h
+        oi_slope = stats.slope
+        
+        # Determinar tendencia de OI
+        if oi_slope > 0 and oi_change_24h > 5:
+            oi_trend = OiTrend.STRONG_INCREASING
+        elif oi_slope > 0 and oi_change_24h > 0:
+            oi_trend = OiTrend.INCREASING
+        elif oi_slope < 0 and oi_change_24h < -5:
+            oi_trend = OiTrend.STRONG_DECREASING
+        elif oi_slope < 0 and oi_change_24h < 0:
+            oi_trend = OiTrend.DECREASING
         else:
-            return "➡️ Sin señales claras de OI"
+            oi_trend = OiTrend.STABLE
+        
+        # Análisis de divergencias precio vs OI
+        price_change_24h = ((df_price['close'].iloc[-1] - df_price['close'].iloc[-24]) / df_price['close'].iloc[-24] * 100) if len(df_price) >= 24 else 0
+        
+        divergence = Divergence(int(classify_divergence(price_change_24h, oi_change_24h)))
+        
+        return OpenInterestResult(
+            current=stats.current,
+            change_24h=oi_change_24h,
+            slope=oi_slope,
+            price_change_24h=float(price_change_24h),
+            trend=oi_trend,
+            divergence=divergence
+        )
     
+    @STAGE_LATENCY.timed(stage='calculate_indicators')
     def calculate_indicators(self, df):
         """
         Calcula indicadores técnicos para identificar tendencias
@@ -345,6 +875,28 @@ class CryptoTrendDetector:
         
         return df
     
+    @STAGE_LATENCY.timed(stage='calculate_indicators_incremental')
+    def calculate_indicators_incremental(self, df, symbol, timeframe):
+        """
+        Calcula los mismos indicadores que calculate_indicators de forma incremental
+        
+        Conserva el estado de cada (símbolo, timeframe) entre llamadas y,
+        mientras df empiece en la misma vela, solo procesa las velas nuevas,
+        cada una en tiempo constante. Si la ventana se desplaza se recalcula
+        entera. Los valores son idénticos a los de calculate_indicators
+        sobre df.
+        
+        Args:
+            df: DataFrame con datos OHLCV
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+        
+        Returns:
+            DataFrame con indicadores añadidos
+        """
+        return self.indicator_engine.update(symbol, timeframe, df)
+    
+    @STAGE_LATENCY.timed(stage='identify_trend')
     def identify_trend(self, df):
         """
         Identifica la tendencia actual basada en múltiples indicadores
@@ -353,7 +905,7 @@ class CryptoTrendDetector:
             df: DataFrame con indicadores calculados
         
         Returns:
-            Dict con información de la tendencia o None si no hay suficientes datos
+            TrendResult con la tendencia o None si no hay suficientes datos
         """
         if df is None:
             return None
@@ -381,61 +933,305 @@ class CryptoTrendDetector:
             ema_score += 1
         
         # Análisis de MACD
-        macd_signal = "NEUTRAL"
+        macd_signal = Direction.NEUTRAL
         if current['macd'] > current['macd_signal']:
-            macd_signal = "ALCISTA"
+            macd_signal = Direction.BULLISH
         elif current['macd'] < current['macd_signal']:
-            macd_signal = "BAJISTA"
+            macd_signal = Direction.BEARISH
         
         # Análisis de ADX (fuerza de tendencia)
-        adx_strength = "DÉBIL"
+        adx_strength = AdxStrength.WEAK
         if current['adx'] > 25:
-            adx_strength = "FUERTE"
+            adx_strength = AdxStrength.STRONG
         elif current['adx'] > 20:
-            adx_strength = "MODERADA"
+            adx_strength = AdxStrength.MODERATE
         
         # Dirección según DI
-        di_direction = "NEUTRAL"
+        di_direction = Direction.NEUTRAL
         if current['plus_di'] > current['minus_di']:
-            di_direction = "ALCISTA"
+            di_direction = Direction.BULLISH
         elif current['minus_di'] > current['plus_di']:
-            di_direction = "BAJISTA"
+            di_direction = Direction.BEARISH
         
         # RSI analysis
-        rsi_signal = "NEUTRAL"
         if current['rsi'] > 70:
-            rsi_signal = "SOBRECOMPRA"
+            rsi_signal = RsiSignal.OVERBOUGHT
         elif current['rsi'] < 30:
-            rsi_signal = "SOBREVENTA"
+            rsi_signal = RsiSignal.OVERSOLD
         elif current['rsi'] > 50:
-            rsi_signal = "ALCISTA"
+            rsi_signal = RsiSignal.BULLISH
         else:
-            rsi_signal = "BAJISTA"
+            rsi_signal = RsiSignal.BEARISH
         
         # Determinación de tendencia principal
-        if ema_score >= 4 and di_direction == "ALCISTA":
-            trend = "🟢 ALCISTA FUERTE"
-        elif ema_score >= 3 and di_direction == "ALCISTA":
-            trend = "🟢 ALCISTA"
-        elif ema_score <= 1 and di_direction == "BAJISTA":
-            trend = "🔴 BAJISTA FUERTE"
-        elif ema_score <= 2 and di_direction == "BAJISTA":
-            trend = "🔴 BAJISTA"
+        if ema_score >= 4 and di_direction == Direction.BULLISH:
+            trend = Trend.STRONG_BULLISH
+        elif ema_score >= 3 and di_direction == Direction.BULLISH:
+            trend = Trend.BULLISH
+        elif ema_score <= 1 and di_direction == Direction.BEARISH:
+            trend = Trend.STRONG_BEARISH
+        elif ema_score <= 2 and di_direction == Direction.BEARISH:
+            trend = Trend.BEARISH
         else:
-            trend = "🟡 LATERAL/INDEFINIDA"
+            trend = Trend.SIDEWAYS
+        
+        return TrendResult(
+            trend=trend,
+            price=float(current['close']),
+            ema_score=ema_score,
+            macd=macd_signal,
+            rsi=float(current['rsi']),
+            rsi_signal=rsi_signal,
+            adx=float(current['adx']),
+            adx_strength=adx_strength,
+            di_direction=di_direction,
+            atr=float(current['atr']),
+            volume=float(current['volume'])
+        )
+    
+    @STAGE_LATENCY.timed(stage='identify_trends_bulk')
+    def identify_trends_bulk(self, frames):
+        """
+        Identifica la tendencia de muchos símbolos en una sola pasada vectorizada
+        
+        Equivale a calculate_indicators + identify_trend para cada símbolo,
+        pero calcula todos los indicadores sobre paneles NumPy (uno por cada
+        longitud de histórico distinta, normalmente uno solo).
+        
+        Args:
+            frames: Dict {símbolo: DataFrame OHLCV}
+        
+        Returns:
+            Dict {símbolo: TrendResult} (sin los símbolos con menos de 50 velas)
+        """
+        results = {}
+        for symbols, trends in self._bulk_trends(frames):
+            for i, symbol in enumerate(symbols):
+                results[symbol] = trend_info_at(trends, i)
+        return results
+    
+    def _bulk_trends(self, frames):
+        """
+        Agrupa los DataFrames por número de velas y evalúa cada grupo como un panel
+        
+        Args:
+            frames: Dict {símbolo: DataFrame OHLCV o CompactCandles}
+        
+        Returns:
+            Lista de tuplas (symbols, trends) con los arrays de identify_trend_panel
+        """
+        groups = {}
+        for symbol, df in frames.items():
+            if df is not None and len(df) >= 50:
+                groups.setdefault(len(df), {})[symbol] = df
+        
+        if self.compact:
+            return self._bulk_trends_compact(groups)
+        
+        batches = []
+        for group in groups.values():
+            group = {symbol: as_dataframe(df) for symbol, df in group.items()}
+            symbols, panel = build_ohlcv_panel(group, min_candles=50)
+            indicators = compute_panel_indicators(panel)
+            batches.append((symbols, identify_trend_panel(panel, indicators)))
+        return batches
+    
+    def _bulk_trends_compact(self, groups):
+        """
+        Evalúa los grupos en float32 sobre buffers reutilizados (modo compacto)
+        
+        Args:
+            groups: Dict {número de velas: {símbolo: DataFrame o CompactCandles}}
+        
+        Returns:
+            Lista de tuplas (symbols, trends) como _bulk_trends
+        """
+        workspace = self._acquire_workspace()
+        try:
+            batches = []
+            for group in groups.values():
+                group = {
+                    symbol: candles if isinstance(candles, CompactCandles) else CompactCandles.from_dataframe(candles)
+                    for symbol, candles in group.items()
+                }
+                batches.append(workspace.trends(group))
+            return batches
+        finally:
+            self._release_workspace(workspace)
+    
+    def _acquire_workspace(self):
+        """Toma un IndicatorWorkspace libre (o crea uno): no se comparten entre threads"""
+        with self._workspaces_lock:
+            if self._workspaces:
+                return self._workspaces.pop()
+        return IndicatorWorkspace()
+    
+    def _release_workspace(self, workspace):
+        with self._workspaces_lock:
+            # Pocos scans/evaluaciones simultáneos: no hace falta guardar más
+            if len(self._workspaces) < 2:
+                self._workspaces.append(workspace)
+    
+    def get_scan_universe(self, quote='USDT'):
+        """
+        Lista los contratos perpetuos activos cotizados en `quote`
+        
+        Args:
+            quote: Moneda de cotización
+        
+        Returns:
+            Lista ordenada de símbolos (spot si el exchange no tiene perpetuos)
+        """
+        self.ensure_markets()
+        markets = self.exchange.markets or {}
+        active = {s: m for s, m in markets.items() if m.get('active', True) and m.get('quote') == quote}
+        
+        perpetuals = [s for s, m in active.items() if m.get('swap')]
+        if perpetuals:
+            return sorted(perpetuals)
+        return sorted(s for s, m in active.items() if m.get('spot'))
+    
+    def load_ohlcv_with_retry(self, symbol, timeframe, limit, retries=3):
+        """
+        Descarga velas reintentando con espera exponencial ante límites de rate o red
+        
+        Args:
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            limit: Número de velas
+            retries: Reintentos máximos
+        
+        Returns:
+            DataFrame con los datos OHLCV
+        """
+        delay = 1.0
+        for attempt in range(retries + 1):
+            try:
+                return self._load_ohlcv(symbol, timeframe, limit)
+            except ccxt.NetworkError as e:
+                # Incluye RateLimitExceeded y DDoSProtection
+                if attempt == retries:
+                    raise
+                if is_rate_limit_error(e) and self.rate_limiter is not None:
+                    # El planificador ya aplica el enfriamiento a todas las peticiones
+                    continue
+                RATE_LIMIT_WAITS.inc(source='retry')
+                RATE_LIMIT_WAIT_SECONDS.inc(delay, source='retry')
+                time.sleep(delay)
+                delay *= 2
+    
+    def load_ohlcv_many(self, symbols, timeframe, limit=200, max_workers=8):
+        """
+        Descarga las velas de muchos símbolos en paralelo (una ola por timeframe)
+        
+        Args:
+            symbols: Lista de símbolos normalizados
+            timeframe: Timeframe de las velas
+            limit: Velas por símbolo
+            max_workers: Descargas simultáneas
+        
+        Returns:
+            Tuple (frames, failed): dict {símbolo: DataFrame} (CompactCandles en modo
+            compacto) y lista de símbolos fallidos
+        """
+        frames = {}
+        failed = []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # Cada descarga conserva la prioridad del que la pide (request_priority)
+            futures = {
+                pool.submit(contextvars.copy_context().run, self.load_ohlcv_with_retry, s, timeframe, limit): s
+                for s in symbols
+            }
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    frames[symbol] = future.result()
+                except Exception:
+                    failed.append(symbol)
+        return frames, failed
+    
+    def scan_market(self, timeframe='15m', top_n=10, limit=200, max_workers=8, quote='USDT', symbols=None):
+        """
+        Escanea todos los perpetuos activos y los ordena por fuerza de tendencia
+        
+        Las velas se descargan en paralelo con concurrencia acotada (respetando
+        el rate limit de ccxt y reintentando si el exchange lo excede). La
+        tendencia de todos los símbolos se evalúa en bloque con los paneles
+        vectorizados, y cada uno pasa después por analyze_risk_alerts.
+        
+        Args:
+            timeframe: Timeframe a analizar
+            top_n: Número de símbolos por lado (alcistas y bajistas)
+            limit: Velas por símbolo
+            max_workers: Descargas simultáneas
+            quote: Moneda de cotización del universo
+            symbols: Lista de símbolos a escanear (default: get_scan_universe)
+        
+        Returns:
+            Dict con los rankings 'bullish' y 'bearish' y estadísticas del escaneo
+        """
+        started = time.time()
+        symbols = symbols if symbols is not None else self.get_scan_universe(quote)
+        print(f"🔎 Escaneando {len(symbols)} mercados ({timeframe})...")
+        
+        frames, failed = self.load_ohlcv_many(symbols, timeframe, limit, max_workers)
+        
+        ranked = []
+        for batch_symbols, trends in self._bulk_trends(frames):
+            for i, symbol in enumerate(batch_symbols):
+                trend_info = trend_info_at(trends, i)
+                results = {timeframe: trend_info}
+                risk_analysis = self.analyze_risk_alerts(results)
+                recommendation = self.generate_trading_recommendation(results, None, risk_analysis)
+                
+                adx = trends['adx'][i]
+                ranked.append({
+                    'symbol': symbol,
+                    'trend': trend_info,
+                    'trend_code': int(trends['trend'][i]),
+                    'strength': float(trends['trend'][i] * (0.0 if np.isnan(adx) else adx)),
+                    'risk_score': recommendation['risk_score'] if recommendation else None,
+                    'action': recommendation['action'] if recommendation else None
+                })
+        
+        bullish, bearish = self.rank_scan(ranked, top_n)
+        
+        elapsed = time.time() - started
+        print(f"✅ {len(ranked)} mercados analizados en {elapsed:.1f}s ({len(failed)} fallidos)")
         
         return {
-            'tendencia': trend,
-            'precio_actual': current['close'],
-            'ema_score': f"{ema_score}/5",
-            'macd': macd_signal,
-            'rsi': f"{current['rsi']:.2f} ({rsi_signal})",
-            'adx': f"{current['adx']:.2f} (Fuerza: {adx_strength})",
-            'di_direccion': di_direction,
-            'volatilidad_atr': f"{current['atr']:.4f}",
-            'volumen': current['volume']
+            'timeframe': timeframe,
+            'requested': len(symbols),
+            'analyzed': len(ranked),
+            'failed': failed,
+            'elapsed': elapsed,
+            'bullish': bullish,
+            'bearish': bearish
         }
     
+    @staticmethod
+    def rank_scan(ranked, top_n):
+        """
+        Ordena las entradas de un escaneo por fuerza de tendencia
+        
+        Args:
+            ranked: Entradas con trend_code, strength y risk_score
+            top_n: Número de símbolos por lado
+        
+        Returns:
+            Tuple (bullish, bearish) con los top_n de cada lado
+        """
+        # Más fuerza primero; a igual fuerza, menos riesgo
+        bullish = sorted(
+            (r for r in ranked if r['trend_code'] > 0),
+            key=lambda r: (-r['strength'], r['risk_score'] or 0)
+        )
+        bearish = sorted(
+            (r for r in ranked if r['trend_code'] < 0),
+            key=lambda r: (r['strength'], r['risk_score'] or 0)
+        )
+        return bullish[:top_n], bearish[:top_n]
+    
     def analyze_multiple_timeframes(self, symbol='BTC/USDT'):
         """
         Analiza tendencia en múltiples temporalidades
@@ -449,36 +1245,24 @@ class CryptoTrendDetector:
         timeframes = ['5m', '15m', '1h', '4h']
         results = {}
         
-        print(f"\n{'='*60}")
-        print(f"📈 ANÁLISIS MULTI-TIMEFRAME: {symbol}")
-        print(f"{'='*60}\n")
+        # Cada timeframe se descarga una sola vez (el 1h también sirve para OI)
+        context = AnalysisContext(self, symbol)
+        for tf in timeframes:
+            context.require(tf, 200)
+        context.require('1h', 100)
+        
+        self._print_header(symbol)
         
         for tf in timeframes:
             try:
-                df = self.get_ohlcv_data(symbol, tf, limit=200)
-                if df is not None and len(df) > 0:
-                    df = self.calculate_indicators(df)
+                df = context.indicators(tf)
+                if df is not None:
                     trend_info = self.identify_trend(df)
                     
-                    print(f"⏰ TIMEFRAME: {tf}")
-                    
-                    # Solo agregar y mostrar si hay datos suficientes
+                    # Solo agregar si hay datos suficientes
                     if trend_info is not None:
                         results[tf] = trend_info
-                        
-                        # Mostrar resultados
-                        print(f"   Tendencia: {trend_info['tendencia']}")
-                        print(f"   Precio: ${trend_info['precio_actual']:.4f}")
-                        print(f"   EMA Alineación: {trend_info['ema_score']}")
-                        print(f"   MACD: {trend_info['macd']}")
-                        print(f"   RSI: {trend_info['rsi']}")
-                        print(f"   ADX: {trend_info['adx']}")
-                        print(f"   Dirección DI: {trend_info['di_direccion']}")
-                        print(f"   Volatilidad (ATR): {trend_info['volatilidad_atr']}")
-                    else:
-                        print(f"   ⚠️  Datos insuficientes para análisis confiable (moneda muy nueva)")
-                    
-                    print()
+                    self._print_timeframe_result(tf, trend_info)
                     
             except Exception as e:
                 print(f"⏰ TIMEFRAME: {tf}")
@@ -487,24 +1271,76 @@ class CryptoTrendDetector:
                 continue
         
         # Análisis de Open Interest (solo una vez, no por timeframe)
-        print(f"{'='*60}")
-        print("📊 ANÁLISIS DE OPEN INTEREST")
-        print(f"{'='*60}\n")
-        
         # Usar datos de 1h para OI
-        df_for_oi = self.get_ohlcv_data(symbol, '1h', limit=100)
+        df_for_oi = context.candles('1h', 100)
+        oi_analysis = None
         if df_for_oi is not None:
             oi_analysis = self.analyze_open_interest(symbol, df_for_oi)
-            if oi_analysis:
-                print(f"📈 Open Interest Actual: {oi_analysis['oi_actual']}")
-                print(f"   Cambio 24h: {oi_analysis['oi_cambio_24h']}")
-                print(f"   Tendencia OI: {oi_analysis['oi_tendencia']}")
-                print(f"   Divergencia Precio-OI: {oi_analysis['divergencia']}")
-                print(f"   💡 {oi_analysis['interpretacion']}")
-            else:
-                print("⚠️  Open Interest no disponible para este símbolo/exchange")
+        
+        self._print_analysis_report(results, oi_analysis, df_for_oi is not None)
+        
+        return results
+    
+    def _print_header(self, symbol):
+        """
+        Muestra la cabecera del análisis multi-timeframe
+        
+        Args:
+            symbol: Par de trading
+        """
+        print(f"\n{'='*60}")
+        print(f"📈 ANÁLISIS MULTI-TIMEFRAME: {symbol}")
+        print(f"{'='*60}\n")
+    
+    def _print_timeframe_result(self, tf, trend_info):
+        """
+        Muestra el resultado de un timeframe
+        
+        Args:
+            tf: Timeframe analizado
+            trend_info: TrendResult de identify_trend o None si faltan datos
+        """
+        print(f"⏰ TIMEFRAME: {tf}")
+        
+        if trend_info is not None:
+            view = trend_info.formatted()
+            print(f"   Tendencia: {view['tendencia']}")
+            print(f"   Precio: ${view['precio_actual']:.4f}")
+            print(f"   EMA Alineación: {view['ema_score']}")
+            print(f"   MACD: {view['macd']}")
+            print(f"   RSI: {view['rsi']}")
+            print(f"   ADX: {view['adx']}")
+            print(f"   Dirección DI: {view['di_direccion']}")
+            print(f"   Volatilidad (ATR): {view['volatilidad_atr']}")
         else:
+            print(f"   ⚠️  Datos insuficientes para análisis confiable (moneda muy nueva)")
+        
+        print()
+    
+    def _print_analysis_report(self, results, oi_analysis, oi_data_available=True):
+        """
+        Muestra Open Interest, consenso, alertas de riesgo y recomendación
+        
+        Args:
+            results: Dict con resultados de análisis por timeframe
+            oi_analysis: OpenInterestResult o None
+            oi_data_available: False si no se pudieron obtener velas para OI
+        """
+        print(f"{'='*60}")
+        print("📊 ANÁLISIS DE OPEN INTEREST")
+        print(f"{'='*60}\n")
+        
+        if not oi_data_available:
             print("⚠️  No se pudo obtener datos para análisis de OI")
+        elif oi_analysis:
+            oi_view = oi_analysis.formatted()
+            print(f"📈 Open Interest Actual: {oi_view['oi_actual']}")
+            print(f"   Cambio 24h: {oi_view['oi_cambio_24h']}")
+            print(f"   Tendencia OI: {oi_view['oi_tendencia']}")
+            print(f"   Divergencia Precio-OI: {oi_view['divergencia']}")
+            print(f"   💡 {oi_view['interpretacion']}")
+        else:
+            print("⚠️  Open Interest no disponible para este símbolo/exchange")
         
         print()
         
@@ -581,16 +1417,15 @@ class CryptoTrendDetector:
             print()
         
         print(f"{'='*60}")
-        
-        return results
     
+    @STAGE_LATENCY.timed(stage='analyze_risk_alerts')
     def analyze_risk_alerts(self, results, oi_analysis=None):
         """
         Genera alertas de riesgo basadas en múltiples factores
         
         Args:
             results: Dict con resultados de análisis por timeframe
-            oi_analysis: Dict con análisis de Open Interest
+            oi_analysis: OpenInterestResult o None
         
         Returns:
             Dict con alertas y recomendación final
@@ -621,18 +1456,10 @@ class CryptoTrendDetector:
         rsi_values = []
         
         for tf, data in results.items():
-            if data:
-                rsi_str = data['rsi']
-                try:
-                    rsi_val = float(rsi_str.split()[0])
-                    rsi_values.append(rsi_val)
-                    
-                    if rsi_val > 85:
-                        rsi_critical_count += 1
-                    elif rsi_val < 15:
-                        rsi_critical_count += 1
-                except:
-                    pass
+            if data is not None:
+                rsi_values.append(data.rsi)
+                if data.rsi > 85 or data.rsi < 15:
+                    rsi_critical_count += 1
         
         avg_rsi = sum(rsi_values) / len(rsi_values) if rsi_values else 50
         
@@ -652,58 +1479,40 @@ class CryptoTrendDetector:
             alerts['medio'].append("RSI promedio bajo (<25) - Precaución en entradas SHORT")
         
         # 2. ANÁLISIS DE DIVERGENCIA OI vs PRECIO
-        if oi_analysis:
-            divergencia = oi_analysis.get('divergencia', '')
-            
-            if "Precio sube, OI baja" in divergencia:
-                alerts['alto'].append("Divergencia bajista precio-OI - Subida sin respaldo institucional")
-            elif "Precio baja, OI sube" in divergencia:
-                alerts['medio'].append("Divergencia alcista precio-OI - Posible acumulación")
-            elif "CONFIRMACIÓN BAJISTA" in divergencia:
-                alerts['alto'].append("Confirmación bajista OI - Cierre masivo de posiciones long")
-            elif "CONFIRMACIÓN ALCISTA" in divergencia:
-                alerts['bajo'].append("Confirmación alcista OI - Entrada de capital nuevo")
+        divergence = oi_analysis.divergence if oi_analysis else Divergence.NONE
+        if divergence == Divergence.BEARISH:
+            alerts['alto'].append("Divergencia bajista precio-OI - Subida sin respaldo institucional")
+        elif divergence == Divergence.BULLISH:
+            alerts['medio'].append("Divergencia alcista precio-OI - Posible acumulación")
+        elif divergence == Divergence.BEARISH_CONFIRMATION:
+            alerts['alto'].append("Confirmación bajista OI - Cierre masivo de posiciones long")
+        elif divergence == Divergence.BULLISH_CONFIRMATION:
+            alerts['bajo'].append("Confirmación alcista OI - Entrada de capital nuevo")
         
         # 3. ANÁLISIS DE VOLATILIDAD (ATR)
-        try:
-            atr_str = current_tf.get('volatilidad_atr', '0')
-            precio_str = current_tf.get('precio_actual', 0)
-            
-            atr_val = float(atr_str)
-            precio_val = float(precio_str)
+        if current_tf.price > 0:
+            atr_percentage = (current_tf.atr / current_tf.price) * 100
             
-            if precio_val > 0:
-                atr_percentage = (atr_val / precio_val) * 100
-                
-                if atr_percentage > 5:
-                    alerts['alto'].append(f"Volatilidad muy alta (ATR {atr_percentage:.2f}% del precio) - Riesgo de gaps")
-                elif atr_percentage > 3:
-                    alerts['medio'].append(f"Volatilidad elevada (ATR {atr_percentage:.2f}%) - Usar stops amplios")
-        except:
-            pass
+            if atr_percentage > 5:
+                alerts['alto'].append(f"Volatilidad muy alta (ATR {atr_percentage:.2f}% del precio) - Riesgo de gaps")
+            elif atr_percentage > 3:
+                alerts['medio'].append(f"Volatilidad elevada (ATR {atr_percentage:.2f}%) - Usar stops amplios")
         
         # 4. ANÁLISIS DE FUERZA DE TENDENCIA (ADX)
-        try:
-            adx_str = current_tf.get('adx', '0')
-            adx_val = float(adx_str.split()[0])
-            
-            if adx_val < 20:
-                alerts['medio'].append("ADX débil (<20) - Mercado lateral, evitar trading direccional")
-            elif adx_val > 60:
-                alerts['alto'].append("ADX muy fuerte (>60) - Tendencia agotada, posible reversión")
-        except:
-            pass
+        if current_tf.adx < 20:
+            alerts['medio'].append("ADX débil (<20) - Mercado lateral, evitar trading direccional")
+        elif current_tf.adx > 60:
+            alerts['alto'].append("ADX muy fuerte (>60) - Tendencia agotada, posible reversión")
         
         # 5. ANÁLISIS DE CONSENSO ENTRE TIMEFRAMES
         alcista_count = 0
         bajista_count = 0
         
         for tf, data in results.items():
-            if data:
-                trend = data.get('tendencia', '')
-                if 'ALCISTA' in trend:
+            if data is not None:
+                if data.trend > 0:
                     alcista_count += 1
-                elif 'BAJISTA' in trend:
+                elif data.trend < 0:
                     bajista_count += 1
         
         total = len([d for d in results.values() if d is not None])
@@ -716,9 +1525,9 @@ class CryptoTrendDetector:
         
         # 6. ANÁLISIS COMBINADO (Lo más importante)
         # Detectar "trampa alcista" o "trampa bajista"
-        if avg_rsi > 80 and "Precio sube, OI baja" in str(oi_analysis):
+        if avg_rsi > 80 and divergence == Divergence.BEARISH:
             alerts['critico'].append("⚠️ TRAMPA ALCISTA DETECTADA - Probable corrección inminente")
-        elif avg_rsi < 20 and "Precio baja, OI baja" in str(oi_analysis):
+        elif avg_rsi < 20 and divergence == Divergence.BEARISH_CONFIRMATION:
             alerts['medio'].append("💎 Posible capitulación - Oportunidad de compra en formación")
         
         return {
@@ -728,6 +1537,7 @@ class CryptoTrendDetector:
             'consensus': 'alcista' if alcista_count > bajista_count else 'bajista' if bajista_count > alcista_count else 'neutral'
         }
     
+    @STAGE_LATENCY.timed(stage='calculate_price_levels')
     def calculate_price_levels(self, df, current_price, trend_direction, atr):
         """
         Calcula niveles de precio para entrada, stop loss y take profit
@@ -863,6 +1673,7 @@ class CryptoTrendDetector:
         except Exception as e:
             return None
     
+    @STAGE_LATENCY.timed(stage='generate_trading_recommendation')
     def generate_trading_recommendation(self, results, oi_analysis, risk_alerts):
         """
         Genera recomendación final de trading basada en todo el análisis
@@ -939,7 +1750,7 @@ class CryptoTrendDetector:
             recommendations.append("Tomar ganancias parciales en soportes")
         
         # Advertencia especial si hay divergencia OI
-        if oi_analysis and "Precio sube, OI baja" in oi_analysis.get('divergencia', ''):
+        if oi_analysis and oi_analysis.divergence == Divergence.BEARISH:
             recommendations.append("⚠️ CRÍTICO: No confiar en esta subida - OI bajando")
             recommendations.append("Preparar salida o considerar cobertura SHORT")
         
@@ -974,10 +1785,9 @@ class CryptoTrendDetector:
             return
         
         for tf, data in valid_results.items():
-            trend = data['tendencia']
-            if 'ALCISTA' in trend:
+            if data.trend > 0:
                 alcista_count += 1
-            elif 'BAJISTA' in trend:
+            elif data.trend < 0:
                 bajista_count += 1
             else:
                 lateral_count += 1
@@ -1010,3 +1820,94 @@ class CryptoTrendDetector:
         else:
             print("🟡 SIN CONSENSO: Mercado lateral o indefinido")
             print("   💡 Acción sugerida: Esperar confirmación clara, operar rangos")
+
+class AnalysisContext:
+    """
+    Datos compartidos por todas las etapas del análisis de un símbolo
+    
+    Cada timeframe se descarga una sola vez, con el mayor número de velas
+    que pida cualquier etapa, y sus indicadores se calculan una sola vez.
+    Las etapas (tendencia, Open Interest, niveles de precio) reciben las
+    últimas N filas de esos datos en lugar de volver a pedirlos.
+    Los DataFrames entregados son de solo lectura.
+    """
+    
+    def __init__(self, detector, symbol):
+        """
+        Args:
+            detector: Instancia de CryptoTrendDetector
+            symbol: Símbolo normalizado
+        
+        Raises:
+            TypeError: Si detector no es un CryptoTrendDetector síncrono
+        """
+        if not isinstance(detector, CryptoTrendDetector):
+            # AsyncCryptoTrendDetector descarga con corrutinas: usa fetch_analysis_data
+            raise TypeError(f"AnalysisContext necesita un CryptoTrendDetector, no {type(detector).__name__}")
+        self.detector = detector
+        self.symbol = symbol
+        self._limits = {}
+        self._fetched = {}
+        self._frames = {}
+        self._indicators = {}
+    
+    def require(self, timeframe, limit):
+        """
+        Declara que una etapa necesitará `limit` velas de `timeframe`
+        
+        Args:
+            timeframe: Timeframe de las velas
+            limit: Número de velas
+        
+        Returns:
+            self (para encadenar llamadas)
+        """
+        self._limits[timeframe] = max(self._limits.get(timeframe, 0), limit)
+        return self
+    
+    def candles(self, timeframe, limit=None):
+        """
+        Velas OHLCV del timeframe (se descargan en el primer acceso)
+        
+        Args:
+            timeframe: Timeframe de las velas
+            limit: Últimas N velas (None = todas las descargadas)
+        
+        Returns:
+            DataFrame OHLCV o None si no hay datos
+        """
+        needed = max(self._limits.get(timeframe, 0), limit or 0)
+        if self._fetched.get(timeframe, 0) < needed:
+            self._limits[timeframe] = needed
+            self._frames[timeframe] = self.detector.get_ohlcv_data(self.symbol, timeframe, limit=needed)
+            self._fetched[timeframe] = needed
+            self._indicators.pop(timeframe, None)
+        
+        df = self._frames.get(timeframe)
+        if df is None:
+            return None
+        return df.tail(limit) if limit else df
+    
+    def indicators(self, timeframe, limit=None):
+        """
+        Velas con indicadores del timeframe (se calculan una sola vez)
+        
+        Args:
+            timeframe: Timeframe de las velas
+            limit: Últimas N filas (None = todas)
+        
+        Returns:
+            DataFrame con indicadores o None si no hay datos
+        """
+        df = self._indicators.get(timeframe)
+        if df is None:
+            candles = self.candles(timeframe)
+            if candles is None or len(candles) == 0:
+                return None
+            if self.detector.incremental:
+                df = self.detector.calculate_indicators_incremental(candles, self.symbol, timeframe)
+            else:
+                df = self.detector.calculate_indicators(candles.copy())
+            self._indicators[timeframe] = df
+        
+        return df.tail(limit) if limit else df
@@ -0,0 +1,419 @@
+"""
+Pool de detectores de varios exchanges
+Enruta cada símbolo a un exchange que lo lista, reparte los escaneos y hace failover
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ccxt
+
+from crypto_trend_detector import CryptoTrendDetector
+
+# Exchanges del pool por defecto (el primero es el principal)
+DEFAULT_EXCHANGES = ['bybit', 'binance', 'okx']
+
+# Errores de red del intento actual de DetectorPool.run (los detectores se los
+# tragan y devuelven None, así que run los recoge con el request_listener)
+_attempt_errors = contextvars.ContextVar('detector_pool_attempt_errors', default=None)
+
+class ExchangeHealth:
+    """
+    Salud de un exchange a partir de sus peticiones
+    
+    Latencia media móvil (EWMA) y circuit breaker: tras FAILURE_THRESHOLD
+    errores de red seguidos el exchange queda fuera del enrutado durante
+    un enfriamiento que se duplica si vuelve a fallar al reintentarlo.
+    """
+    
+    # Errores de red seguidos que lo dejan fuera
+    FAILURE_THRESHOLD = 3
+    
+    # Enfriamiento (segundos): inicial y máximo
+    COOLDOWN = 30.0
+    MAX_COOLDOWN = 300.0
+    
+    # Latencia media (segundos) a partir de la cual se considera lento
+    SLOW_LATENCY = 3.0
+    
+    # Peso de cada petición nueva en la media móvil
+    ALPHA = 0.2
+    
+    def __init__(self):
+        self.latency = None
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self._tripped = False
+        self._cooldown = self.COOLDOWN
+        self._lock = threading.Lock()
+    
+    def record(self, elapsed, error=None):
+        """
+        Registra una petición
+        
+        Args:
+            elapsed: Segundos que tardó
+            error: Excepción o None si fue bien (solo cuentan los errores de red)
+        """
+        with self._lock:
+            self.requests += 1
+            if error is None or isinstance(error, ccxt.RequestTimeout):
+                # Un timeout también dice cuánto está tardando
+                if self.latency is None:
+                    self.latency = elapsed
+                else:
+                    self.latency += self.ALPHA * (elapsed - self.latency)
+            
+            if error is None:
+                self.consecutive_failures = 0
+                self._tripped = False
+                self._cooldown = self.COOLDOWN
+                return
+            if not isinstance(error, ccxt.NetworkError):
+                # BadSymbol, NotSupported...: el exchange responde bien
+                return
+            
+            self.failures += 1
+            self.consecutive_failures += 1
+            # Tras el enfriamiento basta un fallo para volver a dejarlo fuera
+            if self._tripped or self.consecutive_failures >= self.FAILURE_THRESHOLD:
+                self.down_until = time.monotonic() + self._cooldown
+                self._cooldown = min(self._cooldown * 2, self.MAX_COOLDOWN)
+                self._tripped = True
+                self.consecutive_failures = 0
+    
+    @property
+    def available(self):
+        return time.monotonic() >= self.down_until
+    
+    @property
+    def slow(self):
+        return self.latency is not None and self.latency > self.SLOW_LATENCY
+    
+    def snapshot(self):
+        """
+        Returns:
+            Dict con available, slow, latency, requests y failures
+        """
+        with self._lock:
+            return {
+                'available': self.available,
+                'slow': self.slow,
+                'latency': self.latency,
+                'requests': self.requests,
+                'failures': self.failures
+            }
+
+class DetectorPool:
+    """
+    Un CryptoTrendDetector por exchange con los mercados cargados una vez
+    
+    Los símbolos se enrutan al primer exchange (en el orden configurado)
+    que los lista y está sano; los exchanges lentos pasan al final y los
+    caídos solo se usan si no queda otro. Cada exchange tiene su propio
+    rate limit, así que los escaneos se reparten entre todos.
+    """
+    
+    def __init__(self, exchanges=None, markets_cache_path=None, **detector_kwargs):
+        """
+        Args:
+            exchanges: Nombres de ccxt (default: DEFAULT_EXCHANGES); el primero es el principal
+            markets_cache_path: Copia de los mercados con {exchange} en la ruta
+                                (p. ej. 'data/markets_{exchange}.json'); sin {exchange}
+                                solo la usa el exchange principal
+            **detector_kwargs: Argumentos de CryptoTrendDetector (incremental, store_dir...)
+        """
+        self.detectors = {}
+        self.health = {}
+        
+        for name in exchanges or DEFAULT_EXCHANGES:
+            path = markets_cache_path
+            if path and '{exchange}' in path:
+                path = path.format(exchange=name)
+            elif self.detectors:
+                path = None
+            
+            try:
+                detector = CryptoTrendDetector(
+                    name, lazy_markets=True, markets_cache_path=path, **detector_kwargs
+                )
+            except Exception as e:
+                print(f"⚠️ {name} queda fuera del pool: {e}")
+                continue
+            
+            detector.request_listener = functools.partial(self._on_request, name)
+            self.detectors[name] = detector
+            self.health[name] = ExchangeHealth()
+        
+        if not self.detectors:
+            raise ValueError("Ningún exchange del pool está disponible")
+    
+    @property
+    def primary(self):
+        """Detector del primer exchange configurado"""
+        return next(iter(self.detectors.values()))
+    
+    def _on_request(self, name, method, elapsed, error):
+        self.health[name].record(elapsed, error)
+        errors = _attempt_errors.get()
+        if errors is not None and isinstance(error, ccxt.NetworkError):
+            errors.append(error)
+    
+    def warm(self, reload=False):
+        """
+        Carga los mercados de todos los exchanges en paralelo (bloqueante)
+        
+        Args:
+            reload: Descargarlos del exchange aunque haya copia en disco
+        
+        Returns:
+            Dict {exchange: número de mercados o None si falló}
+        """
+        def load(detector):
+            if reload:
+                detector.load_markets(True)
+            else:
+                detector.ensure_markets()
+            return len(detector.exchange.markets or {})
+        
+        loaded = {}
+        with ThreadPoolExecutor(max_workers=len(self.detectors)) as pool:
+            futures = {name: pool.submit(load, d) for name, d in self.detectors.items()}
+            for name, future in futures.items():
+                try:
+                    loaded[name] = future.result()
+                except Exception as e:
+                    print(f"⚠️ No se pudieron cargar los mercados de {name}: {e}")
+                    loaded[name] = None
+        return loaded
+    
+    def ranked(self):
+        """
+        Exchanges por preferencia: sanos, después lentos y por último caídos
+        
+        Returns:
+            Lista de nombres (a igual estado, en el orden configurado)
+        """
+        def state(name):
+            health = self.health[name]
+            if not health.available:
+                return 2
+            return 1 if health.slow else 0
+        
+        return sorted(self.detectors, key=state)
+    
+    def candidates(self, symbol_input):
+        """
+        Exchanges que listan un símbolo, por preferencia (los mercados se cargan al pedirlos)
+        
+        Args:
+            symbol_input: Símbolo tal como lo escribe el usuario
+        
+        Yields:
+            Tuple (exchange, detector, símbolo normalizado en ese exchange)
+        """
+        for name in self.ranked():
+            detector = self.detectors[name]
+            try:
+                symbol = detector.normalize_symbol(symbol_input)
+            except Exception:
+                # Sin mercados (exchange caído o bloqueado)
+                continue
+            if symbol is not None:
+                yield name, detector, symbol
+    
+    def route(self, symbol_input):
+        """
+        Elige el exchange para un símbolo
+        
+        Args:
+            symbol_input: Símbolo tal como lo escribe el usuario
+        
+        Returns:
+            Tuple (detector, símbolo normalizado) o (None, None) si ningún exchange lo lista
+        """
+        for name, detector, symbol in self.candidates(symbol_input):
+            return detector, symbol
+        return None, None
+    
+    def run(self, symbol_input, func):
+        """
+        Ejecuta func(detector, símbolo) con failover entre exchanges
+        
+        Si la llamada lanza una excepción o alguna de sus peticiones tiene un
+        error de red, se repite en el siguiente exchange que lista el símbolo.
+        Si fallan todos se devuelve el primer resultado obtenido (o se
+        relanza la última excepción).
+        
+        Args:
+            symbol_input: Símbolo tal como lo escribe el usuario
+            func: Función bloqueante (detector, símbolo) -> resultado
+        
+        Returns:
+            Tuple (exchange, símbolo, resultado) o (None, None, None) si ningún exchange lo lista
+        """
+        fallback = None
+        last_error = None
+        for name, detector, symbol in self.candidates(symbol_input):
+            errors = []
+            token = _attempt_errors.set(errors)
+            try:
+                result = func(detector, symbol)
+            except Exception as e:
+                last_error = e
+                continue
+            finally:
+                _attempt_errors.reset(token)
+            
+            if not errors:
+                return name, symbol, result
+            if fallback is None:
+                fallback = (name, symbol, result)
+        
+        if fallback is not None:
+            return fallback
+        if last_error is not None:
+            raise last_error
+        return None, None, None
+    
+    def scan_market(self, timeframe='15m', top_n=10, limit=200, max_workers=8, quote='USDT'):
+        """
+        Escanea la unión de los universos de todos los exchanges sanos
+        
+        Cada símbolo se escanea en un solo exchange: se asigna al que lo
+        lista con menos carga relativa a su rate limit, y los exchanges se
+        escanean a la vez. Los símbolos que fallan se reintentan una vez en
+        otro exchange que también los lista.
+        
+        Args:
+            timeframe: Timeframe a analizar
+            top_n: Número de símbolos por lado
+            limit: Velas por símbolo
+            max_workers: Descargas simultáneas por exchange
+            quote: Moneda de cotización del universo
+        
+        Returns:
+            Dict como el de CryptoTrendDetector.scan_market, con 'exchange' en cada
+            entrada y 'exchanges' = {exchange: símbolos analizados}
+        """
+        started = time.time()
+        names = [name for name in self.ranked() if self.health[name].available] or self.ranked()
+        
+        listed = {}
+        for name in names:
+            try:
+                for symbol in self.detectors[name].get_scan_universe(quote):
+                    listed.setdefault(symbol, []).append(name)
+            except Exception as e:
+                print(f"⚠️ Sin universo de {name}: {e}")
+        
+        assignments = self._assign(listed, {})
+        entries, failed = [], []
+        counts = {}
+        tried = {}
+        for _ in range(2):
+            retry = {}
+            for name, result in self._scan_each(assignments, timeframe, top_n, limit, max_workers):
+                symbols = assignments[name]
+                for symbol in symbols:
+                    tried.setdefault(symbol, set()).add(name)
+                if isinstance(result, Exception):
+                    print(f"⚠️ Error escaneando {name}: {result}")
+                    pending = symbols
+                else:
+                    counts[name] = counts.get(name, 0) + result['analyzed']
+                    for entry in result['bullish'] + result['bearish']:
+                        entry['exchange'] = name
+                        entries.append(entry)
+                    pending = result['failed']
+                for symbol in pending:
+                    others = [n for n in listed[symbol] if n not in tried[symbol]]
+                    if others:
+                        retry[symbol] = others
+                    else:
+                        failed.append(symbol)
+            if not retry:
+                break
+            # Segunda vuelta en otro exchange para los que fallaron
+            assignments = self._assign(retry, counts)
+        else:
+            failed.extend(retry)
+        
+        # Cada exchange devuelve sus top_n: juntos contienen los top_n globales
+        bullish, bearish = CryptoTrendDetector.rank_scan(entries, top_n)
+        return {
+            'timeframe': timeframe,
+            'requested': len(listed),
+            'analyzed': sum(counts.values()),
+            'failed': failed,
+            'elapsed': time.time() - started,
+            'bullish': bullish,
+            'bearish': bearish,
+            'exchanges': counts
+        }
+    
+    def _assign(self, listed, load):
+        """
+        Reparte los símbolos entre los exchanges que los listan
+        
+        Args:
+            listed: Dict {símbolo: exchanges que lo listan}
+            load: Símbolos ya asignados por exchange
+        
+        Returns:
+            Dict {exchange: lista de símbolos}
+        """
+        load = dict(load)
+        assignments = {}
+        
+        def capacity(name):
+            limiter = self.detectors[name].rate_limiter
+            return limiter.base_rate if limiter is not None else 1.0
+        
+        # Primero los símbolos con menos opciones
+        for symbol, names in sorted(listed.items(), key=lambda item: len(item[1])):
+            name = min(names, key=lambda n: load.get(n, 0) / capacity(n))
+            load[name] = load.get(name, 0) + 1
+            assignments.setdefault(name, []).append(symbol)
+        return assignments
+    
+    def _scan_each(self, assignments, timeframe, top_n, limit, max_workers):
+        """
+        Escanea cada exchange con sus símbolos en paralelo
+        
+        Yields:
+            Tuple (exchange, resultado de scan_market o la excepción)
+        """
+        with ThreadPoolExecutor(max_workers=max(1, len(assignments))) as pool:
+            futures = {
+                name: pool.submit(
+                    contextvars.copy_context().run, self.detectors[name].scan_market,
+                    timeframe, top_n, limit, max_workers, symbols=symbols
+                )
+                for name, symbols in assignments.items()
+            }
+            for name, future in futures.items():
+                try:
+                    yield name, future.result()
+                except Exception as e:
+                    yield name, e
+    
+    def status(self):
+        """
+        Returns:
+            Lista de dicts por exchange (en el orden configurado) con name,
+            markets y la salud de ExchangeHealth.snapshot
+        """
+        return [
+            {
+                'name': name,
+                'markets': len(detector.exchange.markets or {}),
+                **self.health[name].snapshot()
+            }
+            for name, detector in self.detectors.items()
+        ]
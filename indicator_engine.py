@@ -0,0 +1,325 @@
+"""
+Motor de indicadores incremental (streaming)
+Actualiza EMAs, RSI, MACD, ATR y ADX/DI en O(1) por vela nueva
+"""
+
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+from compact_candles import RollingArray
+
+# Columnas que añade calculate_indicators, en el mismo orden
+INDICATOR_COLUMNS = [
+    'ema_9', 'ema_21', 'ema_50', 'ema_200',
+    'rsi',
+    'macd', 'macd_signal', 'macd_histogram',
+    'atr',
+    'adx', 'plus_di', 'minus_di'
+]
+
+NAN = float('nan')
+
+def _div(a, b):
+    """División con la semántica de numpy (x/0 = ±inf, 0/0 = nan)"""
+    if b == 0 or a != a or b != b:
+        if a != a or b != b or a == 0:
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+class _EMA:
+    """
+    EMA equivalente a Series.ewm(span=span, adjust=False).mean()
+    
+    Reproduce la aritmética de pandas (alpha derivado de com y división
+    por la suma de pesos) para obtener exactamente los mismos valores.
+    """
+    
+    __slots__ = ('alpha', 'old_wt_factor', 'value')
+    
+    def __init__(self, span):
+        com = (span - 1) / 2.0
+        self.alpha = 1.0 / (1.0 + com)
+        self.old_wt_factor = 1.0 - self.alpha
+        self.value = None
+    
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        elif self.value != x:
+            old_wt = self.old_wt_factor
+            self.value = (old_wt * self.value + self.alpha * x) / (old_wt + self.alpha)
+        return self.value
+    
+    def copy(self):
+        clone = _EMA.__new__(_EMA)
+        clone.alpha = self.alpha
+        clone.old_wt_factor = self.old_wt_factor
+        clone.value = self.value
+        return clone
+
+class _RollingWindow:
+    """
+    Ventana deslizante equivalente a Series.rolling(size).sum()/.mean()
+    
+    Devuelve nan mientras la ventana no esté llena o contenga algún nan,
+    igual que pandas con min_periods por defecto.
+    """
+    
+    __slots__ = ('size', 'values', 'nan_count')
+    
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.nan_count = 0
+    
+    def push(self, x):
+        if len(self.values) == self.size and self.values[0] != self.values[0]:
+            self.nan_count -= 1
+        if x != x:
+            self.nan_count += 1
+        self.values.append(x)
+    
+    def sum(self):
+        if len(self.values) < self.size or self.nan_count:
+            return NAN
+        return math.fsum(self.values)
+    
+    def mean(self):
+        total = self.sum()
+        return total / self.size if total == total else NAN
+    
+    def copy(self):
+        clone = _RollingWindow.__new__(_RollingWindow)
+        clone.size = self.size
+        clone.values = self.values.copy()
+        clone.nan_count = self.nan_count
+        return clone
+
+class IndicatorState:
+    """
+    Estado de los indicadores de una serie (símbolo, timeframe)
+    
+    Guarda los valores corrientes de las EMAs, las ventanas de 14 periodos
+    y la vela anterior. Cada vela nueva se procesa en tiempo constante.
+    Si llega de nuevo la última vela (aún formándose) se deshace su efecto
+    y se aplica la versión actualizada.
+    """
+    
+    def __init__(self, period=14):
+        self.period = period
+        self.ema = {span: _EMA(span) for span in (9, 21, 50, 200, 12, 26)}
+        self.macd_signal = _EMA(9)
+        self.gain = _RollingWindow(period)
+        self.loss = _RollingWindow(period)
+        self.tr = _RollingWindow(period)
+        self.plus_dm = _RollingWindow(period)
+        self.minus_dm = _RollingWindow(period)
+        self.dx = _RollingWindow(period)
+        self.prev = None          # (high, low, close) de la vela anterior
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self._undo = None         # estado previo a la última vela
+    
+    def _snapshot(self):
+        return (
+            {span: ema.copy() for span, ema in self.ema.items()},
+            self.macd_signal.copy(),
+            self.gain.copy(), self.loss.copy(), self.tr.copy(),
+            self.plus_dm.copy(), self.minus_dm.copy(), self.dx.copy(),
+            self.prev, self.last_timestamp
+        )
+    
+    def _restore(self, snapshot):
+        (self.ema, self.macd_signal, self.gain, self.loss, self.tr,
+         self.plus_dm, self.minus_dm, self.dx, self.prev, self.last_timestamp) = snapshot
+    
+    def update(self, timestamp, high, low, close):
+        """
+        Procesa una vela y devuelve los indicadores en ese punto
+        
+        Args:
+            timestamp: Timestamp de la vela (cualquier valor ordenable)
+            high: Máximo
+            low: Mínimo
+            close: Cierre
+        
+        Returns:
+            Tuple con los valores en el orden de INDICATOR_COLUMNS
+        """
+        if self.last_timestamp is not None:
+            if timestamp == self.last_timestamp:
+                # Reemplazar la vela en formación
+                self._restore(self._undo)
+            elif timestamp < self.last_timestamp:
+                raise ValueError("Las velas deben llegar en orden cronológico")
+        
+        self._undo = self._snapshot()
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        
+        # EMAs
+        ema_9 = self.ema[9].update(close)
+        ema_21 = self.ema[21].update(close)
+        ema_50 = self.ema[50].update(close)
+        ema_200 = self.ema[200].update(close)
+        
+        # MACD
+        macd = self.ema[12].update(close) - self.ema[26].update(close)
+        macd_signal = self.macd_signal.update(macd)
+        
+        if self.prev is None:
+            # Primera vela: diff() es nan, el TR se reduce a high - low
+            gain = loss = 0.0
+            true_range = high - low
+            plus_dm = minus_dm = NAN
+        else:
+            prev_high, prev_low, prev_close = self.prev
+            delta = close - prev_close
+            gain = delta if delta > 0 else 0.0
+            loss = -delta if delta < 0 else 0.0
+            true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+            plus_dm = max(high - prev_high, 0.0)
+            minus_dm = max(-(low - prev_low), 0.0)
+        self.prev = (high, low, close)
+        
+        # RSI (medias simples de 14 periodos)
+        self.gain.push(gain)
+        self.loss.push(loss)
+        rs = _div(self.gain.mean(), self.loss.mean())
+        rsi = 100 - _div(100, 1 + rs) if rs == rs else NAN
+        
+        # ATR
+        self.tr.push(true_range)
+        atr = self.tr.mean()
+        
+        # ADX y DI
+        self.plus_dm.push(plus_dm)
+        self.minus_dm.push(minus_dm)
+        tr14 = self.tr.sum()
+        plus_di = 100 * _div(self.plus_dm.sum(), tr14)
+        minus_di = 100 * _div(self.minus_dm.sum(), tr14)
+        dx = _div(100 * abs(plus_di - minus_di), plus_di + minus_di)
+        self.dx.push(dx)
+        adx = self.dx.mean()
+        
+        return (
+            ema_9, ema_21, ema_50, ema_200,
+            rsi,
+            macd, macd_signal, macd - macd_signal,
+            atr,
+            adx, plus_di, minus_di
+        )
+
+class IndicatorEngine:
+    """
+    Indicadores incrementales para muchas series (símbolo, timeframe)
+    
+    Para cada serie mantiene un IndicatorState y el historial de los
+    últimos valores calculados. Al recibir un DataFrame que continúa la
+    serie (empieza en la misma vela que el estado y contiene la última
+    procesada) solo procesa las velas nuevas y la última, que puede haber
+    cambiado. Si no, por ejemplo con una ventana deslizante, se recalcula
+    todo el DataFrame. El resultado es siempre idéntico al de
+    CryptoTrendDetector.calculate_indicators sobre el mismo DataFrame.
+    """
+    
+    def __init__(self, history_size=1000, dtype=np.float64):
+        """
+        Args:
+            history_size: Filas de indicadores que se conservan por serie
+                          (crece si llega un DataFrame más largo)
+            dtype: Tipo del historial (np.float32 lo reduce a la mitad a costa
+                   de redondear los valores guardados)
+        """
+        self.history_size = history_size
+        self.dtype = dtype
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def _get_series(self, key):
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {
+                    'state': IndicatorState(),
+                    'history': RollingArray(self.history_size, len(INDICATOR_COLUMNS), self.dtype),
+                    'lock': threading.Lock()
+                }
+                self._series[key] = series
+            return series
+    
+    def reset(self, symbol=None, timeframe=None):
+        """
+        Descarta el estado de una o varias series
+        
+        Args:
+            symbol: Solo las de este símbolo (None = todos)
+            timeframe: Solo las de este timeframe (None = todos)
+        """
+        with self._lock:
+            for key in list(self._series):
+                if (symbol is None or key[0] == symbol) and (timeframe is None or key[1] == timeframe):
+                    del self._series[key]
+    
+    def update(self, symbol, timeframe, df):
+        """
+        Añade a df las columnas de indicadores procesando solo las velas nuevas
+        
+        Args:
+            symbol: Símbolo de la serie
+            timeframe: Timeframe de la serie
+            df: DataFrame OHLCV (índice temporal ascendente)
+        
+        Returns:
+            DataFrame con los mismos indicadores que calculate_indicators
+        """
+        df = df.copy()
+        if df.empty:
+            for column in INDICATOR_COLUMNS:
+                df[column] = np.nan
+            return df
+        
+        series = self._get_series((symbol, timeframe))
+        timestamps = df.index
+        
+        with series['lock']:
+            state = series['state']
+            history = series['history']
+            
+            start = None
+            if state.first_timestamp == timestamps[0] and state.last_timestamp in timestamps:
+                start = timestamps.get_loc(state.last_timestamp)
+                # El historial debe tener una fila por cada vela anterior del DataFrame
+                if start != len(history) - 1 or len(df) > history.capacity:
+                    start = None
+            
+            if start is None:
+                # Serie nueva, con huecos o ventana desplazada: recalcular df entero
+                state = series['state'] = IndicatorState()
+                if len(df) > history.capacity:
+                    history = series['history'] = RollingArray(len(df), len(INDICATOR_COLUMNS), self.dtype)
+                history.clear()
+                start = 0
+            else:
+                # La última vela procesada se vuelve a aplicar
+                history.truncate(len(history) - 1)
+            
+            highs = df['high'].values
+            lows = df['low'].values
+            closes = df['close'].values
+            rows = [
+                state.update(timestamps[i], float(highs[i]), float(lows[i]), float(closes[i]))
+                for i in range(start, len(df))
+            ]
+            history.extend(np.array(rows, dtype=float))
+            
+            values = history.view()[-len(df):].astype(float)
+        
+        for j, column in enumerate(INDICATOR_COLUMNS):
+            df[column] = values[:, j]
+        return df
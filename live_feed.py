@@ -0,0 +1,398 @@
+"""
+Velas en tiempo real por WebSocket
+Mantiene buffers de velas actualizados con los streams kline y tickers de Bybit
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from ohlcv_cache import timeframe_to_seconds
+
+logger = logging.getLogger(__name__)
+
+# Streams públicos de Bybit v5 por categoría de mercado
+BYBIT_PUBLIC_WS = {
+    'spot': 'wss://stream.bybit.com/v5/public/spot',
+    'linear': 'wss://stream.bybit.com/v5/public/linear',
+    'inverse': 'wss://stream.bybit.com/v5/public/inverse',
+}
+
+# Timeframe ccxt -> intervalo del topic kline de Bybit
+KLINE_INTERVALS = {
+    '1m': '1', '3m': '3', '5m': '5', '15m': '15', '30m': '30',
+    '1h': '60', '2h': '120', '4h': '240', '6h': '360', '12h': '720',
+    '1d': 'D', '1w': 'W',
+}
+
+# Bybit acepta como máximo 10 topics por mensaje de suscripción
+SUBSCRIBE_BATCH = 10
+
+def market_category(market):
+    """
+    Categoría de stream de un mercado de ccxt
+    
+    Args:
+        market: Dict de exchange.markets
+    
+    Returns:
+        'spot', 'linear', 'inverse' o None (opciones, futuros con vencimiento...)
+    """
+    if market.get('spot'):
+        return 'spot'
+    if market.get('swap'):
+        return 'linear' if market.get('linear') else 'inverse'
+    return None
+
+class _CandleBuffer:
+    """
+    Últimas velas de un (símbolo, timeframe) en formato ccxt
+    
+    Las filas [timestamp, open, high, low, close, volume] nunca se
+    modifican: una actualización de la vela en formación la reemplaza, así
+    que los lectores pueden usar las filas sin copiarlas.
+    """
+    
+    def __init__(self, timeframe, maxlen):
+        self.period_ms = timeframe_to_seconds(timeframe) * 1000
+        self.maxlen = maxlen
+        self.timestamps = []
+        self.rows = []
+        self.ready = False
+        self.lock = threading.Lock()
+    
+    def seed(self, rows):
+        """
+        Carga el histórico descargado por REST
+        
+        Las velas recibidas por WebSocket desde la última vela del histórico
+        tienen prioridad porque son más recientes.
+        """
+        with self.lock:
+            merged = {row[0]: row for row in rows}
+            if rows:
+                for row in self.rows:
+                    if row[0] >= rows[-1][0]:
+                        merged[row[0]] = row
+            self.timestamps = sorted(merged)[-self.maxlen:]
+            self.rows = [merged[ts] for ts in self.timestamps]
+            self.ready = bool(self.rows)
+    
+    def update(self, row):
+        """
+        Aplica una vela recibida por WebSocket
+        
+        Returns:
+            False si falta alguna vela entre la última guardada y esta
+        """
+        ts = row[0]
+        with self.lock:
+            if not self.timestamps or ts > self.timestamps[-1]:
+                gap = bool(self.timestamps) and ts - self.timestamps[-1] > self.period_ms
+                self.timestamps.append(ts)
+                self.rows.append(row)
+                if len(self.rows) > self.maxlen:
+                    del self.timestamps[0]
+                    del self.rows[0]
+                if gap and self.ready:
+                    self.ready = False
+                    return False
+            else:
+                i = bisect_left(self.timestamps, ts)
+                if i < len(self.timestamps) and self.timestamps[i] == ts:
+                    self.rows[i] = row
+        return True
+    
+    def tail(self, limit):
+        """Últimas `limit` filas o None si el buffer no está listo o no tiene suficientes"""
+        with self.lock:
+            if not self.ready or len(self.rows) < limit:
+                return None
+            return self.rows[-limit:]
+
+class LiveCandleFeed:
+    """
+    Suscripción a los streams kline y tickers de una lista de símbolos
+    
+    Hay una conexión WebSocket por categoría de mercado (spot, linear...).
+    Al conectar (y tras cada reconexión) el histórico de cada buffer se
+    descarga una vez con la corrutina `seed`; a partir de ahí las velas
+    llegan por la conexión. Mientras un buffer no está completo
+    (conectando, reconectando o con un hueco) get_candles devuelve None y
+    el detector vuelve a usar REST.
+    
+    Se ejecuta en el event loop con `await feed.run()`; get_candles y
+    get_price se pueden llamar desde cualquier thread.
+    """
+    
+    def __init__(self, seed, urls=None, timeframes=('5m', '15m', '1h', '4h'),
+                 buffer_size=1000, ping_interval=20, stale_after=60):
+        """
+        Args:
+            seed: Corrutina seed(symbol, timeframe) -> DataFrame OHLCV (histórico por REST)
+            urls: Dict {categoría: URL} (default: BYBIT_PUBLIC_WS; configurable
+                  para usar un servidor de prueba)
+            timeframes: Timeframes que se mantienen por símbolo
+            buffer_size: Velas que se conservan por (símbolo, timeframe)
+            ping_interval: Segundos entre pings de keep-alive
+            stale_after: Segundos sin mensajes tras los que los datos no se usan
+        """
+        for timeframe in timeframes:
+            if timeframe not in KLINE_INTERVALS:
+                raise ValueError(f"Timeframe no soportado por el stream: {timeframe}")
+        
+        self.seed = seed
+        self.urls = dict(BYBIT_PUBLIC_WS if urls is None else urls)
+        self.timeframes = tuple(timeframes)
+        self.buffer_size = buffer_size
+        self.ping_interval = ping_interval
+        self.stale_after = stale_after
+        
+        self._buffers = {}        # (símbolo, timeframe) -> _CandleBuffer
+        self._topics = {}         # categoría -> {topic: (símbolo, timeframe o None para tickers)}
+        self._categories = {}     # símbolo -> categoría
+        self._prices = {}         # símbolo -> (precio, timestamp ms)
+        self._connections = {}    # categoría -> WebSocket abierto
+        self._last_message = {}   # categoría -> time.monotonic() del último mensaje
+        self._seeding = set()
+        self._tasks = set()
+        self._running = set()
+        self._stopped = None
+        self._closed = False
+        self.messages = 0
+        self.reconnects = 0
+    
+    def _is_live(self, symbol):
+        category = self._categories.get(symbol)
+        ws = self._connections.get(category)
+        if ws is None or ws.closed:
+            return False
+        return time.monotonic() - self._last_message.get(category, 0.0) < self.stale_after
+    
+    def get_candles(self, symbol, timeframe, limit):
+        """
+        Últimas velas del buffer
+        
+        Args:
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            limit: Número de velas
+        
+        Returns:
+            Lista de velas [timestamp, open, high, low, close, volume] o None
+            si el símbolo no está suscrito o el buffer no está al día
+        """
+        buffer = self._buffers.get((symbol, timeframe))
+        if buffer is None or not self._is_live(symbol):
+            return None
+        return buffer.tail(limit)
+    
+    def get_price(self, symbol):
+        """
+        Último precio del stream tickers
+        
+        Returns:
+            Precio o None si no hay datos recientes
+        """
+        price = self._prices.get(symbol)
+        if price is None or not self._is_live(symbol):
+            return None
+        return price[0]
+    
+    def watched(self):
+        """Símbolos suscritos"""
+        return sorted(self._categories)
+    
+    def stats(self):
+        """
+        Returns:
+            Dict con conexiones abiertas, buffers y mensajes recibidos
+        """
+        return {
+            'connections': sum(1 for ws in self._connections.values() if not ws.closed),
+            'symbols': len(self._categories),
+            'buffers': len(self._buffers),
+            'ready': sum(1 for buffer in self._buffers.values() if buffer.ready),
+            'messages': self.messages,
+            'reconnects': self.reconnects
+        }
+    
+    async def watch(self, symbol, market_id, category='linear'):
+        """
+        Añade un símbolo a la suscripción
+        
+        Args:
+            symbol: Símbolo normalizado de ccxt ('BTC/USDT:USDT')
+            market_id: Id del mercado en el exchange ('BTCUSDT')
+            category: Categoría del stream (ver market_category)
+        """
+        if category not in self.urls:
+            raise ValueError(f"Sin stream para la categoría {category}")
+        if self._categories.setdefault(symbol, category) != category:
+            raise ValueError(f"{symbol} ya está suscrito en {self._categories[symbol]}")
+        
+        category_topics = self._topics.setdefault(category, {})
+        topics = []
+        for timeframe in self.timeframes:
+            topic = f"kline.{KLINE_INTERVALS[timeframe]}.{market_id}"
+            if topic not in category_topics:
+                category_topics[topic] = (symbol, timeframe)
+                self._buffers[(symbol, timeframe)] = _CandleBuffer(timeframe, self.buffer_size)
+                topics.append(topic)
+        ticker_topic = f"tickers.{market_id}"
+        if ticker_topic not in category_topics:
+            category_topics[ticker_topic] = (symbol, None)
+            topics.append(ticker_topic)
+        
+        ws = self._connections.get(category)
+        if ws is not None and not ws.closed:
+            await self._subscribe(ws, topics)
+            for timeframe in self.timeframes:
+                self._spawn(self._seed(symbol, timeframe))
+        elif self._stopped is not None:
+            self._start(category)
+    
+    async def _subscribe(self, ws, topics):
+        for i in range(0, len(topics), SUBSCRIBE_BATCH):
+            await ws.send_json({'op': 'subscribe', 'args': topics[i:i + SUBSCRIBE_BATCH]})
+    
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
+    async def _seed(self, symbol, timeframe):
+        """Descarga el histórico de un buffer (una sola vez a la vez por buffer)"""
+        key = (symbol, timeframe)
+        if key in self._seeding:
+            return
+        self._seeding.add(key)
+        try:
+            df = await self.seed(symbol, timeframe)
+            if df is not None and len(df):
+                timestamps = df.index.values.astype('datetime64[ms]').astype('int64')
+                values = df[['open', 'high', 'low', 'close', 'volume']].values.tolist()
+                rows = [[int(ts)] + row for ts, row in zip(timestamps, values)]
+                self._buffers[key].seed(rows)
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el histórico de {symbol} {timeframe}: {e}")
+        finally:
+            self._seeding.discard(key)
+    
+    async def run(self):
+        """Abre una conexión por categoría suscrita y las mantiene hasta close()"""
+        self._stopped = asyncio.Event()
+        for category in self._topics:
+            self._start(category)
+        await self._stopped.wait()
+    
+    def _start(self, category):
+        if category not in self._running:
+            self._running.add(category)
+            self._spawn(self._connection_loop(category))
+    
+    async def _connection_loop(self, category):
+        """Mantiene abierta la conexión de una categoría (reconecta con backoff exponencial)"""
+        import aiohttp
+        
+        url = self.urls[category]
+        backoff = 1
+        while not self._closed:
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async with session.ws_connect(url, heartbeat=self.ping_interval) as ws:
+                        logger.info(f"Feed conectado a {url} ({len(self._topics[category])} topics)")
+                        backoff = 1
+                        await self._listen(category, ws)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Feed {category} desconectado: {e}")
+            
+            if self._closed:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+    
+    async def _listen(self, category, ws):
+        import aiohttp
+        
+        self._connections[category] = ws
+        self._last_message[category] = time.monotonic()
+        topics = self._topics[category]
+        ping = self._spawn(self._ping_loop(ws))
+        try:
+            await self._subscribe(ws, list(topics))
+            for symbol, timeframe in list(topics.values()):
+                if timeframe is not None:
+                    self._spawn(self._seed(symbol, timeframe))
+            
+            async for message in ws:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    self._last_message[category] = time.monotonic()
+                    self._handle(topics, json.loads(message.data))
+                elif message.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+        finally:
+            ping.cancel()
+            del self._connections[category]
+            # Tras una desconexión los buffers pueden tener huecos
+            for symbol, timeframe in topics.values():
+                if timeframe is not None:
+                    self._buffers[(symbol, timeframe)].ready = False
+    
+    async def _ping_loop(self, ws):
+        while not ws.closed:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send_json({'op': 'ping'})
+    
+    def _handle(self, topics, message):
+        """Aplica un mensaje del stream a los buffers"""
+        self.messages += 1
+        
+        topic = message.get('topic')
+        if topic is None:
+            if message.get('op') == 'subscribe' and not message.get('success', True):
+                logger.warning(f"Suscripción rechazada: {message.get('ret_msg')}")
+            return
+        
+        target = topics.get(topic)
+        if target is None:
+            return
+        symbol, timeframe = target
+        
+        if timeframe is None:
+            # tickers: los mensajes delta solo traen los campos que cambian
+            price = message.get('data', {}).get('lastPrice')
+            if price:
+                self._prices[symbol] = (float(price), message.get('ts'))
+            return
+        
+        buffer = self._buffers[(symbol, timeframe)]
+        for kline in message.get('data', []):
+            row = [
+                int(kline['start']),
+                float(kline['open']),
+                float(kline['high']),
+                float(kline['low']),
+                float(kline['close']),
+                float(kline['volume'])
+            ]
+            if not buffer.update(row):
+                # Se perdió alguna vela: recargar el histórico
+                self._spawn(self._seed(symbol, timeframe))
+    
+    async def close(self):
+        """Cierra las conexiones y detiene run()"""
+        self._closed = True
+        for ws in list(self._connections.values()):
+            await ws.close()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._stopped is not None:
+            self._stopped.set()
@@ -1,11 +1,83 @@
+import argparse
+import time
+
 from crypto_trend_detector import CryptoTrendDetector
+from batch_analysis import BATCH_TIMEFRAMES, analyze_symbols
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Detector de tendencias crypto")
+    parser.add_argument('--exchange', default='bybit', help="Exchange de ccxt (default: bybit)")
+    parser.add_argument('--symbols', help="Modo por lotes: símbolos separados por comas (BTC,ETH,SOL) "
+                                          "o @fichero con un símbolo por línea")
+    parser.add_argument('--timeframes', default=','.join(BATCH_TIMEFRAMES),
+                        help="Timeframes del modo por lotes (default: %(default)s)")
+    parser.add_argument('--limit', type=int, default=200, help="Velas por símbolo y timeframe")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos de cálculo (default: número de CPUs)")
+    parser.add_argument('--fetch-workers', type=int, default=8, help="Descargas simultáneas")
+    parser.add_argument('--no-oi', action='store_true', help="Omitir el análisis de Open Interest")
+    return parser.parse_args()
 
-if __name__ == "__main__":
-    print("🚀 INICIANDO DETECTOR DE TENDENCIAS CRYPTO\n")
+def read_symbols(value):
+    """'BTC,ETH' o '@fichero' -> lista de símbolos (sin vacíos ni comentarios)"""
+    if value.startswith('@'):
+        with open(value[1:]) as f:
+            items = [line.split('#')[0] for line in f]
+    else:
+        items = value.split(',')
+    return [item.strip() for item in items if item.strip()]
+
+def print_batch_result(result, timeframes):
+    """Una línea por símbolo con precio, tendencia por timeframe y acción recomendada"""
+    if 'error' in result:
+        print(f"❌ {result['symbol']}: {result['error']}")
+        return
+    
+    results = result['results']
+    if not results:
+        print(f"⚠️  {result['symbol']}: datos insuficientes")
+        return
+    
+    price = next(iter(results.values())).price
+    trends = " | ".join(
+        f"{tf} {results[tf].trend.label}" if tf in results else f"{tf} -" for tf in timeframes
+    )
+    print(f"📊 {result['symbol']}  ${price:.4f}")
+    print(f"   {trends}")
+    
+    recommendation = result['recommendation']
+    if recommendation:
+        print(f"   {recommendation['action']} (riesgo {recommendation['risk_score']}/16) - {recommendation['bias']}")
+
+def run_batch(args):
+    """Analiza todos los símbolos de --symbols y muestra cada uno al terminar"""
+    detector = CryptoTrendDetector(exchange_name=args.exchange)
+    timeframes = [tf.strip() for tf in args.timeframes.split(',') if tf.strip()]
     
+    symbols = []
+    for item in read_symbols(args.symbols):
+        symbol = detector.normalize_symbol(item)
+        if symbol is None:
+            print(f"❌ No se encontró el símbolo '{item}'")
+        elif symbol not in symbols:
+            symbols.append(symbol)
+    if not symbols:
+        return 1
+    
+    print(f"\n🔎 Analizando {len(symbols)} símbolos ({', '.join(timeframes)})...\n")
+    started = time.time()
+    failed = 0
+    for result in analyze_symbols(detector, symbols, timeframes, args.limit, args.workers,
+                                  args.fetch_workers, open_interest=not args.no_oi):
+        failed += 'error' in result
+        print_batch_result(result, timeframes)
+    
+    print(f"\n✅ {len(symbols) - failed}/{len(symbols)} símbolos analizados en {time.time() - started:.1f}s")
+    return 0
+
+def run_interactive(args):
+    """Análisis completo de un símbolo pedido por consola"""
     # Inicializar detector (puedes cambiar a 'binance', 'okx', etc.)
-    detector = CryptoTrendDetector(exchange_name='bybit')
+    detector = CryptoTrendDetector(exchange_name=args.exchange)
     
     # Preguntar al usuario qué símbolo analizar
     symbol_input = input("\n¿Qué moneda quieres analizar? (ejemplo: BTC/USDT o BTCUSDT): ").strip()
@@ -32,7 +104,7 @@ if __name__ == "__main__":
             print("\n💡 Usa uno de estos símbolos exactos\n")
         else:
             print(f"⚠️  No se encontraron símbolos similares a '{base_search}'")
-        exit(1)
+        return 1
     
     print(f"\n✅ Símbolo encontrado: {symbol}\n")
     
@@ -43,7 +115,7 @@ if __name__ == "__main__":
         if not results:
             print("\n❌ No se pudo realizar el análisis")
             print("💡 Esta moneda puede ser demasiado nueva o no tener suficientes datos históricos")
-            exit(1)
+            return 1
         
         # Análisis detallado de 15 minutos
         print(f"\n{'='*60}")
@@ -79,4 +151,10 @@ if __name__ == "__main__":
         print(f"❌ Error en el análisis: {e}")
         import traceback
         traceback.print_exc()
-        print("\n💡 Asegúrate de tener instalado: pip install ccxt pandas numpy")
\ No newline at end of file
+        print("\n💡 Asegúrate de tener instalado: pip install ccxt pandas numpy")
+
+if __name__ == "__main__":
+    args = parse_args()
+    print("🚀 INICIANDO DETECTOR DE TENDENCIAS CRYPTO\n")
+    
+    exit(run_batch(args) if args.symbols else run_interactive(args))
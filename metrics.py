@@ -0,0 +1,337 @@
+"""
+Métricas de latencia y contadores del pipeline
+Histogramas y contadores en memoria expuestos en el formato de texto de Prometheus
+"""
+
+import bisect
+import functools
+import inspect
+import threading
+import time
+
+# Prefijo de todas las métricas
+NAMESPACE = 'trend_detector'
+
+# Límites superiores (segundos) de los buckets de los histogramas
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class _Noop:
+    """Context manager vacío que se devuelve cuando las métricas están desactivadas"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+_NOOP = _Noop()
+
+def _escape(value):
+    """Escapa un valor de etiqueta para el formato de Prometheus"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class _Timer:
+    """Mide el bloque y lo registra en el histograma (y el error, si lo hay)"""
+    
+    __slots__ = ('histogram', 'key', 'errors', 'labels', 'start')
+    
+    def __init__(self, histogram, key, errors=None, labels=None):
+        self.histogram = histogram
+        self.key = key
+        self.errors = errors
+        self.labels = labels
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram._observe(self.key, time.perf_counter() - self.start)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(error=exc_type.__name__, **self.labels)
+        return False
+
+class _Metric:
+    """Base de Counter e Histogram: nombre, ayuda, etiquetas y valores por etiqueta"""
+    
+    kind = None
+    
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry = registry
+        self.name = f"{NAMESPACE}_{name}"
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+    
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+class Counter(_Metric):
+    """Contador acumulado por combinación de etiquetas"""
+    
+    kind = 'counter'
+    
+    def inc(self, amount=1, **labels):
+        """Suma amount (no hace nada con las métricas desactivadas)"""
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+    
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in items]
+
+class Histogram(_Metric):
+    """Histograma de duraciones (buckets acumulados, suma y número de muestras)"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, registry, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(buckets)
+    
+    def observe(self, value, **labels):
+        """Registra una muestra (no hace nada con las métricas desactivadas)"""
+        if not self.registry.enabled:
+            return
+        self._observe(self._key(labels), value)
+    
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+    
+    def time(self, **labels):
+        """
+        Context manager que mide la duración del bloque
+        
+        Con las métricas desactivadas devuelve un context manager vacío.
+        """
+        if not self.registry.enabled:
+            return _NOOP
+        return _Timer(self, self._key(labels))
+    
+    def track(self, errors, **labels):
+        """
+        Como time(), pero además cuenta en `errors` las excepciones del bloque
+        
+        Args:
+            errors: Counter con las mismas etiquetas más 'error' (nombre de la excepción)
+        """
+        if not self.registry.enabled:
+            return _NOOP
+        return _Timer(self, self._key(labels), errors, labels)
+    
+    def timed(self, **labels):
+        """Decorador que mide cada llamada a la función"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.registry.enabled:
+                    return func(*args, **kwargs)
+                with _Timer(self, self._key(labels)):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+    
+    def stats(self, **labels):
+        """
+        Returns:
+            Dict con count y sum de una combinación de etiquetas
+        """
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return {'count': state[2], 'sum': state[1]} if state else {'count': 0, 'sum': 0.0}
+    
+    def render(self):
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', repr(float(bound)))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas del proceso
+    
+    Desactivado por defecto: mientras enabled es False, inc/observe vuelven
+    inmediatamente y time()/track() devuelven un context manager vacío, así
+    que la instrumentación de los caminos calientes apenas cuesta nada.
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self._metrics = []
+    
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(self, name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+    
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self, name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+    
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+    
+    def render(self):
+        """
+        Returns:
+            Texto en el formato de exposición de Prometheus
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+# Llamadas al exchange (fetch_ohlcv, fetch_open_interest...)
+EXCHANGE_LATENCY = registry.histogram(
+    'exchange_request_seconds', 'Duración de las llamadas al exchange', ['method']
+)
+EXCHANGE_ERRORS = registry.counter(
+    'exchange_errors_total', 'Llamadas al exchange que terminaron en excepción', ['method', 'error']
+)
+RATE_LIMIT_WAITS = registry.counter(
+    'rate_limit_waits_total', 'Esperas por el rate limit del exchange o reintentos', ['source']
+)
+RATE_LIMIT_WAIT_SECONDS = registry.counter(
+    'rate_limit_wait_seconds_total', 'Segundos esperados por el rate limit o reintentos', ['source']
+)
+
+# Origen de las velas pedidas: feed en vivo, caché o descarga
+OHLCV_REQUESTS = registry.counter(
+    'ohlcv_requests_total', 'Peticiones de velas por origen (live, hit, miss)', ['result']
+)
+
+# Análisis de Open Interest servidos desde el almacén (hit) o con descarga (miss)
+OI_REQUESTS = registry.counter(
+    'open_interest_requests_total', 'Análisis de OI por origen (hit, miss)', ['result']
+)
+
+# Etapas del análisis (indicadores, tendencia, riesgos, recomendación...)
+STAGE_LATENCY = registry.histogram(
+    'analysis_stage_seconds', 'Duración de cada etapa del análisis', ['stage']
+)
+
+# Bot de Telegram
+TELEGRAM_LATENCY = registry.histogram(
+    'telegram_request_seconds', 'Duración de las llamadas a la API de Telegram', ['endpoint']
+)
+TELEGRAM_ERRORS = registry.counter(
+    'telegram_errors_total', 'Llamadas a la API de Telegram fallidas', ['endpoint', 'error']
+)
+COMMAND_LATENCY = registry.histogram(
+    'bot_command_seconds', 'Duración total de cada comando del bot', ['command']
+)
+
+def enable():
+    registry.enabled = True
+
+def disable():
+    registry.enabled = False
+
+def is_enabled():
+    return registry.enabled
+
+def instrument_throttle(exchange):
+    """
+    Cuenta las esperas del rate limiter interno de un exchange de ccxt
+    
+    Envuelve exchange.throttle (la espera que hace ccxt antes de cada
+    petición con enableRateLimit). Solo tiene efecto con las métricas activas,
+    enableRateLimit activado y un exchange síncrono: en ccxt.async_support
+    throttle devuelve una corrutina y solo se mediría su creación.
+    
+    Args:
+        exchange: Instancia de ccxt (síncrona)
+    """
+    original = getattr(exchange, 'throttle', None)
+    if original is None or not registry.enabled or not getattr(exchange, 'enableRateLimit', False):
+        return
+    if inspect.iscoroutinefunction(original):
+        return
+    
+    def throttle(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            waited = time.perf_counter() - start
+            if waited > 0.001:
+                RATE_LIMIT_WAITS.inc(source='throttle')
+                RATE_LIMIT_WAIT_SECONDS.inc(waited, source='throttle')
+    
+    exchange.throttle = throttle
+
+def start_http_server(port, host='127.0.0.1'):
+    """
+    Sirve las métricas en http://host:port/metrics desde un thread en segundo plano
+    
+    Args:
+        port: Puerto local
+        host: Interfaz (por defecto solo localhost)
+    
+    Returns:
+        El servidor HTTP (server.shutdown() para pararlo)
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True)
+    thread.start()
+    return server
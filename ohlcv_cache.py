@@ -0,0 +1,210 @@
+"""
+Caché en memoria para datos OHLCV
+Las entradas caducan al cierre de la vela en curso de su timeframe
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+# Segundos por unidad de timeframe (mismo formato que ccxt: '5m', '1h', '1d'...)
+TIMEFRAME_UNITS = {
+    's': 1,
+    'm': 60,
+    'h': 60 * 60,
+    'd': 60 * 60 * 24,
+    'w': 60 * 60 * 24 * 7,
+    'M': 60 * 60 * 24 * 30,
+}
+
+# Las velas semanales abren en lunes; el epoch Unix (1970-01-01) fue jueves
+WEEK_OFFSET = 4 * 60 * 60 * 24
+
+def timeframe_to_seconds(timeframe):
+    """
+    Convierte un timeframe a segundos
+    
+    Args:
+        timeframe: Timeframe en formato ccxt ('5m', '1h', '4h', '1d')
+    
+    Returns:
+        Duración de una vela en segundos
+    """
+    amount = int(timeframe[:-1])
+    unit = timeframe[-1]
+    if unit not in TIMEFRAME_UNITS:
+        raise ValueError(f"Timeframe no soportado: {timeframe}")
+    return amount * TIMEFRAME_UNITS[unit]
+
+def next_candle_close(timeframe, now=None):
+    """
+    Calcula el instante en que cierra la vela en curso
+    
+    Args:
+        timeframe: Timeframe en formato ccxt
+        now: Timestamp Unix en segundos (default: ahora)
+    
+    Returns:
+        Timestamp Unix (segundos) del cierre de la vela actual
+    """
+    now = time.time() if now is None else now
+    unit = timeframe[-1]
+    
+    if unit == 'M':
+        # Velas mensuales: cierran el primer día del mes siguiente
+        months = int(timeframe[:-1])
+        current = datetime.fromtimestamp(now, tz=timezone.utc)
+        month_index = current.year * 12 + current.month - 1
+        month_index = (month_index // months + 1) * months
+        year, month = divmod(month_index, 12)
+        return datetime(year, month + 1, 1, tzinfo=timezone.utc).timestamp()
+    
+    period = timeframe_to_seconds(timeframe)
+    offset = WEEK_OFFSET if unit == 'w' else 0
+    return ((now - offset) // period + 1) * period + offset
+
+class OHLCVCache:
+    """
+    Caché LRU de velas OHLCV (DataFrames o CompactCandles) con caducidad al cierre de vela
+    
+    Las claves son (symbol, timeframe, limit). Una entrada de 4h se reutiliza
+    hasta que cierra la vela de 4h en curso, mientras que una de 5m se
+    refresca cada 5 minutos. El tamaño está acotado por número de entradas
+    y por memoria ocupada. Es seguro usarla desde varios threads.
+    """
+    
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024):
+        """
+        Args:
+            max_entries: Número máximo de entradas
+            max_bytes: Memoria máxima (aprox.) ocupada por las velas
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, symbol, timeframe, limit, now=None):
+        """
+        Busca un DataFrame vigente en la caché
+        
+        Args:
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            limit: Número de velas pedido
+            now: Timestamp Unix en segundos (default: ahora)
+        
+        Returns:
+            Copia del DataFrame cacheado o None si no existe o caducó
+        """
+        key = (symbol, timeframe, limit)
+        now = time.time() if now is None else now
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            df, expires_at, size = entry
+            if now >= expires_at:
+                # La vela cerró: los datos ya no son válidos
+                del self._entries[key]
+                self.bytes_used -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+        
+        # Copia: calculate_indicators modifica el DataFrame in-place
+        return df.copy()
+    
+    def set(self, symbol, timeframe, limit, df, now=None):
+        """
+        Guarda un DataFrame hasta el cierre de la vela en curso
+        
+        Args:
+            symbol: Símbolo normalizado
+            timeframe: Timeframe de las velas
+            limit: Número de velas pedido
+            df: DataFrame OHLCV o CompactCandles
+            now: Timestamp Unix en segundos (default: ahora)
+        """
+        if df is None:
+            return
+        
+        key = (symbol, timeframe, limit)
+        now = time.time() if now is None else now
+        df = df.copy()
+        if hasattr(df, 'memory_usage'):
+            size = int(df.memory_usage(index=True).sum())
+        else:
+            size = int(df.nbytes)
+        
+        if size > self.max_bytes:
+            return
+        
+        expires_at = next_candle_close(timeframe, now)
+        
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes_used -= old[2]
+            
+            self._entries[key] = (df, expires_at, size)
+            self.bytes_used += size
+            
+            # Expulsar las entradas menos usadas hasta respetar los límites
+            while len(self._entries) > self.max_entries or self.bytes_used > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.bytes_used -= evicted_size
+                self.evictions += 1
+    
+    def invalidate(self, symbol=None, timeframe=None):
+        """
+        Elimina entradas de la caché
+        
+        Args:
+            symbol: Solo las de este símbolo (None = todos)
+            timeframe: Solo las de este timeframe (None = todos)
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if (symbol is None or key[0] == symbol) and (timeframe is None or key[1] == timeframe):
+                    self.bytes_used -= self._entries.pop(key)[2]
+    
+    def clear(self):
+        """Vacía la caché (los contadores se conservan)"""
+        self.invalidate()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def stats(self):
+        """
+        Estadísticas de uso de la caché
+        
+        Returns:
+            Dict con aciertos, fallos, expulsiones, entradas y memoria
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._entries),
+                'bytes': self.bytes_used,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes
+            }
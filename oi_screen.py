@@ -0,0 +1,291 @@
+"""
+Open Interest de todo el universo de perpetuos
+Instantáneas en bloque, panel indexado por tiempo y divergencias precio-OI en una sola pasada vectorizada
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analysis_types import Divergence
+from metrics import STAGE_LATENCY
+from oi_store import classify_divergence
+from singleflight import SingleFlight
+
+# Horas de instantáneas que conserva el panel
+OI_PANEL_HOURS = 48
+
+# Campos de OI en la respuesta cruda de fetch_tickers (Bybit los incluye en
+# cada ticker de derivados: cantidad en contratos y valor en USD)
+TICKER_OI_FIELDS = ('openInterest', 'openInterestValue')
+
+# Columnas de cada instantánea
+SNAPSHOT_COLUMNS = ['open_interest', 'open_interest_value', 'price']
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+class OpenInterestPanel:
+    """
+    Instantáneas de OI y precio de muchos símbolos
+    
+    Dos DataFrames con una fila por instantánea (índice temporal) y una
+    columna por símbolo. Las filas de más de max_hours se descartan.
+    """
+    
+    def __init__(self, max_hours=OI_PANEL_HOURS):
+        self.max_hours = max_hours
+        self.open_interest = None
+        self.prices = None
+        self.latest = None
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return 0 if self.open_interest is None else len(self.open_interest)
+    
+    @property
+    def last_update(self):
+        """Timestamp Unix (segundos) de la última instantánea (None si está vacío)"""
+        with self._lock:
+            if self.open_interest is None:
+                return None
+            return self.open_interest.index[-1].timestamp()
+    
+    def add(self, snapshot, timestamp=None):
+        """
+        Añade una instantánea
+        
+        Args:
+            snapshot: DataFrame indexado por símbolo con SNAPSHOT_COLUMNS
+            timestamp: Timestamp Unix en segundos (default: ahora)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        index = pd.DatetimeIndex([pd.Timestamp(timestamp, unit='s')], name='timestamp')
+        oi_row = pd.DataFrame([snapshot['open_interest'].to_numpy()], index=index, columns=snapshot.index)
+        price_row = pd.DataFrame([snapshot['price'].to_numpy()], index=index, columns=snapshot.index)
+        
+        with self._lock:
+            if self.open_interest is None:
+                self.open_interest, self.prices = oi_row, price_row
+            else:
+                cutoff = index[0] - pd.Timedelta(hours=self.max_hours)
+                self.open_interest = pd.concat([self.open_interest[self.open_interest.index >= cutoff], oi_row])
+                self.prices = pd.concat([self.prices[self.prices.index >= cutoff], price_row])
+            self.latest = snapshot
+    
+    def changes(self, hours=24):
+        """
+        Cambio de OI y de precio y divergencia de todos los símbolos
+        
+        La referencia es la última instantánea con al menos `hours` de
+        antigüedad; si el panel es más corto se usa la primera (como el
+        análisis por símbolo cuando hay menos de 24 horas de OI). Los
+        símbolos que aparecieron después se comparan con su primer valor.
+        
+        Args:
+            hours: Ventana del cambio
+        
+        Returns:
+            Tuple (DataFrame indexado por símbolo, horas reales de la ventana)
+            con SNAPSHOT_COLUMNS, 'oi_change', 'price_change' (%) y 'divergence'
+            (códigos de Divergence), o (None, 0) si el panel está vacío
+        """
+        with self._lock:
+            if self.open_interest is None:
+                return None, 0
+            oi, prices, latest = self.open_interest, self.prices, self.latest
+        
+        times = oi.index
+        older = np.flatnonzero(times <= times[-1] - pd.Timedelta(hours=hours))
+        reference = older[-1] if len(older) else 0
+        window = (times[-1] - times[reference]).total_seconds() / 3600
+        
+        def change(panel):
+            current = panel.iloc[-1].to_numpy()
+            previous = panel.iloc[reference].fillna(panel.bfill().iloc[0]).to_numpy()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(previous > 0, (current - previous) / previous * 100, 0.0)
+        
+        result = latest.reindex(oi.columns)
+        result['oi_change'] = change(oi)
+        result['price_change'] = change(prices)
+        result['divergence'] = classify_divergence(result['price_change'], result['oi_change'])
+        return result.dropna(subset=['open_interest']), window
+
+class OpenInterestScreen:
+    """
+    Screener de Open Interest del universo de perpetuos
+    
+    Cada refresco pide el OI de todos los perpetuos con el menor número de
+    llamadas que permite el exchange: los tickers (Bybit incluye el OI en
+    ellos, una sola llamada), fetch_open_interests si el exchange lo tiene
+    y, para los símbolos que falten, fetch_open_interest por símbolo con
+    como mucho max_workers peticiones a la vez.
+    """
+    
+    def __init__(self, detector, max_workers=8, max_hours=OI_PANEL_HOURS, quote='USDT'):
+        """
+        Args:
+            detector: Instancia de CryptoTrendDetector
+            max_workers: Peticiones simultáneas en la descarga por símbolo
+            max_hours: Horas de instantáneas que se conservan
+            quote: Moneda de cotización del universo
+        """
+        self.detector = detector
+        self.max_workers = max_workers
+        self.quote = quote
+        self.panel = OpenInterestPanel(max_hours)
+        self._flights = SingleFlight()
+        self.last_refresh = None
+    
+    def universe(self):
+        """Perpetuos activos cotizados en quote"""
+        markets = self.detector.exchange.markets or {}
+        return [s for s in self.detector.get_scan_universe(self.quote) if markets.get(s, {}).get('swap')]
+    
+    def fetch_snapshot(self, symbols):
+        """
+        OI y precio actuales de muchos símbolos (bloqueante)
+        
+        Args:
+            symbols: Lista de símbolos perpetuos
+        
+        Returns:
+            Tuple (DataFrame indexado por símbolo con SNAPSHOT_COLUMNS,
+            dict {origen: símbolos}) con orígenes 'tickers', 'bulk' y 'single'
+        """
+        exchange = self.detector.exchange
+        amounts, values, prices = {}, {}, {}
+        sources = {'tickers': 0, 'bulk': 0, 'single': 0}
+        
+        # Precios (y OI si el exchange lo incluye) en una llamada
+        try:
+            tickers = self.detector._request('fetch_tickers', symbols)
+        except Exception as e:
+            print(f"⚠️ Sin tickers: {e}")
+            tickers = {}
+        for symbol, ticker in tickers.items():
+            prices[symbol] = _to_float(ticker.get('last'))
+            info = ticker.get('info') or {}
+            amount = _to_float(info.get(TICKER_OI_FIELDS[0]))
+            if not np.isnan(amount):
+                amounts[symbol] = amount
+                values[symbol] = _to_float(info.get(TICKER_OI_FIELDS[1]))
+                sources['tickers'] += 1
+        
+        missing = [symbol for symbol in symbols if symbol not in amounts]
+        if missing and exchange.has.get('fetchOpenInterests'):
+            try:
+                wanted = set(missing)
+                for item in self.detector._request('fetch_open_interests', missing).values():
+                    amount = _to_float(item.get('openInterestAmount'))
+                    if item.get('symbol') in wanted and not np.isnan(amount):
+                        amounts[item['symbol']] = amount
+                        values[item['symbol']] = _to_float(item.get('openInterestValue'))
+                        sources['bulk'] += 1
+            except Exception as e:
+                print(f"⚠️ fetch_open_interests falló: {e}")
+            missing = [symbol for symbol in missing if symbol not in amounts]
+        
+        if missing:
+            # Un símbolo por petición, con concurrencia acotada; cada petición
+            # conserva la prioridad del que refresca (request_priority)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self.detector.get_open_interest, symbol)
+                    for symbol in missing
+                ]
+                for symbol, future in zip(missing, futures):
+                    oi = future.result()
+                    if oi is not None:
+                        amounts[symbol] = _to_float(oi['open_interest'])
+                        values[symbol] = _to_float(oi['open_interest_value'])
+                        sources['single'] += 1
+        
+        index = pd.Index(symbols, name='symbol')
+        snapshot = pd.DataFrame({
+            'open_interest': pd.Series(amounts, dtype=np.float64),
+            'open_interest_value': pd.Series(values, dtype=np.float64),
+            'price': pd.Series(prices, dtype=np.float64)
+        }).reindex(index)
+        
+        # Sin valor en USD: cantidad × precio
+        no_value = ~(snapshot['open_interest_value'] > 0)
+        snapshot.loc[no_value, 'open_interest_value'] = snapshot['open_interest'] * snapshot['price']
+        return snapshot, sources
+    
+    @STAGE_LATENCY.timed(stage='oi_snapshot')
+    def _refresh(self):
+        started = time.time()
+        symbols = self.universe()
+        snapshot, sources = self.fetch_snapshot(symbols)
+        self.panel.add(snapshot, started)
+        self.last_refresh = {
+            'symbols': len(symbols),
+            'with_oi': int(snapshot['open_interest'].notna().sum()),
+            'sources': sources,
+            'elapsed': time.time() - started
+        }
+        return self.last_refresh
+    
+    def refresh(self):
+        """
+        Toma una instantánea del universo y la añade al panel (bloqueante)
+        
+        Los refrescos simultáneos comparten una sola descarga.
+        
+        Returns:
+            Dict con símbolos, símbolos con OI, símbolos por origen y segundos
+        """
+        return self._flights.do('refresh', self._refresh)
+    
+    def top(self, top_n=10, hours=24, min_value=0, max_age=None):
+        """
+        Mayores aumentos (builds) y descensos (unwinds) de OI
+        
+        Args:
+            top_n: Símbolos por lado
+            hours: Ventana del cambio
+            min_value: Valor mínimo del OI en USD para entrar en el ranking
+            max_age: Refrescar antes si la última instantánea tiene más de
+                     estos segundos (None = usar el panel tal cual)
+        
+        Returns:
+            Dict con 'builds' y 'unwinds' (listas de dicts por símbolo),
+            'hours' (ventana real), 'snapshots', 'symbols' y 'refresh'
+        """
+        last_update = self.panel.last_update
+        if last_update is None or (max_age is not None and time.time() - last_update > max_age):
+            self.refresh()
+        
+        changes, window = self.panel.changes(hours)
+        ranked = changes[changes['open_interest_value'].fillna(0) >= min_value]
+        
+        def entries(frame):
+            return [
+                {
+                    'symbol': symbol,
+                    'open_interest_value': float(row.open_interest_value),
+                    'price': float(row.price),
+                    'oi_change': float(row.oi_change),
+                    'price_change': float(row.price_change),
+                    'divergence': Divergence(int(row.divergence))
+                }
+                for symbol, row in frame.iterrows()
+            ]
+        
+        return {
+            'builds': entries(ranked[ranked['oi_change'] > 0].nlargest(top_n, 'oi_change')),
+            'unwinds': entries(ranked[ranked['oi_change'] < 0].nsmallest(top_n, 'oi_change')),
+            'hours': window,
+            'snapshots': len(self.panel),
+            'symbols': len(changes),
+            'refresh': self.last_refresh
+        }
@@ -0,0 +1,233 @@
+"""
+Almacén en memoria del histórico horario de Open Interest
+Solo se descargan las horas nuevas; el cambio 24h y la pendiente 12h se guardan ya calculados
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from compact_candles import RollingArray
+
+# Temporalidad del histórico de OI
+OI_TIMEFRAME = '1h'
+HOUR_MS = 60 * 60 * 1000
+
+# Horas que se conservan por símbolo (las que pedía analyze_open_interest)
+OI_HISTORY_HOURS = 100
+
+# Horas mínimas para el análisis, ventana del cambio y de la pendiente
+MIN_OI_HOURS = 20
+CHANGE_HOURS = 24
+SLOPE_HOURS = 12
+
+# Segundos entre comprobaciones si el exchange aún no ha publicado la hora nueva
+RETRY_INTERVAL = 300
+
+# Cambio (%) de precio y de OI a partir del cual hay divergencia o confirmación
+DIVERGENCE_THRESHOLD = 2
+
+def _slope_weights(n):
+    # Mínimos cuadrados con x = 0..n-1: pendiente = pesos · y
+    x = np.arange(n, dtype=np.float64) - (n - 1) / 2
+    return x / np.dot(x, x)
+
+# Pesos de la pendiente para cada longitud de ventana (1 punto = pendiente 0)
+SLOPE_WEIGHTS = {n: _slope_weights(n) if n > 1 else np.zeros(1) for n in range(1, SLOPE_HOURS + 1)}
+
+@dataclass(frozen=True)
+class OpenInterestStats:
+    """Valores de OI que usa el análisis (calculados una vez por hora nueva)"""
+    current: float
+    change_24h: float
+    slope: float
+    timestamp: int = None
+
+def oi_statistics(values, timestamp=None):
+    """
+    OI actual, cambio 24h (%) y pendiente de las últimas 12 horas
+    
+    Mismas reglas que el análisis por DataFrame: el cambio se mide contra el
+    valor de hace 24 puntos (o el primero) y la pendiente es la recta de
+    mínimos cuadrados de los últimos 12.
+    
+    Args:
+        values: Array con el OI horario (más antiguo primero)
+        timestamp: Timestamp en ms del último valor
+    
+    Returns:
+        OpenInterestStats o None si hay menos de MIN_OI_HOURS valores
+    """
+    if len(values) < MIN_OI_HOURS:
+        return None
+    current = values[-1]
+    previous = values[-CHANGE_HOURS] if len(values) >= CHANGE_HOURS else values[0]
+    change = (current - previous) / previous * 100 if previous > 0 else 0
+    recent = values[-SLOPE_HOURS:]
+    slope = np.dot(SLOPE_WEIGHTS[len(recent)], recent)
+    return OpenInterestStats(float(current), float(change), float(slope), timestamp)
+
+def classify_divergence(price_change, oi_change):
+    """
+    Códigos de Divergence para uno o muchos símbolos a la vez
+    
+    Args:
+        price_change: Cambio de precio (%) (escalar o array)
+        oi_change: Cambio de OI (%) con la misma forma
+    
+    Returns:
+        Array int8 con los valores de Divergence (NaN = NONE)
+    """
+    price_change = np.asarray(price_change, dtype=np.float64)
+    oi_change = np.asarray(oi_change, dtype=np.float64)
+    price_up = price_change > DIVERGENCE_THRESHOLD
+    price_down = price_change < -DIVERGENCE_THRESHOLD
+    oi_up = oi_change > DIVERGENCE_THRESHOLD
+    oi_down = oi_change < -DIVERGENCE_THRESHOLD
+    return np.select(
+        [price_up & oi_down, price_down & oi_down, price_down & oi_up, price_up & oi_up],
+        [1, 2, 3, 4],  # BEARISH, BEARISH_CONFIRMATION, BULLISH, BULLISH_CONFIRMATION
+        default=0
+    ).astype(np.int8)
+
+def oi_values(oi_history):
+    """
+    Extrae timestamps y cantidades de la respuesta de fetch_open_interest_history
+    
+    Returns:
+        Tuple (timestamps int64, valores float64) ordenados por tiempo
+    """
+    rows = [
+        (item['timestamp'], item.get('openInterestAmount') or item.get('openInterest') or 0)
+        for item in oi_history or [] if item.get('timestamp') is not None
+    ]
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    rows.sort(key=lambda row: row[0])
+    timestamps = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    return timestamps, values
+
+class OpenInterestSeries:
+    """
+    Últimas horas de OI de un símbolo con sus estadísticas calculadas
+    
+    update() fusiona las horas descargadas como CandleBuffer: desde la
+    primera hora recibida se sustituye lo guardado y el resto se añade al
+    final. Las estadísticas se recalculan solo entonces.
+    """
+    
+    def __init__(self, capacity=OI_HISTORY_HOURS):
+        self.capacity = capacity
+        self._timestamps = RollingArray(capacity, dtype=np.int64)
+        self._values = RollingArray(capacity, dtype=np.float64)
+        self._lock = threading.Lock()
+        self.checked_at = 0.0
+        self.stats = None
+    
+    def __len__(self):
+        return len(self._timestamps)
+    
+    @property
+    def last_timestamp(self):
+        """Timestamp en ms de la última hora (None si está vacía)"""
+        with self._lock:
+            timestamps = self._timestamps.view()
+            return int(timestamps[-1]) if len(timestamps) else None
+    
+    def pending(self, now=None):
+        """
+        Horas que faltan por descargar
+        
+        Args:
+            now: Timestamp Unix en segundos (default: ahora)
+        
+        Returns:
+            None si la serie está al día, o Tuple (since, limit) para
+            fetch_open_interest_history (since None = histórico completo)
+        """
+        now = time.time() if now is None else now
+        last = self.last_timestamp
+        recent = now - self.checked_at < RETRY_INTERVAL
+        if last is None:
+            return None if recent else (None, self.capacity)
+        
+        # La hora siguiente aún no existe, o ya se preguntó hace poco
+        now_ms = int(now * 1000)
+        if now_ms < last + HOUR_MS or recent:
+            return None
+        
+        missing = (now_ms - last) // HOUR_MS
+        if missing >= self.capacity - CHANGE_HOURS:
+            # Hueco demasiado grande: se vuelve a pedir la serie entera
+            return None, self.capacity
+        return last + 1, missing + 1
+    
+    def update(self, oi_history, replace=False, now=None):
+        """
+        Fusiona el histórico descargado y recalcula las estadísticas
+        
+        Args:
+            oi_history: Lista de estructuras de Open Interest de ccxt
+            replace: Descartar antes las horas guardadas
+            now: Timestamp Unix en segundos de la comprobación
+        
+        Returns:
+            OpenInterestStats o None
+        """
+        timestamps, values = oi_values(oi_history)
+        with self._lock:
+            self.checked_at = time.time() if now is None else now
+            if replace:
+                self._timestamps.clear()
+                self._values.clear()
+            if len(timestamps):
+                keep = int(np.searchsorted(self._timestamps.view(), timestamps[0]))
+                self._timestamps.truncate(keep)
+                self._values.truncate(keep)
+                self._timestamps.extend(timestamps)
+                self._values.extend(values)
+                stored = self._timestamps.view()
+                self.stats = oi_statistics(self._values.view(), int(stored[-1]))
+            return self.stats
+
+class OpenInterestStore:
+    """
+    Series horarias de OI por símbolo
+    
+    El OI horario cambia una vez por hora: mientras la serie de un símbolo
+    esté al día, analyze_open_interest usa las estadísticas guardadas sin
+    llamar al exchange, y cuando llega una hora nueva solo se piden las
+    horas que faltan. Es seguro usarlo desde varios threads.
+    """
+    
+    def __init__(self, capacity=OI_HISTORY_HOURS):
+        """
+        Args:
+            capacity: Horas que se conservan por símbolo
+        """
+        self.capacity = capacity
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._series)
+    
+    def series(self, symbol):
+        """OpenInterestSeries del símbolo (se crea vacía la primera vez)"""
+        with self._lock:
+            series = self._series.get(symbol)
+            if series is None:
+                series = self._series[symbol] = OpenInterestSeries(self.capacity)
+            return series
+    
+    def stats(self, symbol):
+        """Estadísticas guardadas del símbolo sin comprobar si están al día"""
+        series = self._series.get(symbol)
+        return series.stats if series is not None else None
+    
+    def clear(self):
+        with self._lock:
+            self._series.clear()
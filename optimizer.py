@@ -0,0 +1,283 @@
+"""
+Optimización de los umbrales de las reglas
+Barrido en rejilla o aleatorio de IndicatorParams, RiskRules y BacktestConfig sobre un histórico
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import fields
+
+import numpy as np
+import pandas as pd
+
+from backtest import (
+    HISTORY_DIR, BacktestConfig, HistoryIndicators, IndicatorParams, RiskRules,
+    load_history, risk_scores, simulate_trades, summarize_trades
+)
+
+# Rejilla por defecto (incluye los valores actuales del detector). risk_caution
+# no está: con max_action=1 también se opera con cautela y el corte no cambia nada
+DEFAULT_GRID = {
+    'ema_fast': [5, 9, 13],
+    'ema_mid': [21, 34],
+    'ema_slow': [50, 89],
+    'adx_weak': [15, 20, 25],
+}
+
+# Parámetros de cada dataclass (el nombre decide a cuál pertenece)
+INDICATOR_FIELDS = {f.name: f for f in fields(IndicatorParams)}
+RULE_FIELDS = {f.name: f for f in fields(RiskRules)}
+CONFIG_FIELDS = {f.name: f for f in fields(BacktestConfig)}
+PARAMETERS = {**INDICATOR_FIELDS, **RULE_FIELDS, **CONFIG_FIELDS}
+
+# Estadísticas de summarize_trades que entran en la tabla
+RESULT_STATS = [
+    'trades', 'win_rate', 'avg_r', 'total_r', 'profit_factor',
+    'max_drawdown_r', 'max_drawdown_pct', 'return_pct'
+]
+
+# Métricas en las que menos es mejor
+ASCENDING_METRICS = {'max_drawdown_r', 'max_drawdown_pct'}
+
+def parse_grid_item(item):
+    """
+    'ema_fast=5,9,13' -> ('ema_fast', [5, 9, 13]) con el tipo declarado del parámetro
+    
+    Raises:
+        ValueError: Si el parámetro no existe
+    """
+    name, _, values = item.partition('=')
+    name = name.strip()
+    if name not in PARAMETERS:
+        raise ValueError(f"Parámetro desconocido: {name} (válidos: {', '.join(PARAMETERS)})")
+    # El tipo anotado: rsi_extreme_high es float aunque su default sea 85
+    cast = PARAMETERS[name].type
+    return name, [cast(value) for value in values.split(',') if value.strip()]
+
+def is_valid(combo):
+    """Descarta combinaciones incoherentes (umbrales cruzados, EMAs desordenadas)"""
+    def get(name):
+        return combo.get(name, PARAMETERS[name].default)
+    
+    return (
+        get('ema_fast') < get('ema_mid') < get('ema_slow')
+        and get('rsi_extreme_low') < get('rsi_extreme_high')
+        and get('avg_rsi_low') < get('avg_rsi_high')
+        and get('atr_elevated') < get('atr_high')
+        and get('adx_weak') < get('adx_exhausted')
+        and get('risk_caution') < get('risk_extreme') < get('risk_no_trade')
+    )
+
+def combinations(grid, samples=None, seed=0):
+    """
+    Combinaciones a evaluar
+    
+    Args:
+        grid: Dict {parámetro: lista de valores}
+        samples: Número de combinaciones aleatorias (None = rejilla completa)
+        seed: Semilla de la búsqueda aleatoria
+    
+    Returns:
+        Lista de dicts {parámetro: valor} ordenada por IndicatorParams, para
+        que las combinaciones que comparten periodos caigan en el mismo lote
+    """
+    names = list(grid)
+    total = int(np.prod([len(values) for values in grid.values()])) if grid else 1
+    if samples is None or samples >= total:
+        combos = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    else:
+        # Sin generar la rejilla completa: índices aleatorios distintos
+        rng = random.Random(seed)
+        combos = []
+        for flat in rng.sample(range(total), samples):
+            combo = {}
+            for name in reversed(names):
+                flat, position = divmod(flat, len(grid[name]))
+                combo[name] = grid[name][position]
+            combos.append({name: combo[name] for name in names})
+    
+    combos = [combo for combo in combos if is_valid(combo)]
+    combos.sort(key=lambda combo: repr(split_combo(combo)[0]))
+    return combos
+
+def split_combo(combo):
+    """
+    Returns:
+        Tuple (IndicatorParams, RiskRules, BacktestConfig) con los valores de combo
+    """
+    return (
+        IndicatorParams(**{k: v for k, v in combo.items() if k in INDICATOR_FIELDS}),
+        RiskRules(**{k: v for k, v in combo.items() if k in RULE_FIELDS}),
+        BacktestConfig(**{k: v for k, v in combo.items() if k in CONFIG_FIELDS})
+    )
+
+# Histórico de cada proceso del pool (con su caché de indicadores por periodo)
+_history = None
+
+def _init_worker(timestamps, values, timeframe, timeframes):
+    global _history
+    index = pd.DatetimeIndex(pd.to_datetime(timestamps, unit='ms'), name='timestamp')
+    df = pd.DataFrame(values, index=index, columns=['open', 'high', 'low', 'close', 'volume'])
+    _history = HistoryIndicators(df, timeframe, timeframes)
+
+def evaluate_batch(history, combos):
+    """
+    Backtest de varias combinaciones sobre el mismo histórico
+    
+    Las EMAs, el RSI y ATR/ADX de cada periodo se calculan una sola vez
+    (caché de HistoryIndicators) y las señales y riesgos se reutilizan
+    entre combinaciones con los mismos IndicatorParams y RiskRules.
+    
+    Args:
+        history: HistoryIndicators
+        combos: Lista de dicts {parámetro: valor}
+    
+    Returns:
+        Lista de dicts con los parámetros, señales y estadísticas de cada combinación
+    """
+    results = []
+    signals = {}
+    scores = {}
+    for combo in combos:
+        params, rules, config = split_combo(combo)
+        if params not in signals:
+            signals = {params: history.signals(params)}
+            scores = {}
+        if rules not in scores:
+            scores[rules] = risk_scores(signals[params], rules)
+        trades, counts = simulate_trades(signals[params], scores[rules], config)
+        stats = summarize_trades(trades, config.risk_per_trade)
+        results.append({**combo, **counts, **{name: stats.get(name) for name in RESULT_STATS}})
+    return results
+
+def _evaluate_in_worker(combos):
+    return evaluate_batch(_history, combos)
+
+def _batches(combos, size):
+    """Lotes de hasta `size` combinaciones sin mezclar IndicatorParams distintos"""
+    for _, group in itertools.groupby(combos, key=lambda combo: split_combo(combo)[0]):
+        group = list(group)
+        for start in range(0, len(group), size):
+            yield group[start:start + size]
+
+def run_sweep(df, timeframe, grid=None, samples=None, workers=None, timeframes=None, seed=0):
+    """
+    Evalúa todas las combinaciones en un pool de procesos
+    
+    Cada proceso recibe el histórico una vez al arrancar y conserva su
+    caché de indicadores; los lotes agrupan combinaciones con los mismos
+    periodos para aprovecharla.
+    
+    Args:
+        df: DataFrame OHLCV indexado por tiempo
+        timeframe: Timeframe de las velas de df
+        grid: Dict {parámetro: lista de valores} (default: DEFAULT_GRID)
+        samples: Combinaciones aleatorias (None = rejilla completa)
+        workers: Procesos (default: número de CPUs; 1 = en este proceso)
+        timeframes: Timeframes de contexto
+        seed: Semilla de la búsqueda aleatoria
+    
+    Returns:
+        DataFrame con una fila por combinación (sin ordenar; ver rank_results)
+    """
+    combos = combinations(grid or DEFAULT_GRID, samples, seed)
+    workers = workers or os.cpu_count() or 1
+    started = time.time()
+    print(f"⚙️  {len(combos)} combinaciones sobre {len(df):,} velas ({workers} procesos)")
+    
+    if workers == 1:
+        history = HistoryIndicators(df, timeframe, timeframes)
+        results = evaluate_batch(history, combos)
+    else:
+        size = max(1, min(32, len(combos) // (workers * 4)))
+        timestamps = df.index.values.astype('datetime64[ms]').astype(np.int64)
+        values = df[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=np.float64)
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker,
+                                 initargs=(timestamps, values, timeframe, timeframes)) as pool:
+            futures = [pool.submit(_evaluate_in_worker, batch) for batch in _batches(combos, size)]
+            step = max(1, len(futures) // 10)
+            for done, future in enumerate(as_completed(futures), 1):
+                results.extend(future.result())
+                if done % step == 0 or done == len(futures):
+                    print(f"   {len(results)}/{len(combos)} combinaciones ({time.time() - started:.1f}s)")
+    
+    print(f"✅ Barrido completado en {time.time() - started:.1f}s")
+    return pd.DataFrame(results)
+
+def rank_results(results, metric='avg_r', min_trades=30):
+    """
+    Ordena las combinaciones por una métrica
+    
+    Args:
+        results: DataFrame de run_sweep
+        metric: Estadística por la que ordenar (RESULT_STATS)
+        min_trades: Operaciones mínimas para entrar en el ranking
+    
+    Returns:
+        DataFrame ordenado con una columna 'rank' (1 = mejor)
+    """
+    ranked = results[results['trades'].fillna(0) >= min_trades]
+    ranked = ranked.sort_values(metric, ascending=metric in ASCENDING_METRICS, na_position='last')
+    ranked = ranked.reset_index(drop=True)
+    ranked.insert(0, 'rank', np.arange(1, len(ranked) + 1))
+    return ranked
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Barrido de parámetros de las reglas de tendencia y riesgo")
+    parser.add_argument('symbol', help="Símbolo (BTC/USDT, BTCUSDT...)")
+    parser.add_argument('--exchange', default='bybit', help="Exchange de ccxt (default: bybit)")
+    parser.add_argument('--timeframe', default='5m', help="Timeframe de ejecución (default: %(default)s)")
+    parser.add_argument('--days', type=float, default=365, help="Días de histórico (default: %(default)s)")
+    parser.add_argument('--grid', action='append', metavar='PARAM=V1,V2',
+                        help="Valores de un parámetro (repetible; default: rejilla DEFAULT_GRID)")
+    parser.add_argument('--random', type=int, metavar='N', help="Evaluar N combinaciones aleatorias de la rejilla")
+    parser.add_argument('--seed', type=int, default=0, help="Semilla de --random")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos (default: número de CPUs)")
+    parser.add_argument('--metric', default='avg_r', choices=RESULT_STATS, help="Métrica del ranking")
+    parser.add_argument('--min-trades', type=int, default=30, help="Operaciones mínimas para el ranking")
+    parser.add_argument('--top', type=int, default=20, help="Filas del ranking a mostrar")
+    parser.add_argument('--data-dir', default=HISTORY_DIR, help="Directorio del histórico descargado")
+    parser.add_argument('--output', help="Guardar la tabla completa en este CSV")
+    return parser.parse_args()
+
+def main():
+    from crypto_trend_detector import CryptoTrendDetector
+    
+    args = parse_args()
+    try:
+        grid = dict(parse_grid_item(item) for item in args.grid) if args.grid else DEFAULT_GRID
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    
+    detector = CryptoTrendDetector(exchange_name=args.exchange, cache_size=0)
+    symbol = detector.normalize_symbol(args.symbol)
+    if symbol is None:
+        print(f"❌ No se encontró el símbolo '{args.symbol}'")
+        return 1
+    df = load_history(detector, symbol, args.timeframe, args.days, args.data_dir)
+    
+    results = run_sweep(df, args.timeframe, grid, args.random, args.workers, seed=args.seed)
+    if results.empty:
+        print("⚠️  Ninguna combinación válida")
+        return 1
+    ranked = rank_results(results, args.metric, args.min_trades)
+    
+    print(f"\n🏆 TOP {args.top} {symbol} ({args.timeframe}) por {args.metric} (mín. {args.min_trades} operaciones)")
+    columns = ['rank', *grid, *RESULT_STATS]
+    print(ranked[columns].head(args.top).to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    
+    if args.output:
+        ranked.to_csv(args.output, index=False)
+        print(f"\n💾 Tabla guardada en {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,322 @@
+"""
+Indicadores vectorizados para muchos símbolos a la vez
+Trabaja sobre un panel NumPy de forma (símbolos, velas, OHLCV)
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from analysis_types import AdxStrength, Direction, RsiSignal, Trend, TrendResult
+
+# Posición de cada campo en el último eje del panel
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)
+
+PANEL_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# Mismas salidas que calculate_indicators
+PANEL_OUTPUTS = [
+    'ema_9', 'ema_21', 'ema_50', 'ema_200',
+    'rsi',
+    'macd', 'macd_signal', 'macd_histogram',
+    'atr',
+    'adx', 'plus_di', 'minus_di'
+]
+
+# Tamaño de bloque para la EMA por bloques
+EMA_BLOCK = 128
+
+def build_ohlcv_panel(frames, min_candles=50):
+    """
+    Construye un panel (símbolos, velas, OHLCV) a partir de DataFrames
+    
+    Todos los símbolos se recortan a la longitud común más corta; los que
+    tienen menos de min_candles velas se descartan.
+    
+    Args:
+        frames: Dict {símbolo: DataFrame OHLCV}
+        min_candles: Mínimo de velas para incluir un símbolo
+    
+    Returns:
+        Tuple (symbols, panel) con la lista de símbolos y el array float64
+    """
+    valid = {s: df for s, df in frames.items() if df is not None and len(df) >= min_candles}
+    if not valid:
+        return [], np.empty((0, 0, len(PANEL_COLUMNS)))
+    
+    n_candles = min(len(df) for df in valid.values())
+    symbols = list(valid)
+    panel = np.empty((len(symbols), n_candles, len(PANEL_COLUMNS)))
+    for i, symbol in enumerate(symbols):
+        panel[i] = valid[symbol][PANEL_COLUMNS].values[-n_candles:]
+    return symbols, panel
+
+def allocate_outputs(n_symbols, n_candles, dtype=np.float64):
+    """
+    Reserva los arrays de salida para compute_panel_indicators
+    
+    Args:
+        n_symbols: Número de símbolos
+        n_candles: Número de velas
+        dtype: Tipo de los arrays de salida
+    
+    Returns:
+        Dict {indicador: array (símbolos, velas)}
+    """
+    return {name: np.empty((n_symbols, n_candles), dtype=dtype) for name in PANEL_OUTPUTS}
+
+def ema_into(x, span, out):
+    """
+    EMA (equivalente a ewm(span, adjust=False)) a lo largo del eje de velas
+    
+    Se procesa por bloques: dentro de cada bloque la recursión se expresa
+    como un producto por una matriz triangular de pesos, así que el coste
+    en Python es de N/EMA_BLOCK iteraciones para todos los símbolos.
+    
+    Args:
+        x: Array (símbolos, velas) sin nan
+        span: Periodo de la EMA
+        out: Array (símbolos, velas) donde escribir el resultado
+    
+    Returns:
+        out
+    """
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    n = x.shape[1]
+    if n == 0:
+        return out
+    
+    block = min(EMA_BLOCK, n)
+    exponents = np.arange(block)
+    # weights[j, k] = alpha * decay^(j-k) para k <= j
+    lags = exponents[:, None] - exponents[None, :]
+    weights = np.where(lags >= 0, alpha * decay ** np.maximum(lags, 0), 0.0)
+    carry_weights = decay ** (exponents + 1)
+    
+    # Con adjust=False el primer valor es el propio dato: equivale a un
+    # valor previo igual a x[:, 0]
+    carry = x[:, 0].astype(np.float64)
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        size = stop - start
+        values = x[:, start:stop] @ weights[:size, :size].T + carry[:, None] * carry_weights[:size]
+        out[:, start:stop] = values
+        carry = values[:, -1]
+    return out
+
+def rolling_sum(x, window, out):
+    """
+    Suma móvil (equivalente a rolling(window).sum()) a lo largo del eje de velas
+    
+    Las primeras window-1 posiciones y las ventanas con nan dan nan.
+    
+    Args:
+        x: Array (símbolos, velas)
+        window: Tamaño de la ventana
+        out: Array (símbolos, velas) donde escribir el resultado
+    
+    Returns:
+        out
+    """
+    out[:, :window - 1] = np.nan
+    if x.shape[1] >= window:
+        out[:, window - 1:] = sliding_window_view(x, window, axis=1).sum(axis=-1)
+    return out
+
+def rsi_into(close, period, out):
+    """
+    RSI con medias simples (igual que calculate_indicators)
+    
+    Args:
+        close: Array (símbolos, velas) de cierres
+        period: Periodo del RSI
+        out: Array (símbolos, velas) donde escribir el resultado
+    
+    Returns:
+        out
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = np.full(close.shape, np.nan)
+        delta[:, 1:] = np.diff(close, axis=1)
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+        gain_sum = rolling_sum(gain, period, np.empty_like(gain))
+        loss_sum = rolling_sum(loss, period, np.empty_like(loss))
+        rs = gain_sum / loss_sum
+        np.divide(100.0, 1.0 + rs, out=out)
+        np.subtract(100.0, out, out=out)
+    return out
+
+def trend_strength_into(high, low, close, period, out):
+    """
+    ATR, +DI, -DI y ADX (igual que calculate_indicators)
+    
+    Args:
+        high, low, close: Arrays (símbolos, velas)
+        period: Periodo de ATR y ADX
+        out: Dict con los arrays 'atr', 'plus_di', 'minus_di' y 'adx'
+    
+    Returns:
+        out
+    """
+    n_symbols, n_candles = close.shape
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # True range: la primera vela solo tiene high - low
+        prev_close = np.full((n_symbols, n_candles), np.nan)
+        prev_close[:, 1:] = close[:, :-1]
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        tr_sum = rolling_sum(true_range, period, np.empty_like(true_range))
+        np.divide(tr_sum, period, out=out['atr'])
+        
+        # ADX y DI
+        plus_dm = np.full((n_symbols, n_candles), np.nan)
+        minus_dm = np.full((n_symbols, n_candles), np.nan)
+        plus_dm[:, 1:] = np.maximum(np.diff(high, axis=1), 0.0)
+        minus_dm[:, 1:] = np.maximum(-np.diff(low, axis=1), 0.0)
+        np.multiply(100.0, rolling_sum(plus_dm, period, plus_dm.copy()) / tr_sum, out=out['plus_di'])
+        np.multiply(100.0, rolling_sum(minus_dm, period, minus_dm.copy()) / tr_sum, out=out['minus_di'])
+        dx = 100.0 * np.abs(out['plus_di'] - out['minus_di']) / (out['plus_di'] + out['minus_di'])
+        rolling_sum(dx, period, out['adx'])
+        np.divide(out['adx'], period, out=out['adx'])
+    return out
+
+def compute_panel_indicators(panel, out=None, period=14):
+    """
+    Calcula EMAs, RSI, MACD, ATR y ADX/DI para todos los símbolos a la vez
+    
+    Args:
+        panel: Array (símbolos, velas, OHLCV) sin nan
+        out: Dict de arrays de salida de allocate_outputs (se reutiliza)
+        period: Periodo de RSI, ATR y ADX
+    
+    Returns:
+        Dict {indicador: array (símbolos, velas)}
+    """
+    n_symbols, n_candles = panel.shape[:2]
+    if out is None:
+        out = allocate_outputs(n_symbols, n_candles)
+    
+    high = panel[:, :, HIGH]
+    low = panel[:, :, LOW]
+    close = panel[:, :, CLOSE]
+    
+    # EMAs para tendencia
+    for span in (9, 21, 50, 200):
+        ema_into(close, span, out[f'ema_{span}'])
+    
+    # MACD
+    scratch = np.empty((n_symbols, n_candles))
+    ema_into(close, 12, out['macd'])
+    ema_into(close, 26, scratch)
+    np.subtract(out['macd'], scratch, out=out['macd'])
+    ema_into(out['macd'], 9, out['macd_signal'])
+    np.subtract(out['macd'], out['macd_signal'], out=out['macd_histogram'])
+    
+    rsi_into(close, period, out['rsi'])
+    trend_strength_into(high, low, close, period, out)
+    return out
+
+def classify_trend(close, indicators):
+    """
+    Reglas de identify_trend sobre arrays de cualquier forma
+    
+    Args:
+        close: Array de cierres
+        indicators: Dict {indicador: array} con la misma forma que close
+    
+    Returns:
+        Dict de arrays con códigos numéricos: trend (2..-2), ema_score (0..5),
+        macd (1/0/-1), di_direction (1/0/-1), adx_strength (2/1/0) y
+        rsi_signal (2/1/-1/-2)
+    """
+    ema_score = (
+        (close > indicators['ema_9']).astype(np.int8)
+        + (close > indicators['ema_21'])
+        + (close > indicators['ema_50'])
+        + (indicators['ema_9'] > indicators['ema_21'])
+        + (indicators['ema_21'] > indicators['ema_50'])
+    )
+    
+    macd = np.sign(indicators['macd'] - indicators['macd_signal'])
+    macd = np.where(np.isnan(macd), 0, macd).astype(np.int8)
+    
+    adx = indicators['adx']
+    adx_strength = np.select([adx > 25, adx > 20], [2, 1], 0).astype(np.int8)
+    
+    plus_di = indicators['plus_di']
+    minus_di = indicators['minus_di']
+    di_direction = np.select([plus_di > minus_di, minus_di > plus_di], [1, -1], 0).astype(np.int8)
+    
+    rsi = indicators['rsi']
+    rsi_signal = np.select([rsi > 70, rsi < 30, rsi > 50], [2, -2, 1], -1).astype(np.int8)
+    
+    bullish = di_direction == 1
+    bearish = di_direction == -1
+    trend = np.select(
+        [
+            (ema_score >= 4) & bullish,
+            (ema_score >= 3) & bullish,
+            (ema_score <= 1) & bearish,
+            (ema_score <= 2) & bearish,
+        ],
+        [2, 1, -2, -1],
+        0
+    ).astype(np.int8)
+    
+    return {
+        'trend': trend,
+        'ema_score': ema_score,
+        'macd': macd,
+        'di_direction': di_direction,
+        'adx_strength': adx_strength,
+        'rsi_signal': rsi_signal,
+    }
+
+def identify_trend_panel(panel, indicators):
+    """
+    Aplica las reglas de identify_trend a la última vela de cada símbolo
+    
+    Args:
+        panel: Array (símbolos, velas, OHLCV)
+        indicators: Dict de compute_panel_indicators
+    
+    Returns:
+        Dict de arrays (uno por símbolo) con los códigos de classify_trend
+        y los valores crudos price, rsi, adx, atr, volume
+    """
+    close = panel[:, -1, CLOSE]
+    last = {name: values[:, -1] for name, values in indicators.items()}
+    
+    return {
+        **classify_trend(close, last),
+        'price': close,
+        'rsi': last['rsi'],
+        'adx': last['adx'],
+        'atr': last['atr'],
+        'volume': panel[:, -1, VOLUME],
+    }
+
+def trend_info_at(trends, i):
+    """
+    Convierte la fila i de identify_trend_panel en el resultado de identify_trend
+    
+    Args:
+        trends: Dict de arrays de identify_trend_panel
+        i: Índice del símbolo
+    
+    Returns:
+        TrendResult equivalente al de CryptoTrendDetector.identify_trend
+    """
+    return TrendResult(
+        trend=Trend(int(trends['trend'][i])),
+        price=float(trends['price'][i]),
+        ema_score=int(trends['ema_score'][i]),
+        macd=Direction(int(trends['macd'][i])),
+        rsi=float(trends['rsi'][i]),
+        rsi_signal=RsiSignal(int(trends['rsi_signal'][i])),
+        adx=float(trends['adx'][i]),
+        adx_strength=AdxStrength(int(trends['adx_strength'][i])),
+        di_direction=Direction(int(trends['di_direction'][i])),
+        atr=float(trends['atr'][i]),
+        volume=float(trends['volume'][i])
+    )
@@ -0,0 +1,215 @@
+"""
+Planificador de peticiones al exchange
+Token bucket con peso por endpoint, prioridades y backoff adaptativo ante 429
+"""
+
+import contextlib
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+
+from metrics import RATE_LIMIT_WAIT_SECONDS, RATE_LIMIT_WAITS
+
+# Prioridades (menor = antes): comandos interactivos, uso normal y tareas de fondo
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+
+# Peso de cada método en tokens (1 token = 1 petición simple)
+DEFAULT_WEIGHTS = {
+    'fetch_ohlcv': 1,
+    'fetch_open_interest': 1,
+    'fetch_open_interest_history': 2,
+    'load_markets': 5,  # Varias peticiones internas (una por categoría de mercado)
+}
+
+# Prioridad de las peticiones del contexto actual (thread o tarea asyncio)
+_priority = contextvars.ContextVar('rate_limit_priority', default=NORMAL)
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """
+    Fija la prioridad de las peticiones hechas dentro del bloque
+    
+    Los threads nuevos no heredan la prioridad: hay que pasarles el
+    contexto con contextvars.copy_context().run.
+    
+    Args:
+        priority: INTERACTIVE, NORMAL o BACKGROUND
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority():
+    return _priority.get()
+
+def run_with_priority(priority, func, *args):
+    """Ejecuta func(*args) con la prioridad indicada (útil para pasar trabajo a otro thread)"""
+    with request_priority(priority):
+        return func(*args)
+
+def is_rate_limit_error(error):
+    """
+    Indica si una excepción de ccxt es un rechazo por límite (429, 418, 403 de WAF)
+    
+    ccxt se importa aquí y no al cargar el módulo: el bot importa las
+    prioridades al arrancar y ccxt solo se carga con el primer detector.
+    """
+    import ccxt
+    return isinstance(error, (ccxt.RateLimitExceeded, ccxt.DDoSProtection))
+
+class RateLimiter:
+    """
+    Token bucket compartido por todos los threads que usan un exchange
+    
+    Cada petición consume tokens según el peso de su método y los tokens
+    se reponen a `rate` por segundo hasta `capacity`. Las peticiones que
+    esperan se atienden por prioridad (y en orden de llegada dentro de
+    cada prioridad): una petición interactiva adelanta a las de un scan
+    en cuanto queda un hueco.
+    
+    Ante un RateLimitExceeded/DDoSProtection el ritmo se reduce a la mitad
+    y se bloquean las peticiones durante un enfriamiento que se duplica con
+    cada rechazo seguido; cada petición correcta recupera el ritmo poco a
+    poco hasta el original (AIMD).
+    """
+    
+    # Fracción del ritmo original que recupera cada petición correcta
+    RECOVERY_STEP = 0.02
+    
+    # Enfriamiento tras un rechazo (segundos): inicial y máximo
+    COOLDOWN = 1.0
+    MAX_COOLDOWN = 60.0
+    
+    def __init__(self, rate, capacity=None, weights=None, min_rate=None):
+        """
+        Args:
+            rate: Tokens por segundo
+            capacity: Ráfaga máxima en tokens (default: un segundo de rate)
+            weights: Pesos por método que sustituyen a DEFAULT_WEIGHTS
+            min_rate: Ritmo mínimo al que puede bajar el backoff (default: rate / 16)
+        """
+        self.base_rate = float(rate)
+        self.rate = self.base_rate
+        self.capacity = float(capacity or rate)
+        self.min_rate = float(min_rate or rate / 16)
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.tokens = self.capacity
+        self.rate_limited = 0
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._cooldown = self.COOLDOWN
+        self._waiting = []  # heap de (prioridad, orden de llegada)
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+    
+    @classmethod
+    def for_exchange(cls, exchange, weights=None):
+        """
+        Crea un limitador con el ritmo que declara el exchange en ccxt
+        
+        Args:
+            exchange: Instancia de ccxt (rateLimit = ms entre peticiones)
+            weights: Pesos por método
+        
+        Returns:
+            RateLimiter o None si el exchange no declara rateLimit
+        """
+        interval = getattr(exchange, 'rateLimit', None)
+        if not interval:
+            return None
+        return cls(1000.0 / interval, weights=weights)
+    
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if now > self._blocked_until:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+    
+    def acquire(self, method, priority=None):
+        """
+        Espera hasta que la petición puede salir y consume sus tokens
+        
+        Args:
+            method: Método del exchange (para el peso)
+            priority: Prioridad (default: la del contexto actual)
+        
+        Returns:
+            Segundos esperados
+        """
+        weight = self.weights.get(method, 1)
+        # Un peso mayor que la ráfaga se cobra entero pero solo espera a tener el bucket lleno
+        needed = min(weight, self.capacity)
+        ticket = (current_priority() if priority is None else priority, next(self._order))
+        start = time.monotonic()
+        
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiting[0] != ticket:
+                        # Hay alguien con más prioridad o que llegó antes
+                        self._cond.wait()
+                        continue
+                    wait = max(self._blocked_until - now, (needed - self.tokens) / self.rate)
+                    if wait <= 0:
+                        self.tokens -= weight
+                        break
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+        
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            RATE_LIMIT_WAITS.inc(source='scheduler')
+            RATE_LIMIT_WAIT_SECONDS.inc(waited, source='scheduler')
+        return waited
+    
+    def on_success(self):
+        """Recupera parte del ritmo tras una petición correcta"""
+        if self.rate >= self.base_rate:
+            return
+        with self._cond:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * self.RECOVERY_STEP)
+            if self.rate >= self.base_rate:
+                self._cooldown = self.COOLDOWN
+    
+    def on_rate_limited(self, retry_after=None):
+        """
+        Reduce el ritmo y bloquea las peticiones tras un rechazo por límite
+        
+        Args:
+            retry_after: Segundos indicados por el exchange (None = enfriamiento propio)
+        """
+        with self._cond:
+            self.rate_limited += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            cooldown = retry_after if retry_after is not None else self._cooldown
+            self._cooldown = min(self._cooldown * 2, self.MAX_COOLDOWN)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + cooldown)
+            self._cond.notify_all()
+    
+    def stats(self):
+        """
+        Returns:
+            Dict con ritmo actual y original, tokens, peticiones en espera y rechazos
+        """
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                'rate': self.rate,
+                'base_rate': self.base_rate,
+                'tokens': self.tokens,
+                'waiting': len(self._waiting),
+                'rate_limited': self.rate_limited
+            }
@@ -0,0 +1,135 @@
+"""
+Coalescencia de peticiones concurrentes (single-flight)
+Las llamadas simultáneas con la misma clave comparten una única ejecución
+"""
+
+import asyncio
+import threading
+
+class _Call:
+    """Ejecución en curso compartida por todos los que esperan la misma clave"""
+    
+    __slots__ = ('event', 'result', 'error')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Single-flight para código síncrono (threads)
+    
+    El primer thread que pide una clave ejecuta la función; los que llegan
+    mientras tanto esperan y reciben el mismo resultado (o la misma
+    excepción). Al terminar la clave se libera y la siguiente llamada
+    vuelve a ejecutar.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.coalesced = 0
+    
+    def do(self, key, func, *args, **kwargs):
+        """
+        Ejecuta func(*args, **kwargs) o se une a una ejecución en curso
+        
+        Args:
+            key: Clave que identifica peticiones equivalentes
+            func: Función a ejecutar
+        
+        Returns:
+            Resultado de la función (compartido entre todos los que esperan)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+        
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+    
+    def stats(self):
+        """
+        Returns:
+            Dict con ejecuciones reales, peticiones coalescidas y claves en curso
+        """
+        with self._lock:
+            return {
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls)
+            }
+
+class AsyncSingleFlight:
+    """
+    Single-flight para corrutinas (asyncio)
+    
+    Las tareas que piden una clave en curso esperan la misma tarea. La
+    ejecución compartida está protegida con asyncio.shield, así que si
+    uno de los que esperan se cancela el resto sigue recibiendo el
+    resultado.
+    """
+    
+    def __init__(self):
+        self._calls = {}
+        self.executions = 0
+        self.coalesced = 0
+    
+    async def do(self, key, coro_func, *args, **kwargs):
+        """
+        Ejecuta await coro_func(*args, **kwargs) o se une a una ejecución en curso
+        
+        Args:
+            key: Clave que identifica peticiones equivalentes
+            coro_func: Función asíncrona a ejecutar
+        
+        Returns:
+            Resultado de la corrutina (compartido entre todos los que esperan)
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_func(*args, **kwargs))
+            self._calls[key] = task
+            self.executions += 1
+            
+            def _release(done, key=key):
+                if self._calls.get(key) is done:
+                    del self._calls[key]
+            task.add_done_callback(_release)
+        else:
+            self.coalesced += 1
+        
+        return await asyncio.shield(task)
+    
+    def stats(self):
+        """
+        Returns:
+            Dict con ejecuciones reales, peticiones coalescidas y claves en curso
+        """
+        return {
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._calls)
+        }
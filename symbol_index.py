@@ -0,0 +1,157 @@
+"""
+Índice de símbolos del exchange
+Resolución O(1) de símbolos y búsqueda por subcadena sin recorrer todos los mercados
+"""
+
+import threading
+
+class SymbolIndex:
+    """
+    Índice construido una vez a partir de exchange.markets
+    
+    Contiene:
+        - Mapa símbolo limpio (sin '/' ni ':') -> símbolo canónico
+        - Mapa activo base -> símbolos de ese activo
+        - Índice de n-gramas (1 a 3 caracteres) para búsquedas por subcadena
+    
+    Los símbolos buscables reciben un id según su orden alfabético, así que
+    las listas de n-gramas ya están ordenadas y la búsqueda puede parar en
+    cuanto tiene suficientes resultados.
+    """
+    
+    MAX_GRAM = 3
+    
+    def __init__(self, markets):
+        """
+        Args:
+            markets: Dict de mercados de ccxt (exchange.markets)
+        """
+        self.markets = markets
+        self.size = len(markets)
+        self.by_clean = {}
+        self.by_base = {}
+        
+        for symbol, market in markets.items():
+            # El primer mercado con el mismo símbolo limpio tiene prioridad
+            self.by_clean.setdefault(self.clean(symbol), symbol)
+            base = market.get('base')
+            if base:
+                self.by_base.setdefault(base.upper(), []).append(symbol)
+        
+        for symbols in self.by_base.values():
+            symbols.sort()
+        
+        # Solo se buscan mercados activos con USD/USDT
+        self.searchable = sorted(
+            s for s, m in markets.items() if m.get('active', True) and 'USD' in s
+        )
+        self.grams = {}
+        for symbol_id, symbol in enumerate(self.searchable):
+            seen = set()
+            for n in range(1, self.MAX_GRAM + 1):
+                for i in range(len(symbol) - n + 1):
+                    gram = symbol[i:i + n]
+                    if gram not in seen:
+                        seen.add(gram)
+                        self.grams.setdefault(gram, []).append(symbol_id)
+    
+    @staticmethod
+    def clean(symbol):
+        """Símbolo sin separadores ('BTC/USDT:USDT' -> 'BTCUSDTUSDT')"""
+        return symbol.replace('/', '').replace(':', '')
+    
+    def is_current(self, markets):
+        """
+        Indica si el índice corresponde al dict de mercados dado
+        
+        ccxt reemplaza el dict de mercados al recargarlos, así que basta
+        comparar identidad y tamaño.
+        """
+        return markets is self.markets and len(markets) == self.size
+    
+    def resolve_clean(self, symbol):
+        """
+        Busca un mercado cuyo símbolo sin separadores coincida
+        
+        Args:
+            symbol: Símbolo en mayúsculas
+        
+        Returns:
+            Símbolo canónico o None
+        """
+        return self.by_clean.get(self.clean(symbol))
+    
+    def markets_for_base(self, base):
+        """
+        Args:
+            base: Activo base ('BTC', 'ETH'...)
+        
+        Returns:
+            Lista ordenada de símbolos con ese activo base
+        """
+        return list(self.by_base.get(base.upper(), []))
+    
+    def search(self, query, limit=10):
+        """
+        Símbolos buscables que contienen `query`, en orden alfabético
+        
+        Args:
+            query: Texto a buscar (en mayúsculas)
+            limit: Máximo de resultados
+        
+        Returns:
+            Lista de símbolos
+        """
+        if not query:
+            return self.searchable[:limit]
+        
+        # Recorrer la lista del n-grama menos frecuente de la consulta
+        n = min(len(query), self.MAX_GRAM)
+        candidates = None
+        for i in range(len(query) - n + 1):
+            postings = self.grams.get(query[i:i + n])
+            if postings is None:
+                return []
+            if candidates is None or len(postings) < len(candidates):
+                candidates = postings
+        
+        matches = []
+        for symbol_id in candidates:
+            symbol = self.searchable[symbol_id]
+            if query in symbol:
+                matches.append(symbol)
+                if len(matches) == limit:
+                    break
+        return matches
+
+class SymbolIndexCache:
+    """
+    Mantiene un SymbolIndex al día con los mercados del exchange
+    
+    El índice se reconstruye automáticamente la primera vez que se usa
+    después de que los mercados se hayan recargado.
+    """
+    
+    def __init__(self, exchange):
+        """
+        Args:
+            exchange: Instancia de ccxt
+        """
+        self.exchange = exchange
+        self._index = None
+        self._lock = threading.Lock()
+    
+    def get(self):
+        """
+        Returns:
+            SymbolIndex correspondiente a los mercados actuales
+        """
+        markets = self.exchange.markets or {}
+        index = self._index
+        if index is not None and index.is_current(markets):
+            return index
+        
+        with self._lock:
+            if self._index is None or not self._index.is_current(markets):
+                self._index = SymbolIndex(markets)
+            return self._index
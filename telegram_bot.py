@@ -4,10 +4,20 @@ Permite consultar tendencias y análisis técnico desde Telegram
 """
 
 import os
+import asyncio
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
-from crypto_trend_detector import CryptoTrendDetector
+from telegram.request import HTTPXRequest
+from singleflight import AsyncSingleFlight
+import metrics
+from metrics import COMMAND_LATENCY, STAGE_LATENCY, TELEGRAM_ERRORS, TELEGRAM_LATENCY
+from live_feed import LiveCandleFeed, market_category, BYBIT_PUBLIC_WS
+from ohlcv_cache import next_candle_close
+from rate_limiter import BACKGROUND, INTERACTIVE, run_with_priority
 import io
 
 # Configurar logging
@@ -17,8 +27,303 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Inicializar detector global
-detector = CryptoTrendDetector(exchange_name='bybit')
+# Directorio del almacén de velas en disco (vacío = sin almacén)
+CANDLE_STORE_DIR = os.getenv('CANDLE_STORE_DIR', 'data/candles')
+
+# Exchanges del pool (el primero es el principal: alertas, búsquedas y feed)
+EXCHANGES = [e.strip() for e in os.getenv('EXCHANGES', 'bybit,binance,okx').split(',') if e.strip()]
+
+# Copia local de los mercados ({exchange} = una por exchange) y cada cuánto se refrescan (segundos)
+MARKETS_CACHE_PATH = os.getenv('MARKETS_CACHE_PATH', 'data/markets_{exchange}.json')
+MARKETS_REFRESH_INTERVAL = float(os.getenv('MARKETS_REFRESH_INTERVAL', '3600'))
+
+# Símbolos cuyas velas llegan por WebSocket en lugar de REST (vacío = sin feed)
+LIVE_WATCHLIST = [s for s in os.getenv('LIVE_WATCHLIST', '').split(',') if s.strip()]
+LIVE_TIMEFRAMES = os.getenv('LIVE_TIMEFRAMES', '5m,15m,1h,4h').split(',')
+LIVE_SEED_LIMIT = int(os.getenv('LIVE_SEED_LIMIT', '500'))
+# URL única para todas las categorías (p. ej. un servidor de prueba local)
+LIVE_FEED_URL = os.getenv('LIVE_FEED_URL', '')
+
+# Alertas: se evalúan al cierre de cada vela de ALERT_TIMEFRAME (+ ALERT_DELAY s)
+ALERT_TIMEFRAME = os.getenv('ALERT_TIMEFRAME', '15m')
+ALERT_DELAY = float(os.getenv('ALERT_DELAY', '5'))
+ALERT_TIMEOUT = float(os.getenv('ALERT_TIMEOUT', '300'))
+ALERT_OPEN_INTEREST = os.getenv('ALERT_OPEN_INTEREST', '0') == '1'
+
+# Métricas en formato Prometheus en http://METRICS_HOST:METRICS_PORT/metrics (0 = desactivadas)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+
+# Velas en caché como enteros sin pérdida y paneles de scan/alertas en float32 (menos memoria por símbolo)
+COMPACT_CANDLES = os.getenv('COMPACT_CANDLES', '0') == '1'
+
+# Screener de OI (/oi_top): instantánea de todos los perpetuos cada
+# OI_SNAPSHOT_INTERVAL segundos (0 = solo al pedir /oi_top)
+OI_SNAPSHOT_INTERVAL = float(os.getenv('OI_SNAPSHOT_INTERVAL', '900'))
+# /oi_top toma una instantánea nueva si la última tiene más de estos segundos
+OI_TOP_MAX_AGE = float(os.getenv('OI_TOP_MAX_AGE', '300'))
+# Valor mínimo del OI (USD) para entrar en el ranking
+OI_TOP_MIN_VALUE = float(os.getenv('OI_TOP_MIN_VALUE', '1000000'))
+
+# ============================================================================
+# DETECTOR (CREACIÓN DIFERIDA)
+# ============================================================================
+# ccxt y pandas tardan en importarse y los mercados en descargarse. El
+# pool de detectores se crea en segundo plano al arrancar (o con el primer
+# comando) para que el bot empiece a recibir mensajes inmediatamente.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """
+    Devuelve el pool global de detectores, creándolo la primera vez (bloqueante)
+    
+    Returns:
+        Instancia de DetectorPool
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from detector_pool import DetectorPool
+                
+                # Modo incremental: solo se piden velas nuevas; con almacén, las
+                # velas cerradas se leen de disco y sobreviven a reinicios
+                _pool = DetectorPool(
+                    EXCHANGES,
+                    markets_cache_path=MARKETS_CACHE_PATH or None,
+                    incremental=True,
+                    store_dir=CANDLE_STORE_DIR or None,
+                    compact=COMPACT_CANDLES
+                )
+    return _pool
+
+def get_detector():
+    """
+    Devuelve el detector del exchange principal (bloqueante)
+    
+    Returns:
+        Instancia de CryptoTrendDetector
+    """
+    return get_pool().primary
+
+# ============================================================================
+# POOL DE WORKERS PARA ANÁLISIS
+# ============================================================================
+# ccxt (sync) y pandas bloquean el hilo que los llama. Todo el trabajo del
+# detector se ejecuta en un pool de threads para que el event loop del bot
+# siga atendiendo al resto de chats mientras se espera al exchange.
+
+ANALYSIS_MAX_WORKERS = int(os.getenv('ANALYSIS_MAX_WORKERS', '32'))
+ANALYSIS_TIMEOUT = float(os.getenv('ANALYSIS_TIMEOUT', '60'))
+SCAN_TIMEOUT = float(os.getenv('SCAN_TIMEOUT', '120'))
+
+analysis_executor = ThreadPoolExecutor(
+    max_workers=ANALYSIS_MAX_WORKERS,
+    thread_name_prefix='analysis'
+)
+analysis_semaphore = asyncio.Semaphore(ANALYSIS_MAX_WORKERS)
+
+# /analizar simultáneos del mismo símbolo comparten un único análisis
+analysis_flights = AsyncSingleFlight()
+
+async def run_blocking(func, *args, timeout=None, priority=None):
+    """
+    Ejecuta una función bloqueante en el pool de workers
+    
+    Args:
+        func: Función síncrona a ejecutar
+        *args: Argumentos para la función
+        timeout: Segundos máximos de espera (default: ANALYSIS_TIMEOUT)
+        priority: Prioridad de sus peticiones al exchange (INTERACTIVE, NORMAL,
+                  BACKGROUND; None = NORMAL)
+    
+    Returns:
+        Resultado de la función
+    
+    Raises:
+        asyncio.TimeoutError si la tarea no termina a tiempo
+    """
+    timeout = ANALYSIS_TIMEOUT if timeout is None else timeout
+    if priority is not None:
+        func, args = run_with_priority, (priority, func, *args)
+    
+    async def _run():
+        # El semáforo limita cuántas tareas ocupan el pool a la vez
+        async with analysis_semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(analysis_executor, func, *args)
+    
+    # El timeout incluye el tiempo de espera en cola
+    return await asyncio.wait_for(_run(), timeout)
+
+async def use_pool():
+    """
+    Devuelve el pool de detectores sin bloquear el event loop
+    
+    Returns:
+        Instancia de DetectorPool
+    """
+    if _pool is not None:
+        return _pool
+    return await run_blocking(get_pool)
+
+async def use_detector():
+    """
+    Devuelve el detector del exchange principal sin bloquear el event loop
+    
+    Returns:
+        Instancia de CryptoTrendDetector
+    """
+    return (await use_pool()).primary
+
+async def run_live_feed(application):
+    """
+    Suscribe LIVE_WATCHLIST a los streams de velas y mantiene el feed conectado
+    
+    Una vez conectado, get_ohlcv_data y /precio se sirven desde los
+    buffers del feed para estos símbolos.
+    """
+    # Los streams son los de Bybit
+    detector = (await use_pool()).detectors.get('bybit')
+    if detector is None:
+        logger.warning("Feed en tiempo real desactivado: bybit no está en EXCHANGES")
+        return
+    
+    async def seed(symbol, timeframe):
+        return await run_blocking(
+            detector.get_ohlcv_data, symbol, timeframe, LIVE_SEED_LIMIT, False, priority=BACKGROUND
+        )
+    
+    urls = {category: LIVE_FEED_URL for category in BYBIT_PUBLIC_WS} if LIVE_FEED_URL else None
+    feed = LiveCandleFeed(seed, urls=urls, timeframes=LIVE_TIMEFRAMES)
+    
+    for symbol_input in LIVE_WATCHLIST:
+        try:
+            symbol = await run_blocking(detector.normalize_symbol, symbol_input.strip())
+        except Exception as e:
+            logger.warning(f"No se pudo resolver {symbol_input} para el feed: {e}")
+            continue
+        market = detector.exchange.markets.get(symbol) if symbol else None
+        category = market_category(market) if market else None
+        if category is None:
+            logger.warning(f"{symbol_input} no se puede seguir por WebSocket")
+            continue
+        await feed.watch(symbol, market['id'], category)
+    
+    detector.live_feed = feed
+    application.bot_data['live_feed'] = feed
+    logger.info(f"Feed de velas en tiempo real: {', '.join(feed.watched())}")
+    await feed.run()
+
+_alert_engine = None
+
+async def use_alert_engine():
+    """
+    Devuelve el motor de alertas global (se crea con el primer uso)
+    
+    Returns:
+        Instancia de AlertEngine
+    """
+    global _alert_engine
+    if _alert_engine is None:
+        detector = await use_detector()
+        if _alert_engine is None:
+            from alert_engine import AlertEngine
+            _alert_engine = AlertEngine(detector, open_interest=ALERT_OPEN_INTEREST)
+    return _alert_engine
+
+async def run_alerts(application):
+    """
+    Evalúa las suscripciones al cierre de cada vela de ALERT_TIMEFRAME
+    
+    Todas las suscripciones se evalúan en una sola pasada y cada chat
+    recibe solo los cambios de sus símbolos.
+    """
+    while True:
+        close = next_candle_close(ALERT_TIMEFRAME)
+        await asyncio.sleep(max(0.0, close - time.time()) + ALERT_DELAY)
+        
+        engine = await use_alert_engine()
+        try:
+            notifications = await run_blocking(engine.evaluate, timeout=ALERT_TIMEOUT, priority=BACKGROUND)
+        except Exception as e:
+            logger.warning(f"Error evaluando alertas: {e}")
+            continue
+        
+        for notification in notifications:
+            text = format_alert_notification(notification)
+            for chat_id in notification['chat_ids']:
+                try:
+                    await application.bot.send_message(chat_id, text, parse_mode='Markdown')
+                except Exception as e:
+                    logger.warning(f"No se pudo enviar la alerta a {chat_id}: {e}")
+
+_oi_screen = None
+
+async def use_oi_screen():
+    """
+    Devuelve el screener de Open Interest global (se crea con el primer uso)
+    
+    Returns:
+        Instancia de OpenInterestScreen
+    """
+    global _oi_screen
+    if _oi_screen is None:
+        detector = await use_detector()
+        if _oi_screen is None:
+            from oi_screen import OpenInterestScreen
+            _oi_screen = OpenInterestScreen(detector)
+    return _oi_screen
+
+async def run_oi_snapshots():
+    """
+    Toma una instantánea del OI de todos los perpetuos cada OI_SNAPSHOT_INTERVAL
+    
+    El panel acumula las instantáneas para que /oi_top compare con las de
+    hace 24h sin pedir históricos símbolo a símbolo.
+    """
+    while True:
+        try:
+            screen = await use_oi_screen()
+            summary = await run_blocking(screen.refresh, timeout=SCAN_TIMEOUT, priority=BACKGROUND)
+            logger.info(
+                f"Instantánea de OI: {summary['with_oi']}/{summary['symbols']} perpetuos "
+                f"en {summary['elapsed']:.1f}s ({summary['sources']})"
+            )
+        except Exception as e:
+            logger.warning(f"Error tomando la instantánea de OI: {e}")
+        await asyncio.sleep(OI_SNAPSHOT_INTERVAL)
+
+async def refresh_markets():
+    """
+    Carga los mercados en segundo plano y los refresca periódicamente
+    
+    Primero se usa la copia en disco (si existe) para poder responder
+    enseguida y después se descargan los mercados actuales del exchange.
+    """
+    while True:
+        try:
+            pool = await use_pool()
+        except Exception as e:
+            logger.warning(f"No se pudo crear el pool de detectores: {e}")
+            pool = None
+        
+        for name, detector in (pool.detectors.items() if pool else ()):
+            try:
+                if detector.markets_source is None:
+                    await run_blocking(detector.ensure_markets)
+                    # La copia en disco puede estar desactualizada
+                    if detector.markets_source == 'snapshot':
+                        await run_blocking(detector.load_markets, True, priority=BACKGROUND)
+                else:
+                    await run_blocking(detector.load_markets, True, priority=BACKGROUND)
+                logger.info(f"Mercados de {name} actualizados: {len(detector.exchange.markets)}")
+            except Exception as e:
+                logger.warning(f"No se pudieron actualizar los mercados de {name}: {e}")
+        
+        await asyncio.sleep(MARKETS_REFRESH_INTERVAL)
 
 # ============================================================================
 # COMANDOS DEL BOT
@@ -38,6 +343,13 @@ Comandos disponibles:
 
 🔍 **Búsqueda:**
 /buscar BTC - Buscar símbolos disponibles
+/scan 10 15m - Ranking de tendencias de todo el mercado
+/oi\\_top 10 24 - Mayores aumentos y descensos de Open Interest
+
+🔔 **Alertas:**
+/alerta BTCUSDT - Avisar de cambios de tendencia y riesgo
+/quitar\\_alerta BTCUSDT - Dejar de seguir un símbolo
+/alertas - Ver tus símbolos seguidos
 
 ℹ️ **Información:**
 /help - Ver esta ayuda
@@ -82,13 +394,14 @@ async def analyze(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     
     try:
-        # Normalizar símbolo
-        symbol = detector.normalize_symbol(symbol_input)
+        pool = await use_pool()
+        # Normalizar símbolo (en el primer exchange sano que lo lista)
+        detector, symbol = await run_blocking(pool.route, symbol_input)
         
         if symbol is None:
             # Buscar símbolos similares
             base_search = symbol_input.replace('USDT', '').replace('USD', '')
-            matches = detector.search_symbol(base_search)
+            matches = await run_blocking(pool.primary.search_symbol, base_search)
             
             error_msg = f"❌ Símbolo '{symbol_input}' no encontrado\n\n"
             if matches:
@@ -103,7 +416,7 @@ async def analyze(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         
         # Realizar análisis completo
-        result_text = await perform_full_analysis(symbol, detector)
+        result_text = await perform_full_analysis(symbol, pool)
         
         # Telegram tiene límite de 4096 caracteres
         if len(result_text) > 4096:
@@ -114,7 +427,13 @@ async def analyze(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await update.message.reply_text(part, parse_mode='Markdown')
         else:
             await wait_msg.edit_text(result_text, parse_mode='Markdown')
-            
+    
+    except asyncio.TimeoutError:
+        logger.warning(f"Timeout analizando {symbol_input}")
+        await wait_msg.edit_text(
+            f"⏱️ El análisis de {symbol_input} tardó demasiado\n\n"
+            "💡 El exchange puede estar lento, intenta de nuevo en unos segundos"
+        )
     except Exception as e:
         logger.error(f"Error en analyze: {e}")
         await wait_msg.edit_text(
@@ -139,45 +458,48 @@ async def quick_analysis(update: Update, context: ContextTypes.DEFAULT_TYPE):
     wait_msg = await update.message.reply_text(f"🔄 Analizando {symbol_input}...")
     
     try:
-        symbol = detector.normalize_symbol(symbol_input)
+        pool = await use_pool()
+        detector, symbol = await run_blocking(pool.route, symbol_input)
         if symbol is None:
             await wait_msg.edit_text(f"❌ Símbolo '{symbol_input}' no encontrado")
             return
         
         # Análisis rápido solo del timeframe de 15m
-        df = detector.get_ohlcv_data(symbol, '15m', limit=200)
+        df = await run_blocking(detector.get_ohlcv_data, symbol, '15m', 200, priority=INTERACTIVE)
         if df is None or len(df) < 50:
             await wait_msg.edit_text(f"❌ No hay datos suficientes para {symbol}")
             return
         
-        df = detector.calculate_indicators(df)
-        trend_info = detector.identify_trend(df)
+        df = await run_blocking(detector.calculate_indicators_incremental, df, symbol, '15m')
+        trend_info = await run_blocking(detector.identify_trend, df)
         
         if trend_info is None:
             await wait_msg.edit_text(f"❌ No se pudo analizar {symbol}")
             return
         
         # Open Interest rápido
-        oi_analysis = detector.analyze_open_interest(symbol, df)
+        oi_analysis = await run_blocking(detector.analyze_open_interest, symbol, df, priority=INTERACTIVE)
         
         # Formatear respuesta rápida
+        trend_view = trend_info.formatted()
         quick_result = f"""
 📊 **Análisis Rápido: {symbol}**
 
-💰 **Precio:** ${trend_info['precio_actual']:.4f}
-📈 **Tendencia (15m):** {trend_info['tendencia']}
+💰 **Precio:** ${trend_view['precio_actual']:.4f}
+📈 **Tendencia (15m):** {trend_view['tendencia']}
 
 **Indicadores:**
-• RSI: {trend_info['rsi']}
-• MACD: {trend_info['macd']}
-• ADX: {trend_info['adx']}
-• EMAs: {trend_info['ema_score']}
+• RSI: {trend_view['rsi']}
+• MACD: {trend_view['macd']}
+• ADX: {trend_view['adx']}
+• EMAs: {trend_view['ema_score']}
 
 **Open Interest:**
 """
         if oi_analysis:
-            quick_result += f"""• OI: {oi_analysis['oi_actual']} ({oi_analysis['oi_cambio_24h']})
-• {oi_analysis['interpretacion']}
+            oi_view = oi_analysis.formatted()
+            quick_result += f"""• OI: {oi_view['oi_actual']} ({oi_view['oi_cambio_24h']})
+• {oi_view['interpretacion']}
 """
         else:
             quick_result += "• No disponible\n"
@@ -185,7 +507,10 @@ async def quick_analysis(update: Update, context: ContextTypes.DEFAULT_TYPE):
         quick_result += "\n💡 Usa /analizar para análisis completo"
         
         await wait_msg.edit_text(quick_result, parse_mode='Markdown')
-        
+    
+    except asyncio.TimeoutError:
+        logger.warning(f"Timeout en quick_analysis de {symbol_input}")
+        await wait_msg.edit_text(f"⏱️ El análisis de {symbol_input} tardó demasiado, intenta de nuevo")
     except Exception as e:
         logger.error(f"Error en quick_analysis: {e}")
         await wait_msg.edit_text(f"❌ Error: {str(e)}")
@@ -199,17 +524,21 @@ async def get_price(update: Update, context: ContextTypes.DEFAULT_TYPE):
     symbol_input = context.args[0].upper()
     
     try:
-        symbol = detector.normalize_symbol(symbol_input)
+        pool = await use_pool()
+        detector, symbol = await run_blocking(pool.route, symbol_input)
         if symbol is None:
             await update.message.reply_text(f"❌ Símbolo '{symbol_input}' no encontrado")
             return
         
-        df = detector.get_ohlcv_data(symbol, '5m', limit=5)
+        # Sin caché: el precio debe ser el de este momento (adelanta a scans y alertas)
+        df = await run_blocking(detector.get_ohlcv_data, symbol, '5m', 5, False, priority=INTERACTIVE)
         if df is None:
             await update.message.reply_text(f"❌ No se pudo obtener precio de {symbol}")
             return
         
-        current_price = df['close'].iloc[-1]
+        # Con feed en tiempo real el último precio llega por el stream tickers
+        live_price = detector.live_feed.get_price(symbol) if detector.live_feed else None
+        current_price = live_price if live_price is not None else df['close'].iloc[-1]
         prev_price = df['close'].iloc[-2]
         change = ((current_price - prev_price) / prev_price) * 100
         
@@ -225,7 +554,10 @@ async def get_price(update: Update, context: ContextTypes.DEFAULT_TYPE):
 💡 Usa /analizar {symbol_input} para más detalles
         """
         await update.message.reply_text(price_msg, parse_mode='Markdown')
-        
+    
+    except asyncio.TimeoutError:
+        logger.warning(f"Timeout en get_price de {symbol_input}")
+        await update.message.reply_text(f"⏱️ No se pudo obtener el precio de {symbol_input} a tiempo")
     except Exception as e:
         logger.error(f"Error en get_price: {e}")
         await update.message.reply_text(f"❌ Error: {str(e)}")
@@ -239,7 +571,8 @@ async def search_symbol(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = context.args[0].upper()
     
     try:
-        matches = detector.search_symbol(query)
+        detector = await use_detector()
+        matches = await run_blocking(detector.search_symbol, query)
         
         if matches:
             result = f"🔍 **Símbolos encontrados para '{query}':**\n\n"
@@ -256,30 +589,211 @@ async def search_symbol(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Error en search_symbol: {e}")
         await update.message.reply_text(f"❌ Error: {str(e)}")
 
-async def list_exchanges(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Comando /exchanges - Listar exchanges soportados"""
-    exchanges_msg = """
-🏦 **Exchanges Soportados:**
+async def scan_market(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Comando /scan [N] [TIMEFRAME] - Ranking de tendencias de todo el mercado
+    Ejemplo: /scan 10 15m
+    """
+    top_n = 10
+    timeframe = '15m'
+    for arg in context.args or []:
+        if arg.isdigit():
+            top_n = max(1, min(int(arg), 25))
+        elif arg.lower() in ('5m', '15m', '1h', '4h'):
+            timeframe = arg.lower()
+        else:
+            await update.message.reply_text(
+                "❌ Uso incorrecto\n\n"
+                "✅ Uso correcto:\n"
+                "/scan\n"
+                "/scan 10\n"
+                "/scan 10 1h"
+            )
+            return
+    
+    wait_msg = await update.message.reply_text(
+        f"🔎 Escaneando todos los perpetuos USDT ({timeframe})...\n"
+        "⏳ Esto puede tomar hasta un minuto..."
+    )
+    
+    try:
+        pool = await use_pool()
+        scan = await run_blocking(pool.scan_market, timeframe, top_n, timeout=SCAN_TIMEOUT, priority=BACKGROUND)
+        await wait_msg.edit_text(format_scan_result(scan), parse_mode='Markdown')
+    
+    except asyncio.TimeoutError:
+        logger.warning("Timeout en scan_market")
+        await wait_msg.edit_text("⏱️ El escaneo tardó demasiado, intenta de nuevo en unos minutos")
+    except Exception as e:
+        logger.error(f"Error en scan_market: {e}")
+        await wait_msg.edit_text(f"❌ Error: {str(e)}")
 
-✅ Bybit (actual)
-✅ Binance
-✅ OKX
-✅ KuCoin
-✅ Coinbase
-✅ Kraken
-✅ Bitfinex
+async def oi_top(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Comando /oi_top [N] [HORAS] - Mayores aumentos y descensos de OI de todo el mercado
+    Ejemplo: /oi_top 10 24
+    """
+    numbers = [arg for arg in context.args or [] if arg.isdigit()]
+    if len(numbers) != len(context.args or []) or len(numbers) > 2:
+        await update.message.reply_text(
+            "❌ Uso incorrecto\n\n"
+            "✅ Uso correcto:\n"
+            "/oi\\_top\n"
+            "/oi\\_top 10\n"
+            "/oi\\_top 10 4",
+            parse_mode='Markdown'
+        )
+        return
+    top_n = max(1, min(int(numbers[0]), 25)) if numbers else 10
+    hours = max(1, min(int(numbers[1]), 48)) if len(numbers) > 1 else 24
+    
+    try:
+        screen = await use_oi_screen()
+        result = await run_blocking(
+            screen.top, top_n, hours, OI_TOP_MIN_VALUE, OI_TOP_MAX_AGE,
+            timeout=SCAN_TIMEOUT, priority=BACKGROUND
+        )
+        await update.message.reply_text(format_oi_top(result, hours), parse_mode='Markdown')
+    
+    except asyncio.TimeoutError:
+        logger.warning("Timeout en oi_top")
+        await update.message.reply_text("⏱️ La instantánea de OI tardó demasiado, intenta de nuevo en unos minutos")
+    except Exception as e:
+        logger.error(f"Error en oi_top: {e}")
+        await update.message.reply_text(f"❌ Error: {str(e)}")
 
-💡 Para cambiar exchange, contacta al administrador.
+async def add_alert(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Comando /alerta SYMBOL - Recibir avisos cuando cambie el análisis
+    Ejemplo: /alerta BTCUSDT
     """
+    if not context.args:
+        await update.message.reply_text("❌ Uso: /alerta BTCUSDT")
+        return
+    
+    symbol_input = context.args[0].upper()
+    
+    try:
+        detector = await use_detector()
+        symbol = await run_blocking(detector.normalize_symbol, symbol_input)
+        if symbol is None:
+            await update.message.reply_text(f"❌ Símbolo '{symbol_input}' no encontrado")
+            return
+        
+        engine = await use_alert_engine()
+        if engine.subscribe(update.effective_chat.id, symbol):
+            await update.message.reply_text(
+                f"🔔 Alertas activadas para {symbol}\n"
+                f"Se revisa al cierre de cada vela de {ALERT_TIMEFRAME} y solo se avisa si algo cambia"
+            )
+        else:
+            await update.message.reply_text(f"ℹ️ Ya tenías alertas para {symbol}")
+    
+    except asyncio.TimeoutError:
+        await update.message.reply_text(f"⏱️ No se pudo verificar {symbol_input} a tiempo")
+    except Exception as e:
+        logger.error(f"Error en add_alert: {e}")
+        await update.message.reply_text(f"❌ Error: {str(e)}")
+
+async def remove_alert(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /quitar_alerta SYMBOL - Dejar de recibir avisos de un símbolo"""
+    if not context.args:
+        await update.message.reply_text("❌ Uso: /quitar_alerta BTCUSDT")
+        return
+    
+    symbol_input = context.args[0].upper()
+    
+    try:
+        detector = await use_detector()
+        symbol = await run_blocking(detector.normalize_symbol, symbol_input) or symbol_input
+        engine = await use_alert_engine()
+        if engine.unsubscribe(update.effective_chat.id, symbol):
+            await update.message.reply_text(f"🔕 Alertas desactivadas para {symbol}")
+        else:
+            await update.message.reply_text(f"ℹ️ No tenías alertas para {symbol}")
+    
+    except Exception as e:
+        logger.error(f"Error en remove_alert: {e}")
+        await update.message.reply_text(f"❌ Error: {str(e)}")
+
+async def list_alerts(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /alertas - Ver los símbolos con alertas activas"""
+    engine = await use_alert_engine()
+    symbols = engine.watchlist(update.effective_chat.id)
+    if not symbols:
+        await update.message.reply_text("🔕 No tienes alertas activas\n\n💡 Usa /alerta BTCUSDT")
+        return
+    
+    result = "🔔 **Tus alertas:**\n\n"
+    for symbol in symbols:
+        result += f"• `{symbol}`\n"
+    result += f"\n⏰ Revisión al cierre de cada vela de {ALERT_TIMEFRAME}"
+    await update.message.reply_text(result, parse_mode='Markdown')
+
+async def list_exchanges(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /exchanges - Exchanges del pool y su estado"""
+    try:
+        pool = await use_pool()
+    except Exception as e:
+        logger.error(f"Error en list_exchanges: {e}")
+        await update.message.reply_text(f"❌ Error: {str(e)}")
+        return
+    
+    exchanges_msg = "🏦 **Exchanges:**\n\n"
+    for i, status in enumerate(pool.status()):
+        if not status['available']:
+            state = "❌ Caído"
+        elif status['slow']:
+            state = "🐢 Lento"
+        else:
+            state = "✅ Activo"
+        latency = f" | {status['latency'] * 1000:.0f} ms" if status['latency'] is not None else ""
+        primary = " (principal)" if i == 0 else ""
+        exchanges_msg += f"{state} **{status['name'].upper()}**{primary}\n"
+        exchanges_msg += f"   {status['markets']} mercados{latency} | {status['failures']}/{status['requests']} errores\n"
+    
+    exchanges_msg += "\n💡 Cada símbolo se consulta en el primer exchange sano que lo lista"
     await update.message.reply_text(exchanges_msg, parse_mode='Markdown')
 
 # ============================================================================
 # FUNCIÓN AUXILIAR PARA ANÁLISIS COMPLETO
 # ============================================================================
 
-async def perform_full_analysis(symbol, detector):
+async def perform_full_analysis(symbol, pool, timeout=None):
     """
-    Realiza un análisis completo y retorna texto formateado
+    Realiza un análisis completo en el pool de workers sin bloquear el bot
+    
+    Las peticiones simultáneas del mismo símbolo se unen al análisis en curso.
+    Si el exchange elegido falla, el análisis se repite en otro que lo liste.
+    
+    Args:
+        symbol: Símbolo normalizado
+        pool: Instancia de DetectorPool
+        timeout: Segundos máximos para el análisis (default: ANALYSIS_TIMEOUT)
+    
+    Returns:
+        String con análisis completo formateado para Telegram
+    """
+    return await analysis_flights.do(
+        symbol, run_blocking, build_full_analysis_routed, symbol, pool, timeout=timeout
+    )
+
+def build_full_analysis_routed(symbol, pool):
+    """
+    build_full_analysis con failover entre los exchanges del pool (bloqueante)
+    
+    Returns:
+        String con análisis completo y el exchange que lo sirvió
+    """
+    name, _, output = pool.run(symbol, lambda detector, normalized: build_full_analysis(normalized, detector))
+    if output is None:
+        return f"❌ Ningún exchange lista {symbol}"
+    return f"{output}\n🏦 Datos de {name.upper()}"
+
+@STAGE_LATENCY.timed(stage='full_analysis')
+def build_full_analysis(symbol, detector):
+    """
+    Realiza un análisis completo y retorna texto formateado (bloqueante)
     
     Args:
         symbol: Símbolo normalizado
@@ -291,11 +805,19 @@ async def perform_full_analysis(symbol, detector):
     results = {}
     timeframes = ['5m', '15m', '1h', '4h']
     
+    from crypto_trend_detector import AnalysisContext
+    
+    # Cada (símbolo, timeframe) se descarga una vez con el mayor limit necesario
+    context = AnalysisContext(detector, symbol)
+    for tf in timeframes:
+        context.require(tf, 200)
+    context.require('1h', 100)   # Open Interest
+    context.require('15m', 100)  # Niveles de precio
+    
     # Análisis por timeframe
     for tf in timeframes:
-        df = detector.get_ohlcv_data(symbol, tf, limit=200)
+        df = context.indicators(tf)
         if df is not None and len(df) >= 50:
-            df = detector.calculate_indicators(df)
             trend_info = detector.identify_trend(df)
             if trend_info:
                 results[tf] = trend_info
@@ -304,7 +826,7 @@ async def perform_full_analysis(symbol, detector):
         return f"❌ No hay datos suficientes para analizar {symbol}"
     
     # Análisis de OI
-    df_oi = detector.get_ohlcv_data(symbol, '1h', limit=100)
+    df_oi = context.candles('1h', 100)
     oi_analysis = None
     if df_oi is not None:
         oi_analysis = detector.analyze_open_interest(symbol, df_oi)
@@ -317,11 +839,10 @@ async def perform_full_analysis(symbol, detector):
     if risk_analysis:
         recommendation = detector.generate_trading_recommendation(results, oi_analysis, risk_analysis)
     
-    # Niveles de precio
-    df_levels = detector.get_ohlcv_data(symbol, '15m', limit=100)
+    # Niveles de precio (mismos indicadores de 15m, últimas 100 velas)
+    df_levels = context.indicators('15m', 100)
     price_levels = None
     if df_levels is not None and len(df_levels) >= 50:
-        df_levels = detector.calculate_indicators(df_levels)
         current_price = df_levels['close'].iloc[-1]
         atr = df_levels['atr'].iloc[-1]
         trend_direction = risk_analysis['consensus'] if risk_analysis else 'neutral'
@@ -333,20 +854,21 @@ async def perform_full_analysis(symbol, detector):
     # Timeframes
     output += "**📈 Multi-Timeframe:**\n"
     for tf, data in results.items():
-        output += f"• {tf}: {data['tendencia']}\n"
+        output += f"• {tf}: {data.trend.label}\n"
     output += "\n"
     
     # Precio actual
     if results:
         first_tf = list(results.values())[0]
-        output += f"💰 **Precio:** ${first_tf['precio_actual']:.4f}\n\n"
+        output += f"💰 **Precio:** ${first_tf.price:.4f}\n\n"
     
     # Open Interest
     if oi_analysis:
+        oi_view = oi_analysis.formatted()
         output += "**📊 Open Interest:**\n"
-        output += f"• Actual: {oi_analysis['oi_actual']}\n"
-        output += f"• Cambio 24h: {oi_analysis['oi_cambio_24h']}\n"
-        output += f"• {oi_analysis['interpretacion']}\n\n"
+        output += f"• Actual: {oi_view['oi_actual']}\n"
+        output += f"• Cambio 24h: {oi_view['oi_cambio_24h']}\n"
+        output += f"• {oi_view['interpretacion']}\n\n"
     
     # Alertas de riesgo
     if risk_analysis and risk_analysis['alerts']:
@@ -382,6 +904,147 @@ async def perform_full_analysis(symbol, detector):
     
     return output
 
+def format_scan_result(scan):
+    """
+    Formatea el resultado de scan_market para Telegram
+    
+    Args:
+        scan: Dict devuelto por DetectorPool.scan_market (o CryptoTrendDetector.scan_market)
+    
+    Returns:
+        String con el ranking formateado
+    """
+    output = f"🔎 **ESCANEO DE MERCADO ({scan['timeframe']})**\n\n"
+    
+    sections = [
+        ("🟢 **TOP ALCISTAS:**", scan['bullish']),
+        ("🔴 **TOP BAJISTAS:**", scan['bearish'])
+    ]
+    for title, entries in sections:
+        output += f"{title}\n"
+        if not entries:
+            output += "• Ninguno\n"
+        for i, entry in enumerate(entries, 1):
+            trend = entry['trend']
+            exchange = f" ({entry['exchange'].upper()})" if len(scan.get('exchanges', {})) > 1 else ""
+            output += f"{i}. `{entry['symbol']}`{exchange} ${trend.price:.4f}\n"
+            output += f"   {trend.trend.label} | ADX {trend.adx:.2f} | Riesgo {entry['risk_score']}/16\n"
+        output += "\n"
+    
+    output += f"📊 {scan['analyzed']}/{scan['requested']} mercados en {scan['elapsed']:.0f}s\n"
+    if len(scan.get('exchanges', {})) > 1:
+        output += "🏦 " + ", ".join(f"{name.upper()}: {count}" for name, count in scan['exchanges'].items()) + "\n"
+    output += "💡 Usa /analizar SÍMBOLO para el análisis completo"
+    
+    return output
+
+def format_oi_top(result, hours):
+    """
+    Formatea el ranking de OpenInterestScreen.top para Telegram
+    
+    Args:
+        result: Dict devuelto por OpenInterestScreen.top
+        hours: Ventana pedida (horas)
+    
+    Returns:
+        String con el ranking formateado
+    """
+    output = f"🏦 **OPEN INTEREST ({hours}h)**\n\n"
+    
+    sections = [
+        ("🟢 **MAYORES AUMENTOS DE OI:**", result['builds']),
+        ("🔴 **MAYORES DESCENSOS DE OI:**", result['unwinds'])
+    ]
+    for title, entries in sections:
+        output += f"{title}\n"
+        if not entries:
+            output += "• Ninguno\n"
+        for i, entry in enumerate(entries, 1):
+            output += f"{i}. `{entry['symbol']}` OI {entry['oi_change']:+.2f}% | Precio {entry['price_change']:+.2f}%\n"
+            output += f"   ${entry['open_interest_value'] / 1e6:,.1f}M"
+            if entry['divergence']:
+                output += f" | {entry['divergence'].label}"
+            output += "\n"
+        output += "\n"
+    
+    if result['hours'] < hours:
+        output += f"⏳ Solo hay {result['hours']:.1f}h de instantáneas ({result['snapshots']}); la ventana se completa con el tiempo\n"
+    output += f"📊 {result['symbols']} perpetuos"
+    if result['refresh']:
+        output += f" | última descarga en {result['refresh']['elapsed']:.1f}s"
+    output += "\n💡 Usa /analizar SÍMBOLO para el análisis completo"
+    
+    return output
+
+def format_alert_notification(notification):
+    """
+    Formatea los cambios detectados por AlertEngine para Telegram
+    
+    Args:
+        notification: Dict devuelto por AlertEngine.evaluate
+    
+    Returns:
+        String con los cambios formateados
+    """
+    state = notification['state']
+    output = f"🔔 **ALERTA {notification['symbol']}**\n"
+    if state['price'] is not None:
+        output += f"💰 Precio: ${state['price']:.4f}\n"
+    output += "\n"
+    
+    level_emoji = {'critico': '🔴', 'alto': '🟠', 'medio': '🟡', 'bajo': '🟢'}
+    for change in notification['changes']:
+        if change['type'] == 'trend':
+            output += f"📊 {change['timeframe']}: {change['old'].label} → {change['new'].label}\n"
+        elif change['type'] == 'action':
+            output += f"🎯 {change['old']} → **{change['new']}**\n"
+            if change['bias']:
+                output += f"   📍 {change['bias']}\n"
+        elif change['type'] == 'alert_new':
+            output += f"{level_emoji[change['level']]} Nueva: {change['message']}\n"
+        elif change['type'] == 'alert_cleared':
+            output += f"✔️ Resuelta: {change['message']}\n"
+    
+    if state['risk_score'] is not None:
+        output += f"\n⚡ Riesgo: {state['risk_score']}/16"
+    output += f"\n💡 /analizar {notification['symbol']} para el análisis completo"
+    
+    return output
+
+# ============================================================================
+# MÉTRICAS
+# ============================================================================
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest que mide cada llamada a la API de Telegram (sendMessage, editMessageText...)"""
+    
+    async def do_request(self, url, method, *args, **kwargs):
+        endpoint = url.rsplit('/', 1)[-1]
+        with TELEGRAM_LATENCY.track(TELEGRAM_ERRORS, endpoint=endpoint):
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        if code >= 400:
+            TELEGRAM_ERRORS.inc(endpoint=endpoint, error=f"HTTP {code}")
+        return code, payload
+
+def instrument_command(name, callback):
+    """
+    Mide la duración total de un comando
+    
+    Args:
+        name: Nombre del comando
+        callback: Handler del comando
+    
+    Returns:
+        El handler envuelto (o el original si las métricas están desactivadas)
+    """
+    if not metrics.is_enabled():
+        return callback
+    
+    async def timed(update, context):
+        with COMMAND_LATENCY.time(command=name):
+            return await callback(update, context)
+    return timed
+
 # ============================================================================
 # MANEJO DE ERRORES
 # ============================================================================
@@ -400,6 +1063,25 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # MAIN - INICIAR BOT
 # ============================================================================
 
+async def start_background_tasks(application):
+    """Lanza la carga y el refresco periódico de mercados y el feed de velas"""
+    application.bot_data['markets_task'] = asyncio.create_task(refresh_markets())
+    application.bot_data['alerts_task'] = asyncio.create_task(run_alerts(application))
+    if OI_SNAPSHOT_INTERVAL > 0:
+        application.bot_data['oi_task'] = asyncio.create_task(run_oi_snapshots())
+    if LIVE_WATCHLIST:
+        application.bot_data['live_feed_task'] = asyncio.create_task(run_live_feed(application))
+
+async def stop_background_tasks(application):
+    """Detiene las tareas en segundo plano"""
+    feed = application.bot_data.pop('live_feed', None)
+    if feed is not None:
+        await feed.close()
+    for name in ('markets_task', 'live_feed_task', 'alerts_task', 'oi_task'):
+        task = application.bot_data.pop(name, None)
+        if task is not None:
+            task.cancel()
+
 def main():
     """Función principal para iniciar el bot"""
     
@@ -417,17 +1099,43 @@ def main():
         print("   4. Copia el token generado")
         return
     
+    # Métricas (antes de crear el detector, para instrumentar su exchange)
+    if METRICS_PORT:
+        metrics.enable()
+        metrics.start_http_server(METRICS_PORT, METRICS_HOST)
+        logger.info(f"Métricas en http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    
     # Crear aplicación
-    application = Application.builder().token(TOKEN).build()
+    # concurrent_updates: cada comando se atiende en su propia tarea
+    # post_init: el detector y los mercados se cargan en segundo plano
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(True)
+        .post_init(start_background_tasks)
+        .post_shutdown(stop_background_tasks)
+    )
+    if metrics.is_enabled():
+        builder = builder.request(InstrumentedRequest())
+    application = builder.build()
     
     # Registrar comandos
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("analizar", analyze))
-    application.add_handler(CommandHandler("quick", quick_analysis))
-    application.add_handler(CommandHandler("precio", get_price))
-    application.add_handler(CommandHandler("buscar", search_symbol))
-    application.add_handler(CommandHandler("exchanges", list_exchanges))
+    commands = [
+        ("start", start),
+        ("help", help_command),
+        ("analizar", analyze),
+        ("quick", quick_analysis),
+        ("precio", get_price),
+        ("buscar", search_symbol),
+        ("scan", scan_market),
+        ("oi_top", oi_top),
+        ("alerta", add_alert),
+        ("quitar_alerta", remove_alert),
+        ("alertas", list_alerts),
+        ("exchanges", list_exchanges),
+    ]
+    for name, callback in commands:
+        application.add_handler(CommandHandler(name, instrument_command(name, callback)))
     
     # Registrar error handler
     application.add_error_handler(error_handler)
@@ -441,6 +1149,9 @@ def main():
     print("   /quick ETHUSDT")
     print("   /precio BTCUSDT")
     print("   /buscar BTC")
+    print("   /scan 10 15m")
+    print("   /oi_top 10 24")
+    print("   /alerta BTCUSDT")
     
     # Iniciar bot (long polling)
     application.run_polling(allowed_updates=Update.ALL_TYPES)
@@ -0,0 +1,116 @@
+"""
+El modo compacto da los mismos resultados que el detector con DataFrames
+"""
+
+import time
+from dataclasses import fields
+
+import numpy as np
+import pytest
+
+from analysis_types import TrendResult
+from compact_candles import CandleBuffer, CompactCandles
+from crypto_trend_detector import CryptoTrendDetector
+
+SYMBOL = 'BTC/USDT:USDT'
+MARKETS = {
+    SYMBOL: {'id': 'BTCUSDT', 'symbol': SYMBOL, 'base': 'BTC', 'quote': 'USDT', 'settle': 'USDT',
+             'active': True, 'swap': True, 'linear': True, 'type': 'swap'}
+}
+TIMEFRAME_MS = {'5m': 300_000, '1h': 3_600_000}
+
+def make_ohlcv(timeframe, count, seed=0):
+    """Velas con precios de dos decimales que float32 no representa exactos"""
+    rng = np.random.default_rng(seed)
+    period = TIMEFRAME_MS[timeframe]
+    end = int(time.time() * 1000) // period * period
+    close = np.round(67123.45 * np.exp(np.cumsum(rng.normal(0, 0.002, count))), 2)
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.round(np.maximum(open_, close) + rng.uniform(0, 40, count), 2)
+    low = np.round(np.minimum(open_, close) - rng.uniform(0, 40, count), 2)
+    volume = np.round(rng.uniform(1, 500, count), 3)
+    return [
+        [end - period * (count - 1 - i), float(open_[i]), float(high[i]), float(low[i]), float(close[i]), float(volume[i])]
+        for i in range(count)
+    ]
+
+class FakeExchange:
+    id = 'bybit'
+    has = {}
+    
+    def __init__(self):
+        self.markets = {}
+        self.ohlcv = {tf: make_ohlcv(tf, 1000, seed) for seed, tf in enumerate(TIMEFRAME_MS)}
+    
+    def load_markets(self, reload=False):
+        self.markets = dict(MARKETS)
+        return self.markets
+    
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None, params={}):
+        rows = self.ohlcv[timeframe]
+        if since is not None:
+            rows = [row for row in rows if row[0] >= since]
+        return [list(row) for row in rows[-limit:]]
+
+def make_detector(compact, incremental):
+    return CryptoTrendDetector(exchange=FakeExchange(), rate_limiter=False, lazy_markets=True,
+                               compact=compact, incremental=incremental)
+
+def analyze(detector, timeframe, limit):
+    df = detector.get_ohlcv_data(SYMBOL, timeframe, limit)
+    if detector.incremental:
+        df = detector.calculate_indicators_incremental(df, SYMBOL, timeframe)
+    else:
+        df = detector.calculate_indicators(df)
+    trend = detector.identify_trend(df)
+    direction = 'alcista' if trend.trend.value > 0 else 'bajista' if trend.trend.value < 0 else 'neutral'
+    levels = detector.calculate_price_levels(df, trend.price, direction, trend.atr)
+    return df, trend, levels
+
+@pytest.mark.parametrize('incremental', [False, True])
+@pytest.mark.parametrize('timeframe', ['5m', '1h'])
+def test_compact_matches_float64(timeframe, incremental):
+    reference = make_detector(compact=False, incremental=incremental)
+    compact = make_detector(compact=True, incremental=incremental)
+    raw = reference.exchange.ohlcv[timeframe]
+    
+    # Dos pasadas: la segunda sale de la caché (y del buffer incremental)
+    for _ in range(2):
+        for limit in (200, 500):
+            df, trend, levels = analyze(compact, timeframe, limit)
+            expected_df, expected_trend, expected_levels = analyze(reference, timeframe, limit)
+            
+            assert df['close'].iloc[-1] == raw[-1][4]
+            assert df[['open', 'high', 'low', 'close', 'volume']].values.tolist() == [row[1:] for row in raw[-limit:]]
+            for field in fields(TrendResult):
+                assert getattr(trend, field.name) == getattr(expected_trend, field.name), field.name
+            assert trend.price == raw[-1][4]
+            assert levels is not None and levels == expected_levels
+
+@pytest.mark.parametrize('incremental', [False, True])
+def test_compact_uses_less_memory(incremental):
+    used = {}
+    for compact in (False, True):
+        detector = make_detector(compact=compact, incremental=incremental)
+        for timeframe in TIMEFRAME_MS:
+            analyze(detector, timeframe, 200)
+        used[compact] = detector.ohlcv_cache.bytes_used
+    assert used[True] < used[False]
+
+def test_candle_buffer_reencodes():
+    ohlcv = make_ohlcv('5m', 1000)
+    buffer = CandleBuffer(1000)
+    buffer.update(ohlcv)
+    assert buffer.nbytes < CompactCandles.from_ohlcv(ohlcv).to_dataframe().memory_usage(index=True).sum()
+    
+    # Una vela con más decimales obliga a cambiar las escalas sin perder los valores
+    last = ohlcv[-1][:4] + [ohlcv[-1][4] + 0.005, 1234.56789]
+    buffer.update([last])
+    assert buffer.tail(1000).values.tolist() == [row[1:] for row in ohlcv[:-1] + [last]]
+    
+    # Un volumen que no cabe en int32 deja la serie en float64
+    huge = last[:5] + [3.2e11]
+    buffer.update([huge])
+    candles = buffer.tail(3)
+    assert candles.scales is None
+    assert candles.values.tolist() == [row[1:] for row in ohlcv[-3:-1] + [huge]]
@@ -0,0 +1,58 @@
+"""
+IndicatorEngine frente a calculate_indicators
+"""
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from crypto_trend_detector import CryptoTrendDetector
+from indicator_engine import INDICATOR_COLUMNS, IndicatorEngine
+
+def make_candles(n, seed=0, freq='15min'):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.uniform(0, 0.005, n)),
+        'low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.005, n)),
+        'close': close,
+        'volume': rng.uniform(10, 100, n)
+    }, index=pd.date_range('2024-01-01', periods=n, freq=freq, name='timestamp'))
+
+@pytest.fixture(scope='module')
+def detector():
+    return CryptoTrendDetector(cache_size=0, lazy_markets=True)
+
+def assert_same(result, df, detector):
+    expected = detector.calculate_indicators(df)
+    pdt.assert_frame_equal(result[INDICATOR_COLUMNS], expected[INDICATOR_COLUMNS], rtol=1e-9)
+
+def test_growing_series(detector):
+    candles = make_candles(400)
+    engine = IndicatorEngine(history_size=1000)
+    for stop in range(250, 400, 7):
+        df = candles.iloc[:stop]
+        assert_same(engine.update('BTC/USDT', '15m', df), df, detector)
+
+def test_sliding_window(detector):
+    candles = make_candles(600, seed=1)
+    engine = IndicatorEngine(history_size=300)
+    for stop in range(300, 600, 5):
+        df = candles.iloc[stop - 300:stop]
+        assert_same(engine.update('BTC/USDT', '15m', df), df, detector)
+        # La vela en formación cambia y se vuelve a pedir la misma ventana
+        df = df.copy()
+        df.iloc[-1, df.columns.get_loc('close')] *= 1.001
+        assert_same(engine.update('BTC/USDT', '15m', df), df, detector)
+
+def test_frame_longer_than_history(detector):
+    candles = make_candles(520, seed=2)
+    engine = IndicatorEngine(history_size=300)
+    for stop in (500, 510, 520):
+        df = candles.iloc[:stop]
+        assert_same(engine.update('BTC/USDT', '15m', df), df, detector)
+    df = candles.iloc[-300:]
+    assert_same(engine.update('BTC/USDT', '15m', df), df, detector)
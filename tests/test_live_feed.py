@@ -0,0 +1,132 @@
+"""
+LiveCandleFeed contra ws_replay.ReplayServer: carga inicial, velas en
+vivo, recarga tras un hueco y reconexión
+"""
+
+import asyncio
+import os
+
+import numpy as np
+import pandas as pd
+
+from live_feed import LiveCandleFeed
+from ws_replay import ReplayServer, load_messages
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'bybit_kline_5m_btcusdt.jsonl')
+SYMBOL = 'BTC/USDT:USDT'
+TOPIC = 'kline.5.BTCUSDT'
+PERIOD_MS = 5 * 60 * 1000
+
+def kline_row(kline):
+    return [int(kline['start'])] + [float(kline[k]) for k in ('open', 'high', 'low', 'close', 'volume')]
+
+def kline_message(row, confirm=False):
+    start, open_, high, low, close, volume = row
+    kline = {
+        'start': start, 'end': start + PERIOD_MS - 1, 'interval': '5',
+        'open': str(open_), 'high': str(high), 'low': str(low), 'close': str(close),
+        'volume': str(volume), 'confirm': confirm, 'timestamp': start + 1000
+    }
+    return {'topic': TOPIC, 'data': [kline], 'ts': start + 1000, 'type': 'snapshot'}
+
+def make_history(end, count):
+    """Velas de 5m que devuelve el REST simulado (la última empieza en end)"""
+    rng = np.random.default_rng(5)
+    close = 67000 * np.exp(np.cumsum(rng.normal(0, 0.001, count)))
+    open_ = np.r_[close[0], close[:-1]]
+    index = pd.to_datetime(end - PERIOD_MS * np.arange(count)[::-1], unit='ms')
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + 5,
+        'low': np.minimum(open_, close) - 5,
+        'close': close,
+        'volume': rng.uniform(10, 100, count)
+    }, index=index.rename('timestamp'))
+
+def history_rows(history, until):
+    rows = history[history.index <= pd.Timestamp(until, unit='ms')]
+    timestamps = rows.index.values.astype('datetime64[ms]').astype('int64')
+    return [[int(ts)] + values for ts, values in zip(timestamps, rows.values.tolist())]
+
+async def wait_until(condition, timeout=5):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "tiempo de espera agotado"
+        await asyncio.sleep(0.01)
+
+async def scenario():
+    messages = load_messages(FIXTURE)
+    klines = {}
+    for message in messages:
+        if message['topic'] == TOPIC:
+            for kline in message['data']:
+                klines[kline['start']] = kline_row(kline)
+    first, last = min(klines), max(klines)
+    last_price = float([m for m in messages if m['topic'].startswith('tickers.')][-1]['data']['lastPrice'])
+    
+    # El REST conoce las velas hasta `until`; `gate` retiene las cargas
+    history = make_history(last + 10 * PERIOD_MS, 400)
+    rest = {'until': first}
+    gate = asyncio.Event()
+    gate.set()
+    seeds = []
+    
+    async def seed(symbol, timeframe):
+        seeds.append((symbol, timeframe))
+        await gate.wait()
+        return history[history.index <= pd.Timestamp(rest['until'], unit='ms')]
+    
+    server = await ReplayServer(messages).start()
+    feed = LiveCandleFeed(seed, urls={'linear': server.url}, timeframes=('5m',), buffer_size=500)
+    await feed.watch(SYMBOL, 'BTCUSDT', 'linear')
+    assert feed.get_candles(SYMBOL, '5m', 10) is None
+    run = asyncio.ensure_future(feed.run())
+    try:
+        # Carga inicial por REST y velas grabadas por el stream
+        await asyncio.wait_for(server.connected.get(), 5)
+        expected = history_rows(history, first - PERIOD_MS) + [klines[ts] for ts in sorted(klines)]
+        await wait_until(lambda: feed.get_candles(SYMBOL, '5m', 1) == [klines[last]])
+        assert feed.get_candles(SYMBOL, '5m', len(expected)) == expected
+        assert feed.get_candles(SYMBOL, '5m', len(expected) + 1) is None
+        assert feed.get_price(SYMBOL) == last_price
+        assert seeds == [(SYMBOL, '5m')]
+        
+        # Hueco de dos velas: el buffer deja de usarse hasta recargar el histórico
+        gap = last + 3 * PERIOD_MS
+        gap_row = [gap, 67500.0, 67510.0, 67490.0, 67505.0, 1.5]
+        rest['until'] = gap
+        gate.clear()
+        await server.publish(kline_message(gap_row))
+        await wait_until(lambda: len(seeds) == 2)
+        assert feed.get_candles(SYMBOL, '5m', 1) is None
+        gate.set()
+        await wait_until(lambda: feed.get_candles(SYMBOL, '5m', 1) is not None)
+        expected = history_rows(history, gap - PERIOD_MS) + [gap_row]
+        assert feed.get_candles(SYMBOL, '5m', len(expected)) == expected
+        
+        # Reconexión: al volver se suscribe de nuevo y recarga el histórico
+        updated_row = gap_row[:4] + [67520.0, 2.5]
+        server.messages = [kline_message(updated_row)]
+        gate.clear()
+        await server.disconnect()
+        await wait_until(lambda: feed.get_candles(SYMBOL, '5m', 1) is None)
+        await asyncio.wait_for(server.connected.get(), 5)
+        assert feed.reconnects == 1
+        await wait_until(lambda: len(seeds) == 3)
+        assert feed.get_candles(SYMBOL, '5m', 1) is None
+        gate.set()
+        await wait_until(lambda: feed.get_candles(SYMBOL, '5m', 1) == [updated_row])
+        expected = history_rows(history, gap - PERIOD_MS) + [updated_row]
+        assert feed.get_candles(SYMBOL, '5m', len(expected)) == expected
+        
+        subscriptions = [m['args'] for m in server.received if m.get('op') == 'subscribe']
+        assert subscriptions == [[TOPIC, 'tickers.BTCUSDT']] * 2
+        assert feed.stats()['connections'] == 1
+    finally:
+        await feed.close()
+        await asyncio.wait_for(run, 5)
+        await server.stop()
+
+def test_live_feed_replay():
+    asyncio.run(scenario())
@@ -0,0 +1,149 @@
+"""
+Servidor WebSocket local que reproduce mensajes grabados del stream público de Bybit
+Sirve para probar LiveCandleFeed sin red (LIVE_FEED_URL=ws://127.0.0.1:8765/ws)
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+
+from aiohttp import WSMsgType, web
+
+def load_messages(path):
+    """
+    Lee una grabación con un mensaje JSON del stream por línea
+    
+    Args:
+        path: Ruta del fichero .jsonl
+    
+    Returns:
+        Lista de dicts en el orden grabado
+    """
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+class ReplayServer:
+    """
+    Imita el stream público v5 de Bybit con mensajes grabados
+    
+    Responde a 'subscribe' y 'ping' como Bybit y, tras cada suscripción,
+    envía a esa conexión los mensajes grabados de los topics pedidos (con
+    `interval` segundos entre mensajes). publish() y disconnect() permiten
+    a una prueba inyectar velas nuevas o cortar las conexiones.
+    """
+    
+    def __init__(self, messages=(), interval=0.0, host='127.0.0.1', port=0, path='/ws'):
+        """
+        Args:
+            messages: Mensajes que se reproducen en cada conexión
+            interval: Segundos entre mensajes reproducidos
+            host: Dirección de escucha
+            port: Puerto (0 = uno libre; ver url tras start())
+            path: Ruta del WebSocket
+        """
+        self.messages = list(messages)
+        self.interval = interval
+        self.host = host
+        self.port = port
+        self.path = path
+        self.connected = asyncio.Queue()   # una entrada por conexión suscrita
+        self.received = []                 # mensajes de los clientes
+        self._clients = {}                 # WebSocket -> topics suscritos
+        self._conn_ids = itertools.count(1)
+        self._runner = None
+    
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}{self.path}"
+    
+    async def start(self):
+        """Empieza a aceptar conexiones"""
+        app = web.Application()
+        app.router.add_get(self.path, self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.port = self._runner.addresses[0][1]
+        return self
+    
+    async def stop(self):
+        await self.disconnect()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def publish(self, message):
+        """Envía un mensaje a las conexiones suscritas a su topic"""
+        for ws, topics in list(self._clients.items()):
+            if message.get('topic') in topics and not ws.closed:
+                await ws.send_json(message)
+    
+    async def disconnect(self):
+        """Cierra todas las conexiones abiertas (el cliente debe reconectar)"""
+        for ws in list(self._clients):
+            await ws.close()
+    
+    async def _handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        conn_id = f"replay-{next(self._conn_ids)}"
+        topics = self._clients[ws] = set()
+        replay = None
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                data = json.loads(message.data)
+                self.received.append(data)
+                op = data.get('op')
+                if op == 'ping':
+                    await ws.send_json({'success': True, 'ret_msg': 'pong', 'conn_id': conn_id, 'op': 'ping'})
+                elif op == 'subscribe':
+                    new = set(data.get('args', [])) - topics
+                    topics.update(new)
+                    await ws.send_json({'success': True, 'ret_msg': '', 'conn_id': conn_id,
+                                        'req_id': data.get('req_id', ''), 'op': 'subscribe'})
+                    if replay is None:
+                        self.connected.put_nowait(ws)
+                    replay = asyncio.ensure_future(self._replay(ws, new, replay))
+        finally:
+            if replay is not None:
+                replay.cancel()
+            del self._clients[ws]
+        return ws
+    
+    async def _replay(self, ws, topics, previous):
+        # Las suscripciones llegan en lotes: se reproducen en orden
+        if previous is not None:
+            await previous
+        for message in self.messages:
+            if message.get('topic') in topics and not ws.closed:
+                if self.interval:
+                    await asyncio.sleep(self.interval)
+                await ws.send_json(message)
+
+async def serve(args):
+    server = await ReplayServer(load_messages(args.fixture), args.interval, args.host, args.port).start()
+    print(f"🎞️ Reproduciendo {len(server.messages)} mensajes en {server.url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor WebSocket que reproduce un stream grabado de Bybit")
+    parser.add_argument('fixture', help="Fichero .jsonl con un mensaje del stream por línea")
+    parser.add_argument('--host', default='127.0.0.1', help="Dirección de escucha (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=8765, help="Puerto (default: %(default)s)")
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help="Segundos entre mensajes (default: %(default)s)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    exit(main())